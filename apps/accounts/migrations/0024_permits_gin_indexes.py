@@ -0,0 +1,22 @@
+# Generated by Django 2.2.28 on 2026-10-19 15:09
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_auto_20231221_1537'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['content_permits'], name='user_content_permits_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['performance_permits'], name='user_performance_permits_gin', opclasses=['jsonb_path_ops']),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-19 15:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_permits_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Connection',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pinned', models.BooleanField(default=False)),
+                ('content_permit', models.BooleanField(default=False)),
+                ('performance_permit', models.BooleanField(default=False)),
+                ('content_access', models.BooleanField(default=False)),
+                ('performance_access', models.BooleanField(default=False)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='connection_edges', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Connection',
+                'verbose_name_plural': 'Connections',
+                'unique_together': {('user', 'other')},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def forwards(apps, schema_editor):
+    User = apps.get_model("accounts", "User")
+    Connection = apps.get_model("accounts", "Connection")
+    db_alias = schema_editor.connection.alias
+
+    users = {
+        user_id: (set(pins or []), set(content or []), set(performance or []))
+        for user_id, pins, content, performance in User.objects.using(
+            db_alias
+        ).values_list("id", "connections_list", "content_permits", "performance_permits")
+    }
+
+    edges = defaultdict(dict)
+    for user_id, (pins, content, performance) in users.items():
+        for other_id in pins | content | performance:
+            if other_id == user_id or other_id not in users:
+                continue
+            edges[(user_id, other_id)]  # the granting side of the edge
+            edges[(other_id, user_id)]  # and its mirror
+    connections = []
+    for (user_id, other_id) in edges:
+        pins, content, performance = users[user_id]
+        _, other_content, other_performance = users[other_id]
+        flags = {
+            "pinned": other_id in pins,
+            "content_permit": other_id in content,
+            "performance_permit": other_id in performance,
+            "content_access": user_id in other_content,
+            "performance_access": user_id in other_performance,
+        }
+        if any(flags.values()):
+            connections.append(
+                Connection(user_id=user_id, other_id=other_id, **flags)
+            )
+    Connection.objects.using(db_alias).bulk_create(connections, batch_size=1000)
+
+
+def reverse(apps, schema_editor):
+    Connection = apps.get_model("accounts", "Connection")
+    Connection.objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0025_connection"),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, reverse_code=reverse),
+    ]
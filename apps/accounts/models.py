@@ -1,6 +1,7 @@
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
 from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.mail import send_mail
 from django.db import models
 from django.utils import timezone
@@ -93,6 +94,19 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name = _("User")
         verbose_name_plural = _("Users")
         ordering = ("-date_joined",)
+        indexes = [
+            # serve the permits__contains=<user id> lookups
+            GinIndex(
+                fields=["content_permits"],
+                name="user_content_permits_gin",
+                opclasses=["jsonb_path_ops"],
+            ),
+            GinIndex(
+                fields=["performance_permits"],
+                name="user_performance_permits_gin",
+                opclasses=["jsonb_path_ops"],
+            ),
+        ]
 
     def clean(self):
         super().clean()
@@ -143,14 +157,9 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     @property
     def connections(self):
-        _listed_connections = User.objects.filter(
-            Q(id__in=self.connections_list)
-            | Q(id__in=self.content_permits)
-            | Q(id__in=self.performance_permits)
-            | Q(content_permits__contains=self.id)
-            | Q(performance_permits__contains=self.id)
+        return User.objects.filter(
+            id__in=Connection.objects.filter(user=self).values("other_id")
         )
-        return _listed_connections
 
     def toggle_content_permit(self, other_user):  # new
         if self.id == other_user.id:
@@ -161,6 +170,7 @@ class User(AbstractBaseUser, PermissionsMixin):
         else:
             self.content_permits.append(second_party)
         self.save()
+        Connection.sync_pair(self, other_user)
 
     def toggle_performance_permit(self, other_user):  # new
         if self.id == other_user.id:
@@ -171,6 +181,7 @@ class User(AbstractBaseUser, PermissionsMixin):
         else:
             self.performance_permits.append(second_party)
         self.save()
+        Connection.sync_pair(self, other_user)
 
     def pin_connection(self, other_user):  # new
         if self.id == other_user.id:
@@ -182,6 +193,7 @@ class User(AbstractBaseUser, PermissionsMixin):
             self.connections_list.remove(second_party)
             self.connections_list.append(second_party)
         self.save()
+        Connection.sync_pair(self, other_user)
 
     def toggle_connection_pin(self, other_user):  # new
         if self.id == other_user.id:
@@ -192,6 +204,7 @@ class User(AbstractBaseUser, PermissionsMixin):
         else:
             self.connections_list.append(second_party)
         self.save()
+        Connection.sync_pair(self, other_user)
 
 
 class Group(models.Model):
@@ -250,3 +263,52 @@ class Group(models.Model):
     # @property
     # def members(self):
     #     return User.objects.filter(id__in=self._members)
+
+
+class Connection(models.Model):
+    """
+    Materialized connection between two users, derived from (and kept in sync
+    with) their connections_list, content_permits and performance_permits.
+
+    The row (user, other) exists while user has pinned other or either user has
+    given the other a permit. Its *_permit fields describe what user grants
+    other and its *_access fields what other grants user, so the mirrored row
+    (other, user) holds the same permits with the roles swapped.
+    """
+
+    user = models.ForeignKey(
+        to=User, related_name="connection_edges", on_delete=models.CASCADE
+    )
+    other = models.ForeignKey(to=User, related_name="+", on_delete=models.CASCADE)
+    pinned = models.BooleanField(default=False)
+    content_permit = models.BooleanField(default=False)
+    performance_permit = models.BooleanField(default=False)
+    content_access = models.BooleanField(default=False)
+    performance_access = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Connection"
+        verbose_name_plural = "Connections"
+        unique_together = (("user", "other"),)
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.other_id}"
+
+    @classmethod
+    def edge_flags(cls, user, other):
+        return {
+            "pinned": other.id in user.connections_list,
+            "content_permit": other.id in user.content_permits,
+            "performance_permit": other.id in user.performance_permits,
+            "content_access": user.id in other.content_permits,
+            "performance_access": user.id in other.performance_permits,
+        }
+
+    @classmethod
+    def sync_pair(cls, first, second):
+        for user, other in ((first, second), (second, first)):
+            flags = cls.edge_flags(user, other)
+            if any(flags.values()):
+                cls.objects.update_or_create(user=user, other=other, defaults=flags)
+            else:
+                cls.objects.filter(user=user, other=other).delete()
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+
+
+class PermitResolver:
+    """
+    Answers whether a user holds another user's content or performance permit.
+
+    An owner may be given as a loaded User instance, whose permits are then
+    read from memory, or as a bare id, which costs one primary-key lookup
+    instead of loading the owner's row. Answers are memoized for the lifetime
+    of the resolver, i.e. one request when obtained via get_permit_resolver().
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._memo = {}
+
+    def _has_permit(self, field_name, owner):
+        if not self.user.is_authenticated:
+            return False
+        owner_id = getattr(owner, "pk", owner)
+        if owner_id == self.user.pk:
+            return True
+        memo_key = (field_name, owner_id)
+        if memo_key not in self._memo:
+            if isinstance(owner, get_user_model()):
+                permitted = self.user.pk in getattr(owner, field_name)
+            else:
+                permitted = (
+                    get_user_model()
+                    .objects.filter(
+                        pk=owner_id, **{f"{field_name}__contains": self.user.pk}
+                    )
+                    .exists()
+                )
+            self._memo[memo_key] = permitted
+        return self._memo[memo_key]
+
+    def has_content_permit(self, owner):
+        return self._has_permit("content_permits", owner)
+
+    def has_performance_permit(self, owner):
+        return self._has_permit("performance_permits", owner)
+
+    def can_access_content(self, obj):
+        """For an Exercise, Playlist or Course."""
+        return obj.is_public or self.has_content_permit(obj.authored_by_id)
+
+
+def get_permit_resolver(request):
+    resolver = getattr(request, "_permit_resolver", None)
+    if resolver is None or resolver.user != request.user:
+        resolver = PermitResolver(request.user)
+        request._permit_resolver = resolver
+    return resolver
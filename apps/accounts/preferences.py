@@ -0,0 +1,62 @@
+"""
+Partial writes of user preferences.
+
+Preference changes are merged into the stored preferences in the database
+with jsonb concatenation, which replaces only the keys sent:
+
+    UPDATE accounts_user SET preferences = preferences || '{"volume": "p"}'
+
+so that no other column is rewritten and no User signals fire. The server
+writes every PATCH as it comes, so a change is visible to all workers at once
+and survives a worker being killed. It does not coalesce them: the lab
+client batches rapid changes (e.g. clicking through volume levels) into one
+request, see savePreferences in app/models/midi_device.js, but other clients
+write on every request.
+"""
+import json
+
+from django.contrib.postgres.fields import JSONField
+from django.db.models import F, Func, Value
+from django.db.models.functions import Cast
+
+from apps.accounts.models import User, VOLUME_CHOICES, get_preferences_default
+
+
+class JSONBConcat(Func):
+    arg_joiner = " || "
+    template = "(%(expressions)s)"
+    output_field = JSONField()
+
+
+def clean_preferences(changes):
+    """The changes, validated against the known preferences, or ValueError."""
+    if not isinstance(changes, dict) or not changes:
+        raise ValueError("Expected an object of preferences")
+    defaults = get_preferences_default()
+    for key, value in changes.items():
+        if key not in defaults:
+            raise ValueError(f"Unknown preference {key!r}")
+        if isinstance(defaults[key], bool):
+            if not isinstance(value, bool):
+                raise ValueError(f"{key} must be true or false")
+        elif key == "volume":
+            if value not in dict(VOLUME_CHOICES):
+                raise ValueError(f"volume must be one of {', '.join(dict(VOLUME_CHOICES))}")
+        elif not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f"{key} must be an integer")
+    return changes
+
+
+def write_preferences(user_id, changes):
+    User.objects.filter(pk=user_id).update(
+        preferences=JSONBConcat(
+            F("preferences"), Cast(Value(json.dumps(changes)), JSONField())
+        )
+    )
+
+
+def resolved_preferences(user):
+    """The preferences in effect for a user: the defaults and the stored ones."""
+    if user.is_anonymous:
+        return get_preferences_default()
+    return {**get_preferences_default(), **user.preferences}
@@ -1,7 +1,6 @@
 import json
 
 from django.contrib.auth import authenticate, login as django_login, get_user_model
-from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import (
     LogoutView as DjangoLogoutView,
     PasswordResetView as DjangoPasswordResetView,
@@ -9,14 +8,13 @@ from django.contrib.auth.views import (
     PasswordResetConfirmView as DjangoPasswordResetConfirmView,
     PasswordResetCompleteView as DjangoPasswordResetCompleteView,
 )
-from django.http.response import JsonResponse, HttpResponse
+from django.http.response import JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy, reverse
-from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 
 from .forms import CustomAuthenticationForm, RegistrationForm
-from .models import get_preferences_default
+from .preferences import clean_preferences, resolved_preferences, write_preferences
 
 User = get_user_model()
 
@@ -90,35 +88,30 @@ def register(request):
 
 # The following view function is used to send the keyboard size to the front-end
 # Can be extended to include other preferences as it sends a JSON
+# PATCH with a JSON object of some preferences changes just those
 
 
+@csrf_exempt
 def preferences_view(request):
-    if request.is_ajax and request.method == "GET":
-        cur_user = request.user
+    cur_user = request.user
+    if request.method == "PATCH":
         if cur_user.is_anonymous:
-            json_dump = json.dumps(get_preferences_default())
-            return JsonResponse({"instance": json_dump}, status=200)
-
-        preferences = json.dumps(cur_user.preferences)
+            return JsonResponse({"error": "login required"}, status=403)
+        try:
+            changes = clean_preferences(json.loads(request.body))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        preferences = resolved_preferences(cur_user)
+        changes = {
+            key: value for key, value in changes.items() if preferences.get(key) != value
+        }
+        if changes:
+            write_preferences(cur_user.id, changes)
+        return JsonResponse({"instance": json.dumps({**preferences, **changes})})
+    elif request.is_ajax and request.method == "GET":
+        # lab pages inline these, see RequirejsContext.set_preferences
+        preferences = json.dumps(resolved_preferences(cur_user))
         return JsonResponse({"instance": preferences}, status=200)
     else:
         # some form errors occurred.
         return JsonResponse({"error": "something went wrong"}, status=400)
-
-
-@login_required()
-@method_decorator(csrf_exempt)
-def set_preferred_mute_value(request):
-    if request.method == "POST":
-        request.user.preferences["mute"] = json.loads(request.POST.get("mute"))
-        request.user.save()
-    return HttpResponse(json.dumps(request.user.preferences))
-
-
-@login_required()
-@method_decorator(csrf_exempt)
-def set_preferred_volume(request):
-    if request.method == "POST":
-        request.user.preferences["volume"] = request.POST.get("volume")
-        request.user.save()
-    return HttpResponse(json.dumps(request.user.preferences))
@@ -0,0 +1,444 @@
+"""
+Queries backing the course activity table.
+
+A course's performance_dict holds one record per performer, keyed by
+str(performer), i.e. "first last - email". Rather than loading every permitted
+performer and joining records in Python, the record is pulled alongside each
+user row so that filtering, ordering and pagination happen in the database and
+only the visible page is ever materialized.
+"""
+import json
+import re
+import threading
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.fields.jsonb import KeyTextTransform
+from django.db import connection
+from django.db.models import (
+    Case,
+    CharField,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Concat, Upper
+
+from apps.accounts.models import Group, User
+from apps.exercises.constants import COURSE_ACTIVITY_CHANNEL
+from apps.exercises.models import Course, PerformanceData, PlaylistCourseOrdered
+from apps.exercises.utils.pubsub import subscribe
+
+# Keys within a course's performance_dict that don't correspond with a playlist
+RESERVED_RECORD_KEYS = {
+    "performer",
+    "performer_name",
+    "performer_last_name",
+    "performer_first_name",
+    "groups",
+    "time_elapsed",
+    "reset",
+}
+
+# Records are keyed by playlist id, or by unit number for legacy performances
+PLAYLIST_ID_PATTERN = re.compile(r"^P[A-Z][0-9]+[A-Z]+$")
+LEGACY_ORDER_PATTERN = re.compile(r"^[0-9]+$")
+
+# Mirrors User.__str__, which keys Course.performance_dict
+PERFORMANCE_KEY_SQL = (
+    '("{user}"."first_name" || \' \' || "{user}"."last_name" || \' - \' || "{user}"."email")'
+).format(user=User._meta.db_table)
+
+COURSE_RECORD_SQL = (
+    'COALESCE((SELECT "performance_dict" -> {key} FROM "{course}" WHERE "{pk}" = %s), \'{{}}\'::jsonb)'
+).format(key=PERFORMANCE_KEY_SQL, course=Course._meta.db_table, pk=Course._meta.pk.column)
+
+
+def course_activity_performers(course, instructor, group_ids=()):
+    """
+    Users shown on the activity table of course, as a lazy queryset.
+
+    Includes the instructor's permitted performers (only those in the given
+    groups, if any, and otherwise only those with a record in the course) plus
+    the instructor, whose names are starred and upper-cased so they stand out
+    when sorting. Each user is annotated with course_record (their entry of
+    performance_dict, {} if none) and the table's sortable columns.
+    """
+    performers = Q(pk__in=instructor.content_permits)
+    if group_ids:
+        performers &= Q(
+            pk__in=User.objects.filter(participant_groups__id__in=group_ids).values("pk")
+        )
+    is_instructor = Q(pk=instructor.pk)
+
+    queryset = User.objects.filter(performers | is_instructor).annotate(
+        course_record=RawSQL(COURSE_RECORD_SQL, [course.pk], output_field=JSONField()),
+        time_elapsed=Cast(KeyTextTransform("time_elapsed", "course_record"), FloatField()),
+        performer_first_name=Case(
+            When(is_instructor, then=Concat(Value("*"), Upper("first_name"), Value("*"))),
+            default=F("first_name"),
+            output_field=CharField(),
+        ),
+        performer_last_name=Case(
+            When(is_instructor, then=Concat(Value("*"), Upper("last_name"), Value("*"))),
+            default=F("last_name"),
+            output_field=CharField(),
+        ),
+        is_instructor=Case(
+            When(is_instructor, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+    if not group_ids:
+        # omit performers who have zero performances for this course
+        queryset = queryset.filter(~Q(course_record={}) | is_instructor)
+    else:
+        queryset = queryset.prefetch_related(
+            Prefetch(
+                "participant_groups",
+                queryset=Group.objects.filter(id__in=group_ids),
+                to_attr="filtered_groups",
+            )
+        )
+    # the instructor comes last, as in the course roster
+    return queryset.order_by("is_instructor", "-date_joined", "pk")
+
+
+def performed_playlist_keys(performers):
+    """
+    Distinct keys of the course records of performers, in a single query.
+
+    These include playlist ids (or legacy order values) as well as the reserved
+    keys such as time_elapsed, which callers filter out.
+    """
+    return set(
+        performers.prefetch_related(None)
+        .order_by()
+        .annotate(
+            record_key=Func(
+                "course_record", function="jsonb_object_keys", output_field=CharField()
+            )
+        )
+        .values_list("record_key", flat=True)
+        .distinct()
+    )
+
+
+class CourseColumns:
+    """
+    Playlist columns of a course's activity table.
+
+    Built once per request from the course's PCOs (one query, or none if they
+    were already fetched), it maps each record key to its unit number, header
+    label and de-accessioned state without touching the database again.
+    """
+
+    def __init__(self, course, course_pcos=None):
+        if course_pcos is None:
+            course_pcos = PlaylistCourseOrdered.objects.filter(
+                course_id=course._id
+            ).select_related("playlist")
+        self.order_by_playlist_id = {pco.playlist.id: pco.order for pco in course_pcos}
+
+    def order(self, key):
+        return self.order_by_playlist_id.get(key)
+
+    def label(self, key):
+        order = self.order(key)
+        return key if order is None else "#" + str(order)
+
+    def is_deaccessioned(self, key):
+        """A playlist that was performed in the course but has since been removed from it."""
+        return bool(PLAYLIST_ID_PATTERN.match(key)) and not self.order(key)
+
+    def in_units(self, key, min_unit_num=None, max_unit_num=None):
+        order = self.order(key)
+        if order is None:
+            return False
+        return (not min_unit_num or order >= min_unit_num) and (
+            not max_unit_num or order <= max_unit_num
+        )
+
+    def sort_key(self, key):
+        # legacy order values first, then playlists in their order of
+        # presentation in the course, then de-accessioned playlists by id
+        order = self.order(key)
+        is_playlist_id = bool(PLAYLIST_ID_PATTERN.match(key))
+        return (
+            int(key) if LEGACY_ORDER_PATTERN.match(key) else -1,
+            0 if order else 1,
+            key if is_playlist_id and not order else "O",
+            order if is_playlist_id and order else 0,
+        )
+
+    def playlist_keys(self, record_keys, min_unit_num=None, max_unit_num=None):
+        """
+        The record keys that are shown as playlist columns, in column order.
+        If a unit range is given, only playlists within it are kept.
+        """
+        filtered_unit_num = bool(min_unit_num or max_unit_num)
+        return sorted(
+            [
+                key
+                for key in record_keys
+                if key not in RESERVED_RECORD_KEYS
+                and (
+                    not filtered_unit_num
+                    or self.in_units(key, min_unit_num, max_unit_num)
+                )
+            ],
+            key=self.sort_key,
+        )
+
+
+# Cells of a CourseMarkMatrix hold one of these, or NO_MARK if the performer
+# has no record for the playlist
+PASS_MARKS = ("P", "C", "T", "L", "X")
+NO_MARK = "-"
+
+
+def _cell(value):
+    return value if isinstance(value, str) and value in PASS_MARKS else NO_MARK
+
+
+class CourseMarkMatrix:
+    """
+    Dense performer × playlist matrix of a course's pass marks.
+
+    Cells are stored row-major in a single bytes object, one ASCII mark per
+    cell, so that tallies over a performer (a row slice) or a playlist (a
+    strided column slice) are C-level bytes.count() calls instead of Python
+    loops over record dicts. The activity table, exports and analytics all
+    compute scores and counts from this one structure.
+    """
+
+    def __init__(self, course, performers, playlist_keys):
+        self.course = course
+        self.performers = list(performers)
+        self.playlist_keys = list(playlist_keys)
+        self.width = len(self.playlist_keys)
+        self.row_index = {performer.pk: i for i, performer in enumerate(self.performers)}
+        self.cells = "".join(
+            [
+                _cell(performer.course_record.get(key))
+                for performer in self.performers
+                for key in self.playlist_keys
+            ]
+        ).encode("ascii")
+
+    def row(self, performer):
+        start = self.row_index[performer.pk] * self.width
+        return self.cells[start : start + self.width]
+
+    def column(self, key):
+        return self.cells[self.playlist_keys.index(key) :: self.width or 1]
+
+    def mark_string(self, performer):
+        """e.g. "PPT-X" for the playlist columns in order."""
+        return self.row(performer).decode("ascii")
+
+    def result_count(self, performer):
+        row = self.row(performer)
+        return {mark: row.count(mark.encode("ascii")) for mark in PASS_MARKS}
+
+    def score(self, performer):
+        result_count = self.result_count(performer)
+        score = (
+            result_count["P"] * self.course.timely_credit
+            + result_count["C"] * self.course.timely_credit
+            + result_count["T"] * self.course.tardy_credit
+            + result_count["L"] * self.course.late_credit
+        )
+        return round(score, 1)
+
+    def completion_rates(self):
+        """Share of listed performers who passed each playlist, by playlist key."""
+        if not self.performers:
+            return {key: 0 for key in self.playlist_keys}
+        rates = {}
+        for key in self.playlist_keys:
+            column = self.column(key)
+            passed = len(column) - column.count(b"X") - column.count(NO_MARK.encode("ascii"))
+            rates[key] = passed / len(self.performers)
+        return rates
+
+
+def course_activity_events(course, performer_ids, keepalive=15, max_duration=90):
+    """
+    Server-sent events of course activity cells, as performances are submitted.
+
+    Yields one "cell" event per published delta (performer, playlist, mark and
+    time_elapsed) of the performers in performer_ids, and a comment every
+    keepalive seconds so that proxies keep the connection open. The stream ends
+    after max_duration seconds; EventSource clients then reconnect by themselves.
+    """
+    # the watcher has no further use for the request's database connection
+    connection.close()
+    deadline = time.monotonic() + max_duration
+    with subscribe(COURSE_ACTIVITY_CHANNEL, course.id) as subscription:
+        yield "retry: 5000\n\n"
+        while time.monotonic() < deadline:
+            delta = subscription.get(timeout=keepalive)
+            if delta is None:
+                yield ": keepalive\n\n"
+            elif delta.get("performer") in performer_ids:
+                yield "event: cell\ndata: {}\n\n".format(
+                    json.dumps(delta, separators=(",", ":"))
+                )
+
+
+# every stream holds one of the worker's threads for as long as it is open
+_event_stream_slots = threading.BoundedSemaphore(settings.COURSE_ACTIVITY_MAX_STREAMS)
+
+
+class CourseActivityEventStream:
+    """
+    course_activity_events() counted against the streams a process may serve
+    at once (settings.COURSE_ACTIVITY_MAX_STREAMS). open() returns None when
+    they are all taken; the slot is given back when the server closes the
+    response.
+    """
+
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+
+    @classmethod
+    def open(cls, course, performer_ids):
+        if not _event_stream_slots.acquire(blocking=False):
+            return None
+        return cls(course_activity_events(course, performer_ids))
+
+    def __iter__(self):
+        return self.events
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.events.close()
+        finally:
+            _event_stream_slots.release()
+
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def course_grade_rows(course, performers, playlist_keys, columns, group_ids=()):
+    """
+    Rows of the course grade export: a header, then one row per performer with
+    score, result counts, time elapsed, groups and the mark of every playlist.
+
+    Performers are read through a server-side cursor and scored one chunk at a
+    time, so memory use does not grow with the size of the course.
+    """
+    group_ids = group_ids or course.visible_to.values("id")
+    performers = performers.prefetch_related(None).only(
+        "id", "email", "first_name", "last_name"
+    ).annotate(
+        group_names=Subquery(
+            Group.objects.filter(members=OuterRef("pk"), id__in=group_ids)
+            .order_by()
+            .values("members")
+            .annotate(names=StringAgg("name", ", ", ordering="name"))
+            .values("names"),
+            output_field=CharField(),
+        )
+    )
+
+    yield [
+        "Surname",
+        "Given name",
+        "Email",
+        "Group(s)",
+        "Score",
+        *[f"{mark} count" for mark in PASS_MARKS],
+        "Time elapsed (seconds)",
+        *[
+            key if columns.order(key) is None else f"{columns.label(key)} ({key})"
+            for key in playlist_keys
+        ],
+    ]
+    for chunk in _chunks(performers.iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+        matrix = CourseMarkMatrix(course, chunk, playlist_keys)
+        for performer in matrix.performers:
+            result_count = matrix.result_count(performer)
+            yield [
+                performer.last_name,
+                performer.first_name,
+                performer.email,
+                performer.group_names or "",
+                matrix.score(performer),
+                *[result_count[mark] for mark in PASS_MARKS],
+                performer.time_elapsed if performer.time_elapsed is not None else "",
+                *[mark if mark != NO_MARK else "" for mark in matrix.mark_string(performer)],
+            ]
+
+
+def course_attempt_rows(course, performers, playlist_keys, columns):
+    """
+    Rows of the per-attempt export: a header, then one row per exercise
+    attempt of the given performers on the given playlists of course.
+    """
+    yield [
+        "Surname",
+        "Given name",
+        "Email",
+        "Unit",
+        "Playlist",
+        "Exercise",
+        "Performed at",
+        "Error tally",
+        "Tempo rating",
+        "Duration (seconds)",
+    ]
+    playlist_ids = [key for key in playlist_keys if PLAYLIST_ID_PATTERN.match(key)]
+    performances = (
+        PerformanceData.objects.filter(
+            course=course,
+            user__in=performers.order_by().values("pk"),
+            playlist__id__in=playlist_ids,
+        )
+        .order_by("user__last_name", "user__first_name", "user_id", "playlist_id")
+        .values_list(
+            "user__last_name", "user__first_name", "user__email", "playlist__id", "data"
+        )
+    )
+    for last_name, first_name, email, playlist_id, data in performances.iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        for attempt in data:
+            yield [
+                last_name,
+                first_name,
+                email,
+                columns.order(playlist_id) or "",
+                playlist_id,
+                attempt.get("id", ""),
+                attempt.get("performed_at", ""),
+                attempt.get("error_tally", ""),
+                attempt.get("tempo_rating", ""),
+                attempt.get("performance_duration_in_seconds", ""),
+            ]
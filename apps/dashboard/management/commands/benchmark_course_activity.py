@@ -0,0 +1,109 @@
+# DESCRIPTION
+#
+# Measures server time and payload size of the course activity page, rendered
+# as paged django_tables2 HTML, against the compact JSON that backs the
+# client-side grid, for the whole (filtered) class of a course.
+#
+# Views are called directly with the response cache bypassed, so every
+# repetition pays the full cost of building the response.
+#
+# USAGE:
+#
+#   ./manage.py benchmark_course_activity CA00AB --repeat 5
+#   ./manage.py benchmark_course_activity CA00AB --query "groups=3&min_unit_num=2"
+import gzip
+import inspect
+import math
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from apps.dashboard.views.courses import (
+    PERFORMERS_PER_PAGE,
+    course_activity_data_view,
+    course_activity_view,
+    filter_course_activity,
+)
+from apps.exercises.models import Course
+
+
+class Command(BaseCommand):
+    help = "Benchmark the course activity HTML table against its JSON grid endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("course_id", help="Course id, e.g. CA00AB")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--query", default="", help="Filter query string")
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(id=options["course_id"]).first()
+        if course is None:
+            raise CommandError(f"No course with id {options['course_id']}")
+
+        path = f"/dashboard/courses/{course.id}/activity/"
+        html_view = inspect.unwrap(course_activity_view)
+        data_view = inspect.unwrap(course_activity_data_view)
+
+        # one request per page of HTML is needed to see the whole class
+        performer_count = filter_course_activity(
+            self.request(course, path, options["query"]), course
+        )["performers"].count()
+        pages = max(1, math.ceil(performer_count / PERFORMERS_PER_PAGE))
+        self.stdout.write(f"{performer_count} performers, {pages} page(s) of HTML")
+        self.report(
+            "html (all pages)",
+            [
+                self.measure_pages(html_view, course, path, options["query"], pages)
+                for _ in range(options["repeat"])
+            ],
+        )
+        self.report(
+            "json",
+            [
+                self.measure(data_view, course, path + "data/", options["query"])
+                for _ in range(options["repeat"])
+            ],
+        )
+
+    def request(self, course, path, query):
+        request = RequestFactory().get(path + ("?" + query if query else ""))
+        request.user = course.authored_by
+        return request
+
+    def measure(self, view, course, path, query, page=None):
+        if page is not None:
+            query = "&".join(filter(None, [query, f"page={page}"]))
+        request = self.request(course, path, query)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = view(request, course_id=course.id)
+            content = response.content
+            elapsed = time.perf_counter() - start
+        return {
+            "seconds": elapsed,
+            "bytes": len(content),
+            "gzip_bytes": len(gzip.compress(content)),
+            "queries": len(queries),
+        }
+
+    def measure_pages(self, view, course, path, query, pages):
+        results = [self.measure(view, course, path, query, page) for page in range(1, pages + 1)]
+        return {
+            key: sum(result[key] for result in results)
+            for key in ("seconds", "bytes", "gzip_bytes", "queries")
+        }
+
+    def report(self, label, runs):
+        self.stdout.write(
+            "{:<18} median {:8.1f} ms   {:>10,} bytes   {:>9,} gzipped   {:>4} queries".format(
+                label,
+                statistics.median(run["seconds"] for run in runs) * 1000,
+                runs[0]["bytes"],
+                runs[0]["gzip_bytes"],
+                runs[0]["queries"],
+            )
+        )
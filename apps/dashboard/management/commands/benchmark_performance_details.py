@@ -0,0 +1,87 @@
+# DESCRIPTION
+#
+# Measures how the performance details page of a playlist performance scales
+# with the number of attempts recorded. The performance data is replaced by
+# synthetic attempts, cycling through the playlist's exercises, inside a
+# transaction that is rolled back, so the database is left untouched.
+#
+# Time per attempt should stay roughly flat as the attempt count grows.
+#
+# USAGE:
+#
+#   ./manage.py benchmark_performance_details 42
+#   ./manage.py benchmark_performance_details 42 --attempts 250 500 1000 2000 --repeat 5
+import datetime
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+from apps.dashboard.views.performance import PERFORMED_AT_FORMAT, playlist_performance_view
+from apps.exercises.models import PerformanceData
+
+
+class Command(BaseCommand):
+    help = "Benchmark the performance details page against growing attempt counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("performance_id", type=int)
+        parser.add_argument(
+            "--attempts", type=int, nargs="+", default=[250, 500, 1000, 2000]
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        performance = (
+            PerformanceData.objects.filter(id=options["performance_id"])
+            .select_related("user", "playlist", "course")
+            .first()
+        )
+        if performance is None:
+            raise CommandError(f"No performance with id {options['performance_id']}")
+        exercises = performance.playlist.exercise_list
+        if not exercises:
+            raise CommandError("The playlist of this performance has no exercises")
+
+        request = RequestFactory().get(
+            f"/dashboard/playlist-performance/{performance.id}"
+        )
+        request.user = performance.user
+
+        for attempts in options["attempts"]:
+            with transaction.atomic():
+                PerformanceData.objects.filter(id=performance.id).update(
+                    data=self.attempts(performance, exercises, attempts)
+                )
+                runs = []
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    playlist_performance_view(request, performance_id=performance.id)
+                    runs.append(time.perf_counter() - start)
+                transaction.set_rollback(True)
+            median = statistics.median(runs)
+            self.stdout.write(
+                "{:>6,} attempts   median {:8.1f} ms   {:6.3f} ms/attempt".format(
+                    attempts, median * 1000, median * 1000 / attempts
+                )
+            )
+
+    def attempts(self, performance, exercises, count):
+        started = datetime.datetime(2020, 1, 1)
+        return [
+            {
+                "id": exercises[i % len(exercises)],
+                "course_ID": getattr(performance.course, "id", None),
+                "playlist_ID": performance.playlist.id,
+                "error_tally": [2, 1, 0][i % 3],
+                "performed_at": (started + datetime.timedelta(minutes=i)).strftime(
+                    PERFORMED_AT_FORMAT
+                ),
+                "tempo_rating": 3,
+                "tempo_mean_semibreves_per_min": 20,
+                "performance_duration_in_seconds": 12.5,
+            }
+            for i in range(count)
+        ]
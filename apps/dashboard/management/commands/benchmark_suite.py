@@ -0,0 +1,224 @@
+# DESCRIPTION
+#
+# Times the key paths of the application against a course, typically one made
+# by generate_synthetic_data, and writes the results as JSON so that runs can
+# be compared across commits:
+#
+#   playlist_view              a student opens the first exercise of a playlist
+#   submit_performance         a student submits an exercise performance
+#   course_activity            the author opens the course activity table
+#   refresh_performance_dict   the course performance dictionary is rebuilt
+#   transpose                  every exercise of the course in every key
+#   export_courses, export_playlists, export_exercises
+#                              the author's content through its admin resources
+#   import_exercises           the exported exercises as a dry-run import
+#
+# Each path reports the median, min and max wall time in milliseconds and the
+# number of queries of its last run. Paths that write run in transactions that
+# are rolled back, so the database is left untouched.
+#
+# USAGE:
+#
+#   ./manage.py generate_synthetic_data --tier medium
+#   ./manage.py benchmark_suite --output benchmarks/$(git rev-parse --short HEAD).json
+#   ./manage.py benchmark_suite --course CA00AB --repeat 10
+import inspect
+import json
+import statistics
+import subprocess
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from apps.dashboard.views.courses import course_activity_view
+from apps.exercises.constants import all_sigs
+from apps.exercises.management.commands.generate_synthetic_data import synthetic_users
+from apps.exercises.models import Course, Exercise, PerformanceData, Playlist
+from apps.exercises.resources import CourseResource, ExerciseResource, PlaylistResource
+from apps.exercises.utils.transpose import transpose
+
+
+class Command(BaseCommand):
+    help = "Time the key paths of the application and write the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course",
+            help="Course id, e.g. CA00AB; defaults to the largest synthetic course",
+        )
+        parser.add_argument("--prefix", default="synth", help="Prefix of synthetic users")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--output", help="File to write the JSON results to")
+
+    def handle(self, *args, **options):
+        course = self.get_course(options["course"], options["prefix"])
+        performance = (
+            PerformanceData.objects.filter(course=course)
+            .select_related("user", "playlist")
+            .order_by("id")
+            .first()
+        )
+        if performance is None:
+            raise CommandError(f"Course {course.id} has no performances")
+        student, playlist = performance.user, performance.playlist
+        author = course.authored_by
+        exercises = list(
+            Exercise.objects.filter(
+                _id__in=Exercise.objects.filter(playlists__courses=course).values("_id")
+            )
+        )
+
+        # logging in is not part of any path
+        client = Client()
+        client.force_login(student)
+
+        paths = {
+            "playlist_view": lambda: self.get(
+                client, f"/playlists/{course.id}/{playlist.id}/1/"
+            ),
+            "submit_performance": lambda: self.rolled_back(
+                self.submit, client, course, playlist
+            ),
+            "course_activity": lambda: self.course_activity(author, course),
+            "refresh_performance_dict": lambda: self.rolled_back(
+                course.refresh_performance_dict
+            ),
+            "transpose": lambda: [
+                transpose(exercise, sig) for exercise in exercises for sig in all_sigs
+            ],
+            "export_courses": lambda: CourseResource().export(
+                Course.objects.filter(authored_by=author)
+            ),
+            "export_playlists": lambda: PlaylistResource().export(
+                Playlist.objects.filter(authored_by=author)
+            ),
+            "export_exercises": lambda: ExerciseResource().export(
+                Exercise.objects.filter(authored_by=author)
+            ),
+        }
+        sample = ExerciseResource(is_sample=True).export(
+            Exercise.objects.filter(authored_by=author)
+        )
+        paths["import_exercises"] = lambda: self.import_exercises(author, sample)
+
+        results = {}
+        for name, run in paths.items():
+            results[name] = self.measure(run, options["repeat"])
+            self.stdout.write(
+                "{:<26} median {:9.2f} ms   min {:9.2f}   max {:9.2f}   {:>4} queries".format(
+                    name,
+                    results[name]["median_ms"],
+                    results[name]["min_ms"],
+                    results[name]["max_ms"],
+                    results[name]["queries"],
+                )
+            )
+
+        report = {
+            "commit": self.commit(),
+            "timestamp": now().isoformat(),
+            "course": course.id,
+            "repeat": options["repeat"],
+            "counts": {
+                "course_performers": len(course.performance_dict),
+                "course_playlists": course.playlists.count(),
+                "course_exercises": len(exercises),
+                "performances": PerformanceData.objects.count(),
+                "exercises": Exercise.objects.count(),
+            },
+            "paths": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def get_course(self, course_id, prefix):
+        if course_id:
+            course = Course.objects.filter(id=course_id).first()
+            if course is None:
+                raise CommandError(f"No course with id {course_id}")
+            return course
+        courses = sorted(
+            Course.objects.filter(authored_by__in=synthetic_users(prefix)),
+            key=lambda course: len(course.performance_dict),
+        )
+        if not courses:
+            raise CommandError(
+                f"No synthetic courses with prefix {prefix!r}; "
+                "run generate_synthetic_data or pass --course"
+            )
+        return courses[-1]
+
+    def measure(self, run, repeat):
+        seconds = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                run()
+                seconds.append(time.perf_counter() - start)
+        return {
+            "median_ms": statistics.median(seconds) * 1000,
+            "min_ms": min(seconds) * 1000,
+            "max_ms": max(seconds) * 1000,
+            "queries": len(queries),
+        }
+
+    def rolled_back(self, func, *args):
+        with transaction.atomic():
+            result = func(*args)
+            transaction.set_rollback(True)
+        return result
+
+    def get(self, client, path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f"GET {path} returned {response.status_code}")
+        return response
+
+    def submit(self, client, course, playlist):
+        data = {
+            "course_ID": course.id,
+            "playlist_ID": playlist.id,
+            "exercise_num": 1,
+            "error_tally": 1,
+            "performance_duration_in_seconds": 30.0,
+            "time_intervals_in_milliseconds": [1000, 1000, 1000, 1000],
+            "tempo_mean_semibreves_per_min": 20.0,
+            "tempo_SD_semibreves_per_min": 2.0,
+            "tempo_rating": 3,
+        }
+        response = client.post("/ajax/exercise-performance/", {"data": json.dumps(data)})
+        if response.status_code != 201:
+            raise CommandError(f"Submission returned {response.status_code}")
+
+    def course_activity(self, author, course):
+        # called directly to bypass the response cache
+        request = RequestFactory().get(f"/dashboard/courses/{course.id}/activity/")
+        request.user = author
+        return inspect.unwrap(course_activity_view)(request, course_id=course.id).content
+
+    def import_exercises(self, author, dataset):
+        resource = ExerciseResource(request=SimpleNamespace(user=author))
+        result = resource.import_data(dataset, dry_run=True)
+        if result.has_errors():
+            raise CommandError("The exercise import failed")
+        return result
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                cwd=settings.ROOT_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,337 @@
+// Virtualized grid for the course activity page.
+//
+// Loads the whole (filtered) class from the course activity data endpoint and
+// renders only the rows scrolled into view, so that instructors can scroll
+// and sort hundreds of performers without paging. Marks arrive packed into
+// one string per performer, aligned with the playlist columns. Results
+// submitted while the page is open are streamed in as they land.
+(function ($) {
+  const ROW_HEIGHT = 24; // px, must match .activity-grid-row in dashboard.css
+  const OVERSCAN = 10; // rows rendered above and below the viewport
+
+  const MARK_CLASSES = {
+    P: ["true due-date-on-time", "On time"],
+    C: ["true no-due-date", "Complete"],
+    T: ["true due-date-tardy", ">=1 Hour Late"],
+    L: ["true due-date-late", ">5 Days Late"],
+    X: ["false did-not-finish", "Incomplete"],
+    "-": ["false no-perf-data", "No exercises played through"],
+  };
+
+  const FIXED_COLUMNS = [
+    { label: "Given name", field: "first_name" },
+    { label: "Surname", field: "last_name" },
+    { label: "Score", field: "score" },
+    { label: "Time (beta)", field: "time_elapsed" },
+  ];
+
+  function escapeHtml(text) {
+    return String(text == null ? "" : text).replace(/[&<>"']/g, function (c) {
+      return {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "'": "&#39;",
+      }[c];
+    });
+  }
+
+  function formatTime(totalSeconds) {
+    if (totalSeconds == null) {
+      return "—";
+    }
+    const hours = Math.floor(totalSeconds / 3600);
+    const minutes = Math.floor(totalSeconds / 60) % 60;
+    const seconds = Math.floor(totalSeconds) % 60;
+    if (hours >= 1) {
+      return hours + " hr " + minutes + " min";
+    }
+    return (minutes ? minutes + " min " : "") + seconds + " sec";
+  }
+
+  function markCell(mark) {
+    const cls = MARK_CLASSES[mark] || MARK_CLASSES["-"];
+    return '<span class="' + cls[0] + '" title="' + cls[1] + '"></span>';
+  }
+
+  function ActivityGrid($container, data) {
+    this.$container = $container;
+    this.sort = { column: null, descending: false };
+    this.load(data);
+  }
+
+  ActivityGrid.prototype.load = function (data) {
+    this.data = data;
+    this.fieldIndex = {};
+    data.fields.forEach((field, i) => (this.fieldIndex[field] = i));
+    this.rowById = {};
+    data.performers.forEach((row, i) => (this.rowById[row[this.fieldIndex.id]] = i));
+    this.playlistIndex = {};
+    data.playlists.forEach((key, i) => (this.playlistIndex[key] = i));
+    this.order = data.performers.map((_, i) => i);
+    this.rendered = null;
+    this.build();
+    this.render();
+  };
+
+  ActivityGrid.prototype.score = function (marks) {
+    let score = 0;
+    for (let i = 0; i < marks.length; i++) {
+      score += this.data.credits[marks[i]] || 0;
+    }
+    return Math.round(score * 10) / 10;
+  };
+
+  // Applies a cell event of the live stream: {performer, first_name,
+  // last_name, playlist, mark, time_elapsed}
+  ActivityGrid.prototype.applyDelta = function (delta) {
+    const f = this.fieldIndex;
+    let index = this.rowById[delta.performer];
+    if (index === undefined) {
+      if (this.data.filtered_by_group) {
+        return; // group membership of new performers is unknown here
+      }
+      const row = [];
+      row[f.id] = delta.performer;
+      row[f.first_name] = delta.first_name;
+      row[f.last_name] = delta.last_name;
+      row[f.groups] = "";
+      row[f.time_elapsed] = null;
+      row[f.score] = 0;
+      row[f.marks] = "-".repeat(this.data.playlists.length);
+      index = this.data.performers.push(row) - 1;
+      this.rowById[delta.performer] = index;
+      this.order.push(index);
+      this.$spacer.css("height", this.order.length * ROW_HEIGHT + "px");
+      this.$container
+        .find(".activity-grid-summary")
+        .text(this.order.length + " performers");
+    }
+    const row = this.data.performers[index];
+    const column = this.playlistIndex[delta.playlist];
+    if (column !== undefined && delta.mark) {
+      const marks = row[f.marks];
+      row[f.marks] = marks.slice(0, column) + delta.mark + marks.slice(column + 1);
+      row[f.score] = this.score(row[f.marks]);
+    }
+    row[f.time_elapsed] = delta.time_elapsed;
+    this.render(true);
+  };
+
+  ActivityGrid.prototype.build = function () {
+    const headers = FIXED_COLUMNS.map(
+      (col, i) =>
+        '<div class="activity-grid-cell activity-grid-sortable" data-fixed="' +
+        i +
+        '">' +
+        escapeHtml(col.label) +
+        "</div>"
+    ).concat(
+      this.data.columns.map(
+        (label, i) =>
+          '<div class="activity-grid-cell activity-grid-sortable activity-grid-mark" data-playlist="' +
+          i +
+          '" title="' +
+          escapeHtml(this.data.playlists[i]) +
+          '">' +
+          escapeHtml(label) +
+          "</div>"
+      )
+    );
+    this.$container.html(
+      '<div class="activity-grid-summary">' +
+        this.data.performers.length +
+        " performers</div>" +
+        '<div class="activity-grid-viewport">' +
+        '<div class="activity-grid-header activity-grid-row">' +
+        headers.join("") +
+        "</div>" +
+        '<div class="activity-grid-spacer"></div>' +
+        "</div>"
+    );
+    this.$viewport = this.$container.find(".activity-grid-viewport");
+    this.$spacer = this.$container.find(".activity-grid-spacer");
+    this.$spacer.css("height", this.order.length * ROW_HEIGHT + "px");
+
+    let frame = null;
+    this.$viewport.on("scroll", () => {
+      if (frame === null) {
+        frame = window.requestAnimationFrame(() => {
+          frame = null;
+          this.render();
+        });
+      }
+    });
+    this.$container.on("click", ".activity-grid-sortable", (e) => {
+      const $header = $(e.currentTarget);
+      const fixed = $header.data("fixed");
+      this.sortBy(
+        fixed !== undefined
+          ? { field: FIXED_COLUMNS[fixed].field }
+          : { playlist: $header.data("playlist") }
+      );
+    });
+  };
+
+  ActivityGrid.prototype.sortValue = function (column, row) {
+    if (column.playlist !== undefined) {
+      // best marks first when ascending, as in the pass mark ranking
+      return "PTLCX-".indexOf(row[this.fieldIndex.marks][column.playlist]);
+    }
+    const value = row[this.fieldIndex[column.field]];
+    return typeof value === "string" ? value.toLowerCase() : value;
+  };
+
+  ActivityGrid.prototype.sortBy = function (column) {
+    const key = JSON.stringify(column);
+    this.sort.descending = this.sort.column === key && !this.sort.descending;
+    this.sort.column = key;
+    const rows = this.data.performers;
+    const sign = this.sort.descending ? -1 : 1;
+    const values = rows.map((row) => this.sortValue(column, row));
+    this.order.sort((a, b) => {
+      const va = values[a];
+      const vb = values[b];
+      if (va === vb) {
+        return a - b;
+      }
+      if (va == null) {
+        return 1;
+      }
+      if (vb == null) {
+        return -1;
+      }
+      return (va < vb ? -1 : 1) * sign;
+    });
+    this.render(true);
+  };
+
+  ActivityGrid.prototype.renderRow = function (row, top) {
+    const f = this.fieldIndex;
+    const cells = [
+      escapeHtml(row[f.first_name]),
+      escapeHtml(row[f.last_name]),
+      escapeHtml(row[f.score]),
+      formatTime(row[f.time_elapsed]),
+    ].map((text) => '<div class="activity-grid-cell">' + text + "</div>");
+    const marks = row[f.marks];
+    for (let i = 0; i < marks.length; i++) {
+      cells.push(
+        '<div class="activity-grid-cell activity-grid-mark">' +
+          markCell(marks[i]) +
+          "</div>"
+      );
+    }
+    return (
+      '<div class="activity-grid-row" style="top:' +
+      top +
+      'px">' +
+      cells.join("") +
+      "</div>"
+    );
+  };
+
+  ActivityGrid.prototype.render = function (force) {
+    const scrollTop = this.$viewport.scrollTop();
+    const height = this.$viewport.innerHeight();
+    const first = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN);
+    const last = Math.min(
+      this.order.length,
+      Math.ceil((scrollTop + height) / ROW_HEIGHT) + OVERSCAN
+    );
+    if (!force && this.rendered && this.rendered[0] === first && this.rendered[1] === last) {
+      return;
+    }
+    this.rendered = [first, last];
+    const html = [];
+    for (let i = first; i < last; i++) {
+      html.push(this.renderRow(this.data.performers[this.order[i]], i * ROW_HEIGHT));
+    }
+    this.$spacer.html(html.join(""));
+  };
+
+  // Live updates: cell events over server-sent events, falling back to
+  // polling the data endpoint, which answers 304 until the course changes.
+  const POLL_INTERVAL = 15000; // ms
+
+  function watch($container, onDelta, onChange) {
+    let pollTimer = null;
+
+    function poll() {
+      $.ajax({ url: $container.data("url"), dataType: "json", ifModified: true })
+        .done(function (data, status) {
+          if (status !== "notmodified" && data) {
+            onChange(data);
+          }
+        })
+        .always(function () {
+          pollTimer = window.setTimeout(poll, POLL_INTERVAL);
+        });
+    }
+
+    function startPolling() {
+      if (pollTimer === null) {
+        // prime the ETag so that only later changes count
+        $.ajax({ url: $container.data("url"), dataType: "json", ifModified: true }).always(
+          function () {
+            pollTimer = window.setTimeout(poll, POLL_INTERVAL);
+          }
+        );
+      }
+    }
+
+    if (!window.EventSource) {
+      startPolling();
+      return;
+    }
+    const source = new EventSource($container.data("events-url"));
+    source.addEventListener("cell", function (e) {
+      onDelta(JSON.parse(e.data));
+    });
+    source.onerror = function () {
+      // the browser retries by itself unless the stream was refused
+      if (source.readyState === EventSource.CLOSED) {
+        startPolling();
+      }
+    };
+  }
+
+  $(function () {
+    const $container = $("#course-activity-grid");
+    const $notice = $("#course-activity-live-notice");
+    let grid = null;
+    let pending = 0;
+
+    function notify() {
+      pending += 1;
+      $notice
+        .text(pending + " new result(s) since this page was loaded. Refresh to update the table.")
+        .show();
+    }
+
+    if ($container.length) {
+      watch(
+        $container,
+        (delta) => (grid ? grid.applyDelta(delta) : notify()),
+        (data) => (grid ? grid.load(data) : notify())
+      );
+    }
+
+    $("#course-activity-grid-toggle").on("click", function () {
+      const $button = $(this);
+      $button.prop("disabled", true);
+      $.getJSON($container.data("url"))
+        .done(function (data) {
+          $(".table-container").hide();
+          $button.hide();
+          $notice.hide();
+          $container.show();
+          grid = new ActivityGrid($container, data);
+        })
+        .fail(function () {
+          $button.prop("disabled", false);
+        });
+    });
+  });
+})(jQuery);
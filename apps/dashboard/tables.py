@@ -1,9 +1,12 @@
 from django.contrib.auth import get_user_model
 from django_tables2 import tables, A, columns
 from django.db import models
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.contrib.postgres.fields.jsonb import KeyTextTransform
 
+from apps.dashboard.course_activity import CourseMarkMatrix
+
 User = get_user_model()
 
 
@@ -13,7 +16,6 @@ User = get_user_model()
 class ConnectionsTable(tables.Table):
     class Meta:
         attrs = {"class": "paleblue"}
-        table_pagination = False
         template_name = "django_tables2/bootstrap4.html"
 
     email = tables.columns.Column(
@@ -66,63 +68,53 @@ class ConnectionsTable(tables.Table):
         orderable=False,
     )
 
+    # Records are apps.accounts.models.Connection rows of the requesting user
+
     def render_last_name(self, record):
-        if (
-            self.request.user.id in record["other"].content_permits
-            or self.request.user.id in record["other"].performance_permits
-        ):
-            return record["other"].last_name
+        if record.content_access or record.performance_access:
+            return record.other.last_name
         else:
             return ""
 
     def render_first_name(self, record):
-        if (
-            self.request.user.id in record["other"].content_permits
-            or self.request.user.id in record["other"].performance_permits
-        ):
-            return record["other"].first_name
+        if record.content_access or record.performance_access:
+            return record.other.first_name
         else:
             return ""
 
     def render_signup_date(self, record):
-        if (
-            self.request.user.id in record["other"].content_permits
-            or self.request.user.id in record["other"].performance_permits
-        ):
-            return record["other"].date_joined
+        if record.content_access or record.performance_access:
+            return record.other.date_joined
         else:
             return ""
 
     def render_toggle_content_permit(self, record):
-        if int(record["other"].id) in self.request.user.content_permits:
+        if record.content_permit:
             return "YES"
         else:
             return "no"
-        return ""
 
     def render_toggle_performance_permit(self, record):
-        if int(record["other"].id) in self.request.user.performance_permits:
+        if record.performance_permit:
             return "YES"
         else:
             return "no"
-        return ""
 
     def render_content_access(self, record):
-        if self.request.user.id in record["other"].content_permits:
+        if record.content_access:
             return "Courses"
         return ""
 
     def render_performance_access(self, record):
-        if self.request.user.id in record["other"].performance_permits:
+        if record.performance_access:
             return "Performances"
         return ""
 
     def render_pinned(self, record):
-        if int(record["other"].id) in self.request.user.connections_list:
+        if record.pinned:
             return "YES"
         else:
             return "no"
-        return ""
 
     # Note: Ordering based on non-database fields appears impossible
     # according to this: https://github.com/jieter/django-tables2/issues/161
@@ -148,12 +140,15 @@ class MyActivityTable(tables.Table):
         accessor=("playlist.name"),
         # attrs={"td": {"style": "white-space:nowrap", "width": "auto"}}
     )
+    # passed and pass_date are set in bulk by set_playlist_pass_status
     playlist_passed = tables.columns.BooleanColumn(
         verbose_name="Passed",
+        accessor=A("passed"),
         orderable=False,  # ordering fails
     )
     playlist_pass_date = tables.columns.DateColumn(
         verbose_name="Pass Date",
+        accessor=A("pass_date"),
         format="Y_m_d (D) H:i",  # ineffective
         orderable=False,  # ordering fails
     )
@@ -186,11 +181,8 @@ class MyActivityTable(tables.Table):
     # add performer_given_name, performer_surname, performer_email
     # like in MyActivityTable
 
-    def value_playlist_passed(self, record):
-        return record.playlist_passed
-
-    def render_playlist_pass_date(self, record):
-        return record.playlist_pass_date
+    def render_playlist_pass_date(self, value):
+        return value
 
     class Meta:
         attrs = {"class": "paleblue"}
@@ -558,12 +550,22 @@ class CourseActivityTable(tables.Table):
     # performer_email = tables.columns.Column(
     #     verbose_name='Email',
     # )
-    performer_first_name = tables.columns.Column(verbose_name="Given name")
-    performer_last_name = tables.columns.Column(verbose_name="Surname")
-    # groups = tables.columns.Column(verbose_name="Group(s)")
+    # pk breaks ties so that rows keep their page when sorting
+    performer_first_name = tables.columns.Column(
+        verbose_name="Given name", order_by=("performer_first_name", "pk")
+    )
+    performer_last_name = tables.columns.Column(
+        verbose_name="Surname", order_by=("performer_last_name", "pk")
+    )
+    groups = tables.columns.Column(
+        verbose_name="Group(s)",
+        empty_values=(()),
+        orderable=False,
+    )
     time_elapsed = tables.columns.Column(
         verbose_name="Time (beta)",
         attrs={"td": {"style": "white-space:nowrap"}},
+        order_by=("time_elapsed", "pk"),
         orderable=True,
     )
     result_count = tables.columns.Column(
@@ -591,10 +593,24 @@ class CourseActivityTable(tables.Table):
             "...",
         ]
 
-    def __init__(self, course, **kwargs):
+    # Records are users annotated by apps.dashboard.course_activity.course_activity_performers
+
+    def __init__(self, course, playlist_keys=(), **kwargs):
         self.course = course
+        self.playlist_keys = list(playlist_keys)
         super().__init__(**kwargs)
 
+    @cached_property
+    def mark_matrix(self):
+        # built from the records of the visible page only; iterating them here
+        # evaluates the same sliced queryset that rendering then reuses
+        return CourseMarkMatrix(
+            self.course, self.paginated_rows.data, self.playlist_keys
+        )
+
+    def render_groups(self, record):
+        return ", ".join([str(g) for g in getattr(record, "filtered_groups", [])])
+
     def render_time_elapsed(self, value):
         total_seconds = value
         hours = int(total_seconds // 3600)
@@ -620,30 +636,14 @@ class CourseActivityTable(tables.Table):
         return rendered_time
 
     def render_result_count(self, record):
-        result_count = {"P": 0, "C": 0, "T": 0, "L": 0, "X": 0}
-        for key, value in record.items():
-            if value in result_count:
-                result_count[value] += 1
+        result_count = self.mark_matrix.result_count(record)
         return format_html(
             f"{result_count['X']} {x_element} / {result_count['P']} {p_element} / {result_count['C']} {c_element} / {result_count['T']} {t_element} / {result_count['L']} {l_element}"
         )
 
     def render_score(self, record):
-        timely_credit = self.course.timely_credit
-        tardy_credit = self.course.tardy_credit
-        late_credit = self.course.late_credit
-        result_count = {"P": 0, "C": 0, "T": 0, "L": 0, "X": 0}
-        for key, value in record.items():
-            if value in result_count:
-                result_count[value] += 1
-        score = (
-            result_count["P"] * timely_credit
-            + result_count["C"] * timely_credit
-            + result_count["T"] * tardy_credit
-            + result_count["L"] * late_credit
-        )
         # make this column orderable
-        return round(score, 1)
+        return self.mark_matrix.score(record)
 
 
 class GroupsListTable(tables.Table):
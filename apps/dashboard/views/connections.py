@@ -6,6 +6,7 @@ from django_tables2 import RequestConfig
 from django.db.models.functions import Concat
 from django.db.models import F, Value, CharField, Case, Value, When, BooleanField
 
+from apps.accounts.models import Connection
 from apps.dashboard.forms import (
     AddConnectionForm,
     RemoveConnectionConfirmationForm,
@@ -43,44 +44,26 @@ def courses_by_others_view(request):
 
 @login_required
 def connections_view(request):
-    # initial solution for desired ordering of connections table
-    q1 = Q(id__in=request.user.connections_list)
-    q2 = Q(id__in=request.user.content_permits)
-    q3 = Q(id__in=request.user.performance_permits)
-    q4 = Q(content_permits__contains=request.user.id)
-    q5 = Q(performance_permits__contains=request.user.id)
-
-    connections = User.objects.filter(id__in=request.user.connections).annotate(
-        combined_info=Concat(
-            F("last_name"), # TO DO: do not expose this information to search unless q4 or q5
-            Value(", "),
-            F("first_name"), # TO DO: do not expose this information to search unless q4 or q5
-            Value(" • "),
-            F("email"),
-            output_field=CharField(),
-        ),
-        pinned=Case(
-            When(q1, then=Value(True)),
-            default=Value(False),
-            output_field=BooleanField(),
-        ),
-        no_access=Case(
-            When(q4, then=Value(False)),
-            When(q5, then=Value(False)),
-            default=Value(True),
-            output_field=BooleanField(),
-        ),
-        performance_permit=Case(
-            When(q3, then=Value(True)),
-            default=Value(False),
-            output_field=BooleanField(),
-        ),
-        content_access=Case(
-            When(q4, then=Value(True)),
-            default=Value(False),
-            output_field=BooleanField(),
+    connections = (
+        Connection.objects.filter(user=request.user)
+        .select_related("other")
+        .annotate(
+            combined_info=Concat(
+                F("other__last_name"), # TO DO: do not expose this information to search unless content_access or performance_access
+                Value(", "),
+                F("other__first_name"), # TO DO: do not expose this information to search unless content_access or performance_access
+                Value(" • "),
+                F("other__email"),
+                output_field=CharField(),
+            ),
+            no_access=Case(
+                When(Q(content_access=False, performance_access=False), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
         )
-    ).order_by("-pinned", "-no_access", "-performance_permit", "-content_access", "-date_joined")
+        .order_by("-pinned", "-no_access", "-performance_permit", "-content_access", "-other__date_joined")
+    )
 
     combined_info_filter = ConnectionCombinedInfoFilter(
         queryset=connections.all(), data=request.GET
@@ -92,10 +75,8 @@ def connections_view(request):
     if combined_info_search:
         connections = connections.filter(combined_info__icontains=combined_info_search)
 
-    connections_table = ConnectionsTable(
-        [{"other": x, "user": request.user} for x in connections],
-    )
-    RequestConfig(request).configure(connections_table)
+    connections_table = ConnectionsTable(connections)
+    RequestConfig(request, paginate={"per_page": 50}).configure(connections_table)
 
     if request.method == "POST":
         form = AddConnectionForm(data={"email": request.POST.get("email").lower()})
@@ -1,20 +1,31 @@
 from copy import copy
+import csv
 import datetime
+import hashlib
 import pytz
-import re
 import math
 
-from django.db.models import Q
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.safestring import mark_safe
-from django.views.decorators.cache import cache_page
-from django_tables2 import RequestConfig, Column
-
+from django.views.decorators.http import condition
+from django_tables2 import A, RequestConfig, Column
+
+from apps.dashboard.course_activity import (
+    CourseColumns,
+    CourseActivityEventStream,
+    CourseMarkMatrix,
+    course_activity_performers,
+    course_attempt_rows,
+    course_grade_rows,
+    performed_playlist_keys,
+)
 from apps.dashboard.filters import (
     CourseActivityGroupsFilter,
     CourseActivityOrderFilter,
@@ -28,10 +39,15 @@ from apps.dashboard.tables import (
 from apps.exercises.models import (
     Course,
     PerformanceData,
-    Playlist,
     PlaylistCourseOrdered,
 )
+from apps.exercises.utils.csv_stream import Echo
+from apps.exercises.utils.generations import (
+    cache_page_by_generations,
+    generation_cache_key,
+)
 from apps.accounts.models import Group, User
+from harmony.query_profile import query_budget
 
 
 @login_required
@@ -227,40 +243,14 @@ def course_delete_view(request, course_id):
     return render(request, "dashboard/delete-confirmation.html", context)
 
 
-def playlist_column_verbose_name(playlist_id, course):
-    playlist = Playlist.objects.filter(id=playlist_id).first()
-    if playlist != None:
-        pco = PlaylistCourseOrdered.objects.filter(
-            Q(playlist_id=playlist._id) & Q(course_id=course._id)
-        )
-        if len(pco) > 0:
-            return "#" + str(pco.first().order)
-    return playlist_id
-
-
-# Keys within a course's performance_dict that don't correspond with a playlist
-reserved_dict_keys = {
-    "performer",
-    "performer_name",
-    "performer_last_name",
-    "performer_first_name",
-    "groups",
-    "time_elapsed",
-    "reset",
-}
-
+# Change this to alter the number of displayed performers per page.
+PERFORMERS_PER_PAGE = 35
 
-@login_required
-# @cache_page(60 * 15)
-def course_activity_view(request, course_id):
-    course = get_object_or_404(Course, id=course_id)
-
-    if request.user != course.authored_by:
-        raise PermissionDenied
-
-    # Change this to alter the number of displayed performers per page.
-    performers_per_page = 35
 
+def filter_course_activity(request, course):
+    """
+    Applies the group and unit filters of the course activity page to course.
+    """
     group_filter = CourseActivityGroupsFilter(
         queryset=course.visible_to.all(), data=request.GET
     )
@@ -272,131 +262,67 @@ def course_activity_view(request, course_id):
     unitnumber_filter.form.is_valid()
 
     curr_group_ids = [int(g) for g in group_filter.form.cleaned_data["groups"] or []]
-    curr_groups = Group.objects.filter(id__in=curr_group_ids)
-
-    performers = User.objects.filter(pk__in=request.user.content_permits)
-    if len(curr_group_ids) > 0:
-        performers = performers.filter(participant_groups__id__in=curr_group_ids)
-
-    performance_dict = course.performance_dict
-    data = {
-        performer: {
-            "performer": performer,  # n.b. not a string!
-            "performer_name": performer.get_full_name(),
-            "performer_last_name": performer.last_name,
-            "performer_first_name": performer.first_name,
-            "groups": ", ".join(
-                [
-                    str(g)
-                    for g in curr_groups.intersection(
-                        performer.participant_groups.all()
-                    )
-                ]
-            ),
-            **performance_dict.get(str(performer), {}),
-        }
-        # course's performers + author
-        for performer in list(performers) + [request.user]
-    }
 
-    if len(curr_group_ids) == 0:
-        # omit performers who have zero performances for this playlist
-        relevant_data = {
-            key: value for (key, value) in data.items() if len(value.keys()) > 5
-        }
-        # ^ The test, > 5, must correspond to the number of fields written to data for each performance
-    else:
-        relevant_data = data
-
-    # add creator, with special name formatting to bring it to the top/bottom when sorting
-    for performer in [request.user]:
-        relevant_data[performer] = {
-            "performer": performer,  # n.b. not a string!
-            "performer_name": performer.get_full_name(),
-            "performer_last_name": "*" + str(performer.last_name).upper() + "*",
-            "performer_first_name": "*" + str(performer.first_name).upper() + "*",
-            "groups": ", ".join([]),
-            **performance_dict.get(str(performer), {}),
-        }
-
-    # get playlist keys
-    relevant_data_keys_per_performer = [
-        value.keys() for (key, value) in relevant_data.items()
-    ]
-
-    course_pcos = PlaylistCourseOrdered.objects.filter(
-        course_id=course._id
-    ).prefetch_related("playlist")
+    performers = course_activity_performers(course, request.user, curr_group_ids)
 
     min_unit_num = unitnumber_filter.form.cleaned_data["min_unit_num"]
     max_unit_num = unitnumber_filter.form.cleaned_data["max_unit_num"]
-    filtered_unit_num = False
-    if min_unit_num or max_unit_num:
-        filtered_unit_num = True
-        if min_unit_num:
-            course_pcos = course_pcos.filter(order__gte=min_unit_num)
-        if max_unit_num:
-            course_pcos = course_pcos.filter(order__lte=max_unit_num)
-    filtered_pco_ids = set([pco.playlist.id for pco in course_pcos])
-
-    compiled_playlist_keys = set()
-    for i in range(0, len(relevant_data_keys_per_performer)):
-        # Combining existing playlist keys with any new keys from this performer
-        # We iterate through each performer instead of relying on course_pcos because
-        #    performers' performed playlists may have since been removed from the course (and therefore no longer have a PCO)
-        compiled_playlist_keys = compiled_playlist_keys.union(
-            set(
-                [
-                    key
-                    for key in relevant_data_keys_per_performer[i]
-                    if
-                    # if this key corresponds to a playlist (order or id)
-                    not key in reserved_dict_keys
-                    # if this key should be filtered out based on the unit filter
-                    and (not filtered_unit_num or key in filtered_pco_ids)
-                ]
-            )
-        )
 
-    for performer, performance_data in relevant_data.items():
-        relevant_data[performer] = {
-            k: v
-            for k, v in performance_data.items()
-            if k in compiled_playlist_keys or k in reserved_dict_keys
-        }
-
-    compiled_playlist_keys = list(compiled_playlist_keys)
-
-    # Sort playlist keys: playlist IDs first, according to their order of presentation in the course, then legacy order values
-    url_id_to_order = {}
-    for i in range(0, len(course_pcos)):
-        url_id_to_order[course_pcos[i].playlist.id] = course_pcos[i].order
-    compiled_playlist_keys.sort(
-        key=lambda p: (
-            int(p) if re.match("^[0-9]+$", p) else -1,  # order
-            0 if url_id_to_order.get(str(p)) else 1,
-            str(p)
-            if re.match("^P[A-Z][0-9]+[A-Z]+$", p)
-            and not url_id_to_order.get(
-                str(p)
-            )  # playlist.id of playlists not longer in course
-            else "O",  # show as de-accessioned in the table
-            url_id_to_order[str(p)]
-            if re.match("^P[A-Z][0-9]+[A-Z]+$", p)
-            and url_id_to_order.get(str(p))  # playlist.id of playlists in course
-            else None,
-        ),
-        reverse=False,
+    # Combining the playlist keys of all listed performers, rather than relying on the course's PCOs, because
+    #    performers' performed playlists may have since been removed from the course (and therefore no longer have a PCO)
+    course_columns = CourseColumns(course)
+    compiled_playlist_keys = course_columns.playlist_keys(
+        performed_playlist_keys(performers), min_unit_num, max_unit_num
     )
 
+    return {
+        "group_filter": group_filter,
+        "unitnumber_filter": unitnumber_filter,
+        "group_ids": curr_group_ids,
+        "performers": performers,
+        "columns": course_columns,
+        "playlist_keys": compiled_playlist_keys,
+    }
+
+
+def course_activity_generation_sources(request, course_id):
+    # the table depends on the course (incl. its PCOs and performance_dict)
+    # and on the instructor (content permits and managed groups)
+    course = Course.objects.filter(id=course_id).first()
+    if course is None:
+        return None
+    return [course, request.user]
+
+
+# up to 6 queries of the database cache on a miss
+@query_budget(17)
+@login_required
+@cache_page_by_generations("course_activity", course_activity_generation_sources)
+def course_activity_view(request, course_id):
+    course = get_object_or_404(Course, id=course_id)
+
+    if request.user != course.authored_by:
+        raise PermissionDenied
+
+    activity = filter_course_activity(request, course)
+    # lazy; only the visible page of performers is fetched
+    performers = activity["performers"]
+    compiled_playlist_keys = activity["playlist_keys"]
+    course_columns = activity["columns"]
+    curr_group_ids = activity["group_ids"]
+    group_filter = activity["group_filter"]
+    unitnumber_filter = activity["unitnumber_filter"]
+
     table = CourseActivityTable(
         course=course,
-        data=relevant_data.values(),
+        playlist_keys=compiled_playlist_keys,
+        data=performers,
         extra_columns=[
             (
                 str(idx),
                 PlaylistActivityColumn(
-                    verbose_name=playlist_column_verbose_name(str(idx), course),
+                    accessor=A("course_record." + str(idx)),
+                    verbose_name=course_columns.label(idx),
                     empty_values=(()),
                     orderable=False,
                 ),
@@ -408,7 +334,7 @@ def course_activity_view(request, course_id):
     if len(curr_group_ids) == 0:
         table.exclude = ("groups",)
 
-    RequestConfig(request, paginate={"per_page": performers_per_page}).configure(table)
+    RequestConfig(request, paginate={"per_page": PERFORMERS_PER_PAGE}).configure(table)
 
     return render(
         request,
@@ -420,3 +346,122 @@ def course_activity_view(request, course_id):
             "filters": {"group": group_filter, "unitnumber": unitnumber_filter},
         },
     )
+
+
+def course_activity_data_etag(request, course_id):
+    sources = course_activity_generation_sources(request, course_id)
+    if sources is None:
+        return None
+    key = generation_cache_key(
+        "course_activity_data", *sources, extra=request.get_full_path()
+    )
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+# up to 6 queries of the database cache on a miss
+@query_budget(18)
+@login_required
+@condition(etag_func=course_activity_data_etag)
+@cache_page_by_generations("course_activity_data", course_activity_generation_sources)
+def course_activity_data_view(request, course_id):
+    """
+    The whole (filtered) course activity table as compact JSON, for the
+    client-side grid: one row per performer, with their pass marks packed into
+    a single string aligned with the "playlists" and "columns" arrays.
+    """
+    course = get_object_or_404(Course, id=course_id)
+
+    if request.user != course.authored_by:
+        raise PermissionDenied
+
+    activity = filter_course_activity(request, course)
+    matrix = CourseMarkMatrix(
+        course, activity["performers"].only("id"), activity["playlist_keys"]
+    )
+
+    return JsonResponse(
+        {
+            "playlists": matrix.playlist_keys,
+            "columns": [activity["columns"].label(key) for key in matrix.playlist_keys],
+            "credits": {
+                "P": float(course.timely_credit),
+                "C": float(course.timely_credit),
+                "T": float(course.tardy_credit),
+                "L": float(course.late_credit),
+            },
+            "filtered_by_group": bool(activity["group_ids"]),
+            "fields": ["id", "first_name", "last_name", "groups", "time_elapsed", "score", "marks"],
+            "performers": [
+                [
+                    performer.pk,
+                    performer.performer_first_name,
+                    performer.performer_last_name,
+                    ", ".join([str(g) for g in getattr(performer, "filtered_groups", [])]),
+                    performer.time_elapsed,
+                    float(matrix.score(performer)),
+                    matrix.mark_string(performer),
+                ]
+                for performer in matrix.performers
+            ],
+        },
+        json_dumps_params={"separators": (",", ":")},
+    )
+
+
+@login_required
+def course_activity_events_view(request, course_id):
+    course = get_object_or_404(Course, id=course_id)
+
+    if request.user != course.authored_by:
+        raise PermissionDenied
+
+    # course's performers + author
+    performer_ids = set(request.user.content_permits) | {request.user.id}
+    events = CourseActivityEventStream.open(course, performer_ids)
+    if events is None:
+        # the page falls back to polling when the stream is refused
+        response = HttpResponse("Too many live streams, try again later", status=503)
+        response["Retry-After"] = "60"
+        return response
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let a proxy buffer the stream
+    return response
+
+
+@login_required
+def course_activity_export_view(request, course_id):
+    """
+    Streams the (filtered) course activity as CSV: grades by default, or every
+    exercise attempt with ?details=1.
+    """
+    course = get_object_or_404(Course, id=course_id)
+
+    if request.user != course.authored_by:
+        raise PermissionDenied
+
+    activity = filter_course_activity(request, course)
+    # the instructor's own row is not part of a grade book
+    performers = activity["performers"].exclude(pk=request.user.pk)
+    if request.GET.get("details"):
+        rows = course_attempt_rows(
+            course, performers, activity["playlist_keys"], activity["columns"]
+        )
+        export_name = "attempts"
+    else:
+        rows = course_grade_rows(
+            course,
+            performers,
+            activity["playlist_keys"],
+            activity["columns"],
+            activity["group_ids"],
+        )
+        export_name = "grades"
+
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows), content_type="text/csv"
+    )
+    filename = f"{course.id}_{export_name}_{timezone.now().date()}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
@@ -2,34 +2,59 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404, render
+from django.urls import NoReverseMatch, reverse
 from django.utils.safestring import mark_safe
 from django_tables2 import RequestConfig, Column
+from collections import defaultdict
 from datetime import datetime
 import pytz
 
+from apps.accounts.permissions import get_permit_resolver
 from apps.dashboard.tables import MyActivityTable, MyActivityDetailsTable
-from apps.exercises.models import Course, PerformanceData, Playlist
+from apps.exercises.models import (
+    Course,
+    ExercisePlaylistOrdered,
+    PerformanceData,
+    Playlist,
+)
 from django.conf import settings
 
 User = get_user_model()
 
+# performed_at is written to the performance data per UTC; pass dates are shown
+# in the timezone of the course
+UTC = pytz.utc
+LOCAL_TIMEZONE = pytz.timezone(settings.TIME_ZONE)
+PERFORMED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+TEMPO_RATINGS = [
+    "",
+    "<br>Tempo erratic",
+    "<br>Tempo unsteady",
+    "<br>Tempo steady",
+    "<br>Tempo very steady",
+    "<br>Tempo perfectly steady",
+]
+
 
 @login_required
 def performances_list_view(request, other_id=None):
     other_id = other_id or request.user.id
     other = get_object_or_404(User, id=other_id)
 
-    if request.user != other and not request.user.pk in other.performance_permits:
+    if not get_permit_resolver(request).has_performance_permit(other):
         raise PermissionDenied
 
-    performances = PerformanceData.objects.filter(user=other).select_related(
-        "user", "playlist", "course"
+    performances = list(
+        PerformanceData.objects.filter(user=other)
+        .select_related("user", "playlist", "course")
+        .order_by("-updated")
     )
-
     table = MyActivityTable(performances)
     performer_name = other
 
     RequestConfig(request).configure(table)
+    # only the rows of the page are shown (passed and pass_date are not orderable)
+    set_playlist_pass_status([row.record for row in table.paginated_rows])
     return render(
         request,
         "dashboard/performances-list.html",
@@ -37,6 +62,41 @@ def performances_list_view(request, other_id=None):
     )
 
 
+def set_playlist_pass_status(performances):
+    """
+    Sets the plain `passed` and `pass_date` attributes read by MyActivityTable
+    on each performance, evaluating the exercise list of every playlist once.
+    """
+    # the exercise lists of untransposed playlists come from a single query
+    exercise_lists = defaultdict(list)
+    for playlist_pk, exercise_id in (
+        ExercisePlaylistOrdered.objects.filter(
+            playlist__in=[
+                performance.playlist_id
+                for performance in performances
+                if not performance.playlist.is_transposed()
+            ]
+        )
+        .order_by("order")
+        .values_list("playlist", "exercise__id")
+    ):
+        exercise_lists[playlist_pk].append(exercise_id)
+
+    for performance in performances:
+        if performance.playlist_id not in exercise_lists:
+            # transposed, or without exercises
+            exercise_lists[performance.playlist_id] = performance.playlist.exercise_list
+        exercise_list = exercise_lists[performance.playlist_id]
+        performance.passed = playlist_pass_bool(
+            exercise_list, performance.data, len(exercise_list)
+        )
+        performance.pass_date = (
+            playlist_pass_date(exercise_list, performance.data, len(exercise_list))
+            if performance.passed
+            else None
+        )
+
+
 def playlist_pass_bool(exercise_list, exercises_data, playlist_length):
     parsed_data = {}
 
@@ -101,18 +161,89 @@ def playlist_pass_date(
 
     if make_concise_and_localize:  # for certain Django table renders
         # UTC is assumed here since the performed_at property is written to the performance database per UTC
-        pl_pass_date = datetime.strptime(
-            pl_pass_date_utc_str, "%Y-%m-%d %H:%M:%S"
-        ).replace(tzinfo=pytz.timezone("UTC"))
         # for the user, interpret the pass_date in terms of the timezone for the course
-        return datetime.strftime(
-            pl_pass_date.astimezone(pytz.timezone(settings.TIME_ZONE)),
-            "%Y_%m_%d (%a) %H:%M",
-        )
+        return localize_performed_at(pl_pass_date_utc_str, "%Y_%m_%d (%a) %H:%M")
     else:
         return pl_pass_date_utc_str
 
 
+def localize_performed_at(performed_at, format):
+    performed_at = datetime.strptime(performed_at, PERFORMED_AT_FORMAT)
+    return datetime.strftime(
+        performed_at.replace(tzinfo=UTC).astimezone(LOCAL_TIMEZONE), format
+    )
+
+
+def exercise_results_by_id(exercises_data):
+    """
+    Returns the first pass date and the latest attempt of every exercise
+    performed, in a single pass over the performance data.
+    """
+    first_passes = {}
+    latest_results = {}
+    for exercise in exercises_data:
+        exercise_id = exercise["id"]
+        latest_results[exercise_id] = exercise
+        if exercise_id not in first_passes and exercise["error_tally"] in [0, -1, "n/a"]:
+            first_passes[exercise_id] = exercise["performed_at"]
+    return first_passes, latest_results
+
+
+def playlist_exercise_urls(playlist, exercises, course_id):
+    """
+    Returns the play URLs of the playlist's exercises by exercise number, and
+    by id for the first occurrence of each exercise.
+    """
+    urls_by_num = []
+    for num in range(1, len(exercises) + 1):
+        try:
+            urls_by_num.append(
+                reverse(
+                    "lab:playlist-view",
+                    kwargs={
+                        "playlist_id": playlist.id,
+                        "course_id": course_id,
+                        "exercise_num": num,
+                    },
+                )
+            )
+        except NoReverseMatch:
+            urls_by_num.append(None)
+    urls_by_id = {}
+    for exercise_id, url in zip(exercises, urls_by_num):
+        urls_by_id.setdefault(exercise_id, url)
+    return urls_by_num, urls_by_id
+
+
+def exercise_result_cell(exercise, first_pass, url):
+    error_tally = exercise["error_tally"]
+    has_errors = isinstance(error_tally, int) and error_tally > 0
+    tempo_display_factor = 1
+    # TO DO: include time signature in the performance data for this purpose?
+
+    cell = (
+        "PASS " + localize_performed_at(first_pass, "%y_%m_%d %H:%M") + "<br><br>"
+        if first_pass != False
+        else "TO DO<br><br>"
+    )
+    if has_errors:
+        cell += "Latest: errors (" + str(error_tally) + ")."
+    if isinstance(error_tally, int) and error_tally == -1:
+        cell += "Done "  # when is this shown?
+    if isinstance(error_tally, int) and error_tally == 0:
+        cell += "Latest: without error."
+    if not (has_errors or exercise["tempo_rating"] == None):
+        cell += TEMPO_RATINGS[round(exercise["tempo_rating"])]
+    if not (has_errors or "tempo_mean_semibreves_per_min" not in exercise):
+        cell += (
+            "<br> at "
+            + str(round(exercise["tempo_mean_semibreves_per_min"] * tempo_display_factor))
+            + " w.n.p.m.<br>"
+        )
+    cell += f'<br><a href="{url}">Play again</a>'
+    return mark_safe(cell)
+
+
 def playing_time(exercises_data):
     total_seconds = 0
     for completion in exercises_data:
@@ -142,10 +273,7 @@ def playlist_performance_view(request, performance_id):
     performer_id = performance.user.id
     performer = get_object_or_404(User, id=performer_id)
 
-    if (
-        not request.user.pk in performer.performance_permits
-        and not performer == request.user
-    ):
+    if not get_permit_resolver(request).has_performance_permit(performer):
         raise PermissionDenied
 
     # coded more cautiously because some of our performance data did not yet
@@ -155,6 +283,11 @@ def playlist_performance_view(request, performance_id):
     if course_id:
         course_name = Course.objects.get(id=course_id).title
 
+    exercises = [exercise for exercise in performance.playlist.exercise_list]
+    exercise_urls_by_num, exercise_urls = playlist_exercise_urls(
+        performance.playlist, exercises, course_id
+    )
+
     user_data = {
         "performance_obj": performance,
         "performer_id": performer.id,
@@ -163,7 +296,7 @@ def playlist_performance_view(request, performance_id):
         "course_name": course_name,
         "playlist_id": performance.playlist.id,
         "playlist_name": performance.playlist.name,
-        "playlist_length": len(performance.playlist.exercise_list),
+        "playlist_length": len(exercises),
         "performance_data": performance.data,
         # "exercise_count": len(performance.data), # replace line below?
     }
@@ -172,8 +305,6 @@ def playlist_performance_view(request, performance_id):
     data = []
     data.append(user_data)
 
-    exercises = [exercise for exercise in performance.playlist.exercise_list]
-
     for d in data:  # is not len(data) == 1?
         performance_obj = d["performance_obj"]
         exercises_data = d["performance_data"]
@@ -186,37 +317,12 @@ def playlist_performance_view(request, performance_id):
             exercises, exercises_data, d["playlist_length"]
         )  # why not len(exercise_list) ?!
 
-        for exercise in exercises_data:
-            tempo_display_factor = 1
-            # TO DO: include time signature in the performance data for this purpose?
-            # try:
-            #     print(exercise)
-            #     # get beat information from time signature
-            #     time_sig = exercise["time_signature"]
-            #     time_sig_numerator = int(time_sig.split("/")[0])
-            #     tempo_display_factor = int(time_sig.split("/")[1])
-            #     if time_sig_numerator > 3 and time_sig_numerator % 3 == 0:
-            #         # compound meter
-            #         tempo_display_factor /= 3
-            #     try:
-            #         float(tempo_display_factor)
-            #     except ValueError:
-            #         print("Unable to retrieve beat value from time signature")
-            # except:
-            #     print("Unable to retrieve beat value from time signature")
-
-            d.update(
-                **{
-                    exercise["id"]: mark_safe(
-                        f'{"PASS " + datetime.strftime(datetime.strptime(performance_obj.get_exercise_first_pass(exercise["id"]), "%Y-%m-%d %H:%M:%S").replace(tzinfo=pytz.timezone("UTC")).astimezone(pytz.timezone(settings.TIME_ZONE)), "%y_%m_%d %H:%M") + "<br><br>" if (performance_obj.get_exercise_first_pass(exercise["id"]) != False) else "TO DO<br><br>"}'
-                        f'{"Latest: errors (" + str(exercise["error_tally"]) + ")." if (isinstance(exercise["error_tally"], int) and exercise["error_tally"] > 0) else ""}'
-                        f'{"Done " if (isinstance(exercise["error_tally"], int) and exercise["error_tally"] == -1) else ""}'  # when is this shown?
-                        f'{"Latest: without error." if (isinstance(exercise["error_tally"], int) and exercise["error_tally"] == 0) else ""}'
-                        f'{"" if (isinstance(exercise["error_tally"], int) and exercise["error_tally"] > 0 or exercise["tempo_rating"] == None) else ["", "<br>Tempo erratic", "<br>Tempo unsteady", "<br>Tempo steady", "<br>Tempo very steady", "<br>Tempo perfectly steady"][round(exercise["tempo_rating"])]}'
-                        f'{"" if (isinstance(exercise["error_tally"], int) and exercise["error_tally"] > 0 or "tempo_mean_semibreves_per_min" not in exercise) else "<br> at " + str(round(exercise["tempo_mean_semibreves_per_min"] * tempo_display_factor)) + " w.n.p.m.<br>"}'
-                        f'<br><a href="{performance_obj.playlist.get_exercise_url_by_id(exercise["id"], course_id=course_id)}">Play again</a>'
-                    )
-                }
+        first_passes, latest_results = exercise_results_by_id(exercises_data)
+        for exercise_id, exercise in latest_results.items():
+            d[exercise_id] = exercise_result_cell(
+                exercise,
+                first_passes.get(exercise_id, False),
+                exercise_urls.get(exercise_id),
             )
 
     table = MyActivityDetailsTable(
@@ -227,9 +333,7 @@ def playlist_performance_view(request, performance_id):
                 Column(
                     verbose_name=str(num + 1),
                     orderable=False,
-                    default=mark_safe(
-                        f'<a href="{performance_obj.playlist.get_exercise_url_by_num(num + 1, course_id=course_id)}">Try</a>'
-                    ),
+                    default=mark_safe(f'<a href="{exercise_urls_by_num[num]}">Try</a>'),
                 ),
             )
             for num in range(len(exercises))
@@ -3,6 +3,7 @@ from django.http import HttpResponseRedirect
 from django.shortcuts import render
 from django.urls import reverse
 
+from apps.accounts.preferences import write_preferences
 from apps.dashboard.forms import KeyboardForm
 
 
@@ -40,28 +41,22 @@ def dashboard_preferences_view(request):
     if request.method == "POST":
         kbd_size_form = KeyboardForm(request.POST)
         if kbd_size_form.is_valid():
-            request.user.preferences["keyboard_size"] = kbd_size_form.cleaned_data[
-                "keyboard_size"
-            ]
-            request.user.preferences["keyboard_octaves_offset"] = kbd_size_form.cleaned_data[
-                "keyboard_octaves_offset"
-            ]
-            request.user.preferences["auto_advance"] = kbd_size_form.cleaned_data[
-                "auto_advance"
-            ]
-            request.user.preferences["auto_advance_delay"] = kbd_size_form.cleaned_data[
-                "auto_advance_delay"
-            ]
-            request.user.preferences["auto_repeat"] = kbd_size_form.cleaned_data[
-                "auto_repeat"
-            ]
-            request.user.preferences["auto_repeat_delay"] = kbd_size_form.cleaned_data[
-                "auto_repeat_delay"
-            ]
-            request.user.preferences["auto_sustain_duration"] = kbd_size_form.cleaned_data[
-                "auto_sustain_duration"
-            ]
-            request.user.save()
+            # the redirect reads them back, so they are written at once
+            write_preferences(
+                request.user.id,
+                {
+                    key: kbd_size_form.cleaned_data[key]
+                    for key in (
+                        "keyboard_size",
+                        "keyboard_octaves_offset",
+                        "auto_advance",
+                        "auto_advance_delay",
+                        "auto_repeat",
+                        "auto_repeat_delay",
+                        "auto_sustain_duration",
+                    )
+                },
+            )
         return HttpResponseRedirect(reverse("dashboard:preferences"))
 
     return render(request, "dashboard/preferences.html", {"form": kbd_size_form})
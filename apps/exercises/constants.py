@@ -103,3 +103,9 @@ all_keys = [
 
 KEY_SIGNATURES = list(pseudo_key_to_sig.keys())
 SIGNATURE_CHOICES = tuple(zip(KEY_SIGNATURES, KEY_SIGNATURES))
+
+# pub/sub channel of course activity cell updates, with the course id as topic
+COURSE_ACTIVITY_CHANNEL = "course_activity"
+
+# metrics pipeline of the exercise submission stages, see harmony.metrics
+SUBMISSION_PIPELINE = "exercise_submission"
@@ -0,0 +1,384 @@
+# DESCRIPTION
+#
+# Generates realistic synthetic content and activity at a chosen scale tier,
+# for benchmarking (see benchmark_suite and loadtest):
+#
+#   - authors (instructors) with exercises of chord JSON in assorted keys,
+#   - playlists of those exercises, some of them with transpositions,
+#   - courses of the playlists, unit by unit, with publish and due dates,
+#   - groups of students, who grant their instructors permits,
+#   - performance histories of the students through their course playlists,
+#     and the performance dictionaries of the courses.
+#
+# All generated users have emails <prefix>-author-<n>@synthetic.test or
+# <prefix>-student-<n>@synthetic.test and the password "synthetic".
+# Counts of a tier are per author for exercises, playlists and courses, per
+# course for groups, and in total for students.
+#
+# USAGE:
+#
+#   ./manage.py generate_synthetic_data --tier small
+#   ./manage.py generate_synthetic_data --tier large --prefix big --seed 7
+#   ./manage.py generate_synthetic_data --prefix big --clear
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from apps.accounts.models import Connection, Group, User
+from apps.exercises.models import (
+    Course,
+    Exercise,
+    ExercisePlaylistOrdered,
+    PerformanceData,
+    Playlist,
+    PlaylistCourseOrdered,
+)
+
+SYNTHETIC_DOMAIN = "synthetic.test"
+SYNTHETIC_PASSWORD = "synthetic"
+
+TIERS = {
+    "small": {
+        "authors": 2,
+        "exercises": 24,
+        "playlists": 6,
+        "exercises_per_playlist": 4,
+        "courses": 1,
+        "groups": 2,
+        "students": 40,
+    },
+    "medium": {
+        "authors": 4,
+        "exercises": 60,
+        "playlists": 12,
+        "exercises_per_playlist": 5,
+        "courses": 2,
+        "groups": 4,
+        "students": 300,
+    },
+    "large": {
+        "authors": 10,
+        "exercises": 120,
+        "playlists": 24,
+        "exercises_per_playlist": 6,
+        "courses": 3,
+        "groups": 8,
+        "students": 2000,
+    },
+}
+
+# (key, key signature, pitch class of the tonic)
+KEYS = [
+    ("jC_", "", 0),
+    ("jG_", "#", 7),
+    ("jD_", "##", 2),
+    ("jA_", "###", 9),
+    ("jF_", "b", 5),
+    ("jBb", "bb", 10),
+    ("jEb", "bbb", 3),
+]
+# triads on the degrees of the major scale, as pitch classes above the tonic
+TRIADS = [(0, 4, 7), (2, 5, 9), (4, 7, 11), (5, 9, 0), (7, 11, 2), (9, 0, 4)]
+TRANSPOSE_REQUESTS = ["C", "G", "F", "D", "Bb", "a", "e"]
+PERFORMED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def synthetic_email(prefix, role, num):
+    return f"{prefix}-{role}-{num}@{SYNTHETIC_DOMAIN}"
+
+
+def synthetic_users(prefix):
+    return User.objects.filter(
+        email__startswith=f"{prefix}-", email__endswith=f"@{SYNTHETIC_DOMAIN}"
+    )
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic authors, content, students and performances."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tier", choices=sorted(TIERS), default="small")
+        parser.add_argument("--prefix", default="synth", help="Prefix of user emails")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete the synthetic data of this prefix instead",
+        )
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if options["clear"]:
+            self.clear(prefix)
+            return
+        if synthetic_users(prefix).exists():
+            self.stderr.write(
+                f"Synthetic data with prefix {prefix!r} exists; --clear it first."
+            )
+            return
+
+        self.random = random.Random(options["seed"])
+        self.now = now()
+        self.exercise_lengths = {}
+        tier = TIERS[options["tier"]]
+        with transaction.atomic():
+            authors = self.create_users(prefix, "author", tier["authors"])
+            students = self.create_users(prefix, "student", tier["students"])
+            courses = []
+            for author in authors:
+                exercises = self.create_exercises(author, tier["exercises"])
+                playlists = self.create_playlists(
+                    author, exercises, tier["playlists"], tier["exercises_per_playlist"]
+                )
+                courses.extend(
+                    self.create_courses(author, playlists, tier["courses"], tier["groups"])
+                )
+            self.enroll(courses, students)
+            self.perform(courses)
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Generated {} authors, {} students, {} courses and {} performances.".format(
+                    len(authors),
+                    len(students),
+                    len(courses),
+                    PerformanceData.objects.filter(user__in=students).count(),
+                )
+            )
+        )
+
+    def create_users(self, prefix, role, count):
+        # hashing once keeps large tiers fast; every user shares the password
+        password = make_password(SYNTHETIC_PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(
+                    email=synthetic_email(prefix, role, num),
+                    password=password,
+                    first_name=f"{role.title()}{num}",
+                    last_name=self.random.choice(
+                        ["Bach", "Byrd", "Clara", "Dufay", "Fux", "Hensel", "Lasso", "Rameau"]
+                    ),
+                )
+                for num in range(1, count + 1)
+            ],
+            batch_size=1000,
+        )
+        return list(
+            User.objects.filter(
+                email__in=[
+                    synthetic_email(prefix, role, num) for num in range(1, count + 1)
+                ]
+            ).order_by("id")
+        )
+
+    def chord_data(self, length):
+        key, key_signature, tonic = self.random.choice(KEYS)
+        chords = []
+        for _ in range(length):
+            triad = self.random.choice(TRIADS)
+            root = (tonic + triad[0]) % 12
+            upper = sorted(60 + (tonic + pc) % 12 for pc in triad)
+            notes = [36 + root] + upper
+            hidden = []
+            if self.random.random() < 0.5:
+                # the student is to supply one of the upper voices
+                hidden.append(notes.pop(self.random.randrange(1, len(notes))))
+            chords.append({"visible": notes, "hidden": hidden})
+        return {
+            "type": "matching",
+            "introText": "",
+            "reviewText": "",
+            "staffDistribution": "chorale",
+            "key": key,
+            "keySignature": key_signature,
+            "analysis": {
+                "enabled": True,
+                "mode": {"note_names": True, "roman_numerals": False},
+            },
+            "highlight": {
+                "enabled": False,
+                "mode": {"roothighlight": False, "tritonehighlight": False},
+            },
+            "chord": chords,
+            "timeSignature": "4/4",
+            "semibrevesPerLine": 4,
+        }
+
+    def create_exercises(self, author, count):
+        exercises = []
+        for _ in range(count):
+            length = self.random.randint(4, 16)
+            exercise = Exercise(
+                data=self.chord_data(length),
+                rhythm=" ".join(["w"] * length),
+                authored_by=author,
+                is_public=True,
+            )
+            exercise.save()
+            exercises.append(exercise)
+            self.exercise_lengths[exercise.id] = length
+        return exercises
+
+    def create_playlists(self, author, exercises, count, exercises_per_playlist):
+        playlists = []
+        for num in range(1, count + 1):
+            playlist = Playlist(
+                name=f"{author.first_name} Unit {num}",
+                authored_by=author,
+                is_public=True,
+            )
+            if num % 4 == 0:
+                playlist.transpose_requests = self.random.sample(TRANSPOSE_REQUESTS, 3)
+                playlist.transposition_type = self.random.choice(
+                    [Playlist.TRANSPOSE_EXERCISE_LOOP, Playlist.TRANSPOSE_PLAYLIST_LOOP]
+                )
+            playlist.save()
+            ExercisePlaylistOrdered.objects.bulk_create(
+                [
+                    ExercisePlaylistOrdered(exercise=exercise, playlist=playlist, order=order)
+                    for order, exercise in enumerate(
+                        self.random.sample(exercises, exercises_per_playlist), 1
+                    )
+                ]
+            )
+            playlists.append(playlist)
+        return playlists
+
+    def create_courses(self, author, playlists, count, group_count):
+        courses = []
+        term_start = self.now - timedelta(weeks=len(playlists) // 2)
+        for num in range(1, count + 1):
+            course = Course(title=f"{author.first_name} Course {num}", authored_by=author)
+            course.save()
+            PlaylistCourseOrdered.objects.bulk_create(
+                [
+                    PlaylistCourseOrdered(
+                        course=course,
+                        playlist=playlist,
+                        order=order,
+                        publish_date=term_start + timedelta(weeks=order - 1),
+                        # a unit is due a week after it is published
+                        due_date=term_start + timedelta(weeks=order),
+                    )
+                    for order, playlist in enumerate(playlists, 1)
+                ]
+            )
+            groups = [
+                Group(name=f"{course.title} Section {n}", manager=author).save()
+                for n in range(1, group_count + 1)
+            ]
+            course.visible_to.set(groups)
+            courses.append(course)
+        return courses
+
+    def enroll(self, courses, students):
+        """Puts every student in a group of one course and connects them."""
+        self.roster = {course.pk: [] for course in courses}
+        groups = {course.pk: list(course.visible_to.all()) for course in courses}
+        authors = {author.pk: author for author in User.objects.filter(courses__in=courses)}
+        for student in students:
+            course = self.random.choice(courses)
+            self.random.choice(groups[course.pk]).members.add(student)
+            self.roster[course.pk].append(student)
+            author = authors[course.authored_by_id]
+            for permits in (student.content_permits, student.performance_permits):
+                permits.append(author.id)
+            author.content_permits.append(student.id)
+        User.objects.bulk_update(
+            students + list(authors.values()),
+            ["content_permits", "performance_permits"],
+            batch_size=1000,
+        )
+        connections = []
+        for course in courses:
+            author = authors[course.authored_by_id]
+            for student in self.roster[course.pk]:
+                for user, other in ((student, author), (author, student)):
+                    connections.append(
+                        Connection(user=user, other=other, **Connection.edge_flags(user, other))
+                    )
+        Connection.objects.bulk_create(connections, batch_size=1000, ignore_conflicts=True)
+
+    def attempt(self, course, playlist, exercise_id, performed_at, error_tally, length):
+        return {
+            "course_ID": course.id,
+            "playlist_ID": playlist.id,
+            "client_completion_date": performed_at.isoformat(),
+            "error_tally": error_tally,
+            "performance_duration_in_seconds": round(self.random.uniform(8, 90), 3),
+            "time_intervals_in_milliseconds": [
+                self.random.randint(400, 2400) for _ in range(length)
+            ],
+            "tempo_mean_semibreves_per_min": round(self.random.uniform(10, 40), 2),
+            "tempo_SD_semibreves_per_min": round(self.random.uniform(0, 6), 2),
+            "tempo_rating": self.random.randint(1, 5),
+            "id": exercise_id,
+            "performed_at": performed_at.strftime(PERFORMED_AT_FORMAT),
+        }
+
+    def perform(self, courses):
+        """Plays students through the published units of their course."""
+        for course in courses:
+            pcos = list(
+                PlaylistCourseOrdered.objects.filter(course=course)
+                .select_related("playlist")
+                .order_by("order")
+            )
+            exercise_lists = {pco.playlist_id: pco.playlist.exercise_list for pco in pcos}
+            performances = []
+            for student in self.roster[course.pk]:
+                diligence = self.random.random()
+                for pco in pcos:
+                    if pco.publish_date > self.now or self.random.random() > 0.4 + diligence:
+                        continue
+                    data = []
+                    # students work around the due date, some of them late
+                    performed_at = pco.due_date - timedelta(
+                        hours=self.random.uniform(-72, 120) * (1 - diligence)
+                    )
+                    for exercise_id in exercise_lists[pco.playlist_id]:
+                        # transposed exercises share the length of their original
+                        length = self.exercise_lengths[exercise_id[0:6]]
+                        errors = self.random.choice([0, 0, 1, 2, 3, 5])
+                        while True:
+                            data.append(
+                                self.attempt(
+                                    course,
+                                    pco.playlist,
+                                    exercise_id,
+                                    min(performed_at, self.now),
+                                    errors,
+                                    length,
+                                )
+                            )
+                            performed_at += timedelta(minutes=self.random.uniform(1, 6))
+                            if errors == 0 or self.random.random() > 0.6 + 0.3 * diligence:
+                                break
+                            errors = max(0, errors - self.random.randint(1, 3))
+                    performances.append(
+                        PerformanceData(
+                            user=student,
+                            playlist=pco.playlist,
+                            course=course,
+                            data=data,
+                            summary=PerformanceData.summarize(data),
+                        )
+                    )
+            PerformanceData.objects.bulk_create(performances, batch_size=500)
+            course.refresh_performance_dict()
+
+    def clear(self, prefix):
+        with transaction.atomic():
+            users = synthetic_users(prefix)
+            PerformanceData.objects.filter(user__in=users).delete()
+            PerformanceData.objects.filter(playlist__authored_by__in=users).delete()
+            Course.objects.filter(authored_by__in=users).delete()
+            Playlist.objects.filter(authored_by__in=users).delete()
+            Exercise.objects.filter(authored_by__in=users).delete()
+            Group.objects.filter(manager__in=users).delete()
+            deleted, _ = users.delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted the synthetic data of {prefix!r}."))
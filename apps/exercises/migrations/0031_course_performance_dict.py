@@ -19,7 +19,11 @@ def forwards(apps, schema_editor):
     Course = apps.get_model("exercises", "Course")
     # User = apps.get_model("accounts", "User")
     db_alias = schema_editor.connection.alias
-    for pd in PerformanceData.objects.using(db_alias).all():
+    # only the fields of the table at this point, later ones don't exist yet
+    performances = PerformanceData.objects.using(db_alias).only(
+        "id", "user_id", "playlist_id", "data"
+    )
+    for pd in performances:
         performer = str(User.objects.using(db_alias).get(id=pd.user_id))
         for pco in PlaylistCourseOrdered.objects.using(db_alias).filter(
             playlist_id=pd.playlist_id
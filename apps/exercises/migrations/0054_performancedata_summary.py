@@ -0,0 +1,68 @@
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+# A frozen copy of PerformanceData.summarize_exercise at the time of this
+# migration, so that later changes to the model don't change what it writes.
+def summarize_exercise(summary, exercise_data):
+    error_tally = exercise_data["error_tally"]
+    exercise_summary = summary.setdefault(
+        exercise_data["id"],
+        {"performed": True, "latest_errors": 0, "best_errors": None, "first_pass": None},
+    )
+    if error_tally != "n/a":
+        exercise_summary["latest_errors"] = error_tally
+    errors = 0 if error_tally in [-1, "n/a"] else error_tally
+    if isinstance(errors, int) and (
+        exercise_summary["best_errors"] is None
+        or errors < exercise_summary["best_errors"]
+    ):
+        exercise_summary["best_errors"] = errors
+    if exercise_summary["first_pass"] is None and error_tally in [0, -1, "n/a"]:
+        exercise_summary["first_pass"] = exercise_data["performed_at"]
+    return summary
+
+
+def summarize(data):
+    summary = {}
+    for exercise_data in data:
+        summarize_exercise(summary, exercise_data)
+    return summary
+
+
+def forwards(apps, schema_editor):
+    PerformanceData = apps.get_model("exercises", "PerformanceData")
+    db_alias = schema_editor.connection.alias
+    performances = []
+    for performance in PerformanceData.objects.using(db_alias).only("id", "data").iterator():
+        performance.summary = summarize(performance.data)
+        performances.append(performance)
+        if len(performances) >= BATCH_SIZE:
+            PerformanceData.objects.using(db_alias).bulk_update(performances, ["summary"])
+            performances = []
+    if performances:
+        PerformanceData.objects.using(db_alias).bulk_update(performances, ["summary"])
+
+
+def reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exercises", "0053_auto_20231217_0113"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="performancedata",
+            name="summary",
+            field=django.contrib.postgres.fields.jsonb.JSONField(
+                blank=True, default=dict, verbose_name="Exercise Summary"
+            ),
+        ),
+        migrations.RunPython(forwards, reverse_code=reverse),
+    ]
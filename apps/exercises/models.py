@@ -1,3 +1,4 @@
+import logging
 import re
 from collections import OrderedDict
 from datetime import timedelta, date, datetime
@@ -10,9 +11,9 @@ from django.contrib.auth import get_user_model
 from django.contrib.postgres.fields import JSONField
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
-from django.db import models, connections
+from django.db import models, connections, transaction
 from django.db.models import When, Case, Q, F
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.urls import reverse, NoReverseMatch
 from django.utils import dateformat
@@ -24,16 +25,23 @@ from django_better_admin_arrayfield.models.fields import ArrayField
 
 from apps.accounts.models import Group
 from apps.exercises.constants import (
+    COURSE_ACTIVITY_CHANNEL,
     SIGNATURE_CHOICES,
     KEY_SIGNATURES,
+    SUBMISSION_PIPELINE,
     pseudo_key_to_sig,
 )
+from apps.exercises.utils.generations import bump_generation, bump_generations
+from apps.exercises.utils.pubsub import publish
 from apps.exercises.utils.transpose import transpose
+from harmony.metrics import stage
 
 import re
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
 class RawJSONField(JSONField):
     """To preserve the data order."""
@@ -386,11 +394,11 @@ class Playlist(ClonableModelMixin, BaseContentModel):
 
     @cached_property
     def untransposed_exercises_ids(self):
-        related_epos = ExercisePlaylistOrdered.objects.filter(playlist=self).order_by(
-            "order"
+        return list(
+            ExercisePlaylistOrdered.objects.filter(playlist=self)
+            .order_by("order")
+            .values_list("exercise__id", flat=True)
         )
-        sorted_exercise_list = list(map(lambda epo: epo.exercise.id, related_epos))
-        return sorted_exercise_list
 
     @property
     def exercise_list(self):
@@ -500,6 +508,16 @@ class Playlist(ClonableModelMixin, BaseContentModel):
         # import pdb; pdb.set_trace()
         return transposed_exercise
 
+    def get_exercise_id_by_num(self, num=1):
+        """The id of get_exercise_obj_by_num(num), without loading the exercise."""
+        exercise_list = self.exercise_list
+        if len(exercise_list) == 0 or num == None:
+            return
+        try:
+            return exercise_list[num - 1]
+        except IndexError:
+            return exercise_list[-1]
+
     def get_exercise_url_by_num(
         self,
         num=1,
@@ -849,7 +867,8 @@ class Course(ClonableModelMixin, BaseContentModel):
             course_id=self._id, playlist_id=performance_data.playlist_id
         )
         # TODO: it might be bad to rely upon str, which is liable to change, but then again we could just refresh when that happens
-        performer = str(User.objects.get(id=performance_data.user_id)) # looks like e.g. "Joe Student - student@college.edu"
+        performer_user = User.objects.get(id=performance_data.user_id)
+        performer = str(performer_user) # looks like e.g. "Joe Student - student@college.edu"
         pass_mark = "X"
         if performance_data.playlist_passed():
             pass_mark = "C"
@@ -896,7 +915,6 @@ class Course(ClonableModelMixin, BaseContentModel):
                 for exercise_data in performance_data.data:
                     self.performance_dict[performer]["time_elapsed"] += \
                         exercise_data["performance_duration_in_seconds"]
-                    print(exercise_data["performance_duration_in_seconds"])
             else:
                 # self.performance_dict[performer] is the record used for the course activity table
                 # it keeps track of whether each playlist has been passed and how long has been spent on each course
@@ -904,11 +922,23 @@ class Course(ClonableModelMixin, BaseContentModel):
                 exercise_data = performance_data.data[-1:][0]
                 self.performance_dict[performer]["time_elapsed"] += \
                     exercise_data["performance_duration_in_seconds"]
-                print(exercise_data["performance_duration_in_seconds"])
         except:
             pass
         if commit:
             self.save()
+            record = self.performance_dict[performer]
+            delta = {
+                "performer": performance_data.user_id,
+                "first_name": performer_user.first_name,
+                "last_name": performer_user.last_name,
+                "playlist": pco.playlist.id,
+                "mark": record.get(pco.playlist.id),
+                "time_elapsed": record.get("time_elapsed"),
+            }
+            # watchers of the course activity table receive only the changed cells
+            transaction.on_commit(
+                lambda: publish(COURSE_ACTIVITY_CHANNEL, self.id, delta)
+            )
 
     def refresh_performance_dict(self, commit=True):
         self.performance_dict = {}
@@ -951,6 +981,9 @@ class PerformanceData(models.Model):
         null=True,
     )
     data = JSONField("Raw Data", default=list)
+    # exercise id -> {performed, latest_errors, best_errors, first_pass},
+    # maintained by submit so that lookups need not scan the raw data
+    summary = JSONField("Exercise Summary", default=dict, blank=True)
 
     created = models.DateTimeField("Created", auto_now_add=True)
     updated = models.DateTimeField("Updated", auto_now=True)
@@ -980,49 +1013,75 @@ class PerformanceData(models.Model):
         exercise_id: str,
         data: dict,
     ):
-        pd, _ = cls.objects.get_or_create(
-            user_id=user_id,
-            course_id=course_id,
-            playlist_id=playlist_id,
-        )
-        exercise_data = dict(
-            **data,
-            id=exercise_id,  # rename
-            # exercise_ID = exercise_id
-            performed_at=dateformat.format(now(), "Y-m-d H:i:s"),  # rename and reformat
-            # server_date = datetime.isoformat(datetime.now())[:-3]+'Z' # UTC
-        )
+        with stage(SUBMISSION_PIPELINE, "get_or_create"):
+            pd, _ = cls.objects.get_or_create(
+                user_id=user_id,
+                course_id=course_id,
+                playlist_id=playlist_id,
+            )
+        with stage(SUBMISSION_PIPELINE, "append"):
+            exercise_data = dict(
+                **data,
+                id=exercise_id,  # rename
+                # exercise_ID = exercise_id
+                performed_at=dateformat.format(now(), "Y-m-d H:i:s"),  # rename and reformat
+                # server_date = datetime.isoformat(datetime.now())[:-3]+'Z' # UTC
+            )
 
-        pd.data.append(exercise_data)
-        pd.full_clean()
-        pd.save()
+            pd.data.append(exercise_data)
+            cls.summarize_exercise(pd.summary, exercise_data)
+        with stage(SUBMISSION_PIPELINE, "full_clean"):
+            pd.full_clean()
+        with stage(SUBMISSION_PIPELINE, "save"):
+            pd.save()
         try:
             if course_id:
-                course = Course.objects.get(_id=course_id)
-                print("\n")
-                print(course, "len(pd.data):", len(pd.data))
-                course.add_performance_to_dict(pd)
+                with stage(SUBMISSION_PIPELINE, "add_performance_to_dict"):
+                    course = Course.objects.get(_id=course_id)
+                    logger.debug("%s len(pd.data): %s", course, len(pd.data))
+                    course.add_performance_to_dict(pd)
         except:
-            pass
-            # ERROR MESSAGE SHOULD READ: 'Failed to save course performance dictionary but proceeding to return performance data.''
+            logger.warning(
+                "Failed to save course performance dictionary but proceeding to return performance data.",
+                exc_info=True,
+            )
 
-        # the slicing of exercise_id ensures exercises are locked when performed in transposition
-        exercise = Exercise.objects.get(id=exercise_id[0:6])
-        if exercise.authored_by_id != user_id and not exercise.locked:
-            exercise.lock()
+        with stage(SUBMISSION_PIPELINE, "exercise_lock"):
+            # the slicing of exercise_id ensures exercises are locked when performed in transposition
+            exercise = Exercise.objects.get(id=exercise_id[0:6])
+            if exercise.authored_by_id != user_id and not exercise.locked:
+                exercise.lock()
         return pd
 
+    @staticmethod
+    def summarize_exercise(summary, exercise_data):
+        """Folds one exercise attempt into a summary map, in place."""
+        error_tally = exercise_data["error_tally"]
+        exercise_summary = summary.setdefault(
+            exercise_data["id"],
+            {"performed": True, "latest_errors": 0, "best_errors": None, "first_pass": None},
+        )
+        if error_tally != "n/a":
+            exercise_summary["latest_errors"] = error_tally
+        errors = 0 if error_tally in [-1, "n/a"] else error_tally
+        if isinstance(errors, int) and (
+            exercise_summary["best_errors"] is None
+            or errors < exercise_summary["best_errors"]
+        ):
+            exercise_summary["best_errors"] = errors
+        if exercise_summary["first_pass"] is None and error_tally in [0, -1, "n/a"]:
+            exercise_summary["first_pass"] = exercise_data["performed_at"]
+        return summary
+
+    @classmethod
+    def summarize(cls, data):
+        summary = {}
+        for exercise_data in data:
+            cls.summarize_exercise(summary, exercise_data)
+        return summary
+
     def get_exercise_first_pass(self, exercise_id):
-        for exercise in self.data:
-            if exercise["id"] == exercise_id and exercise["error_tally"] in [
-                0,
-                -1,
-                "n/a",
-            ]:
-                return exercise["performed_at"]
-            elif exercise["id"] == exercise_id:
-                continue
-        return False
+        return self.summary.get(exercise_id, {}).get("first_pass") or False
 
     def playlist_passed(self):
         from apps.dashboard.views.performance import playlist_pass_bool
@@ -1040,19 +1099,10 @@ class PerformanceData(models.Model):
         )
 
     def exercise_is_performed(self, exercise_id):
-        return any([exercise["id"] == exercise_id for exercise in self.data])
+        return exercise_id in self.summary
 
     def exercise_error_count(self, exercise_id):
-        error_count = 0
-        for exercise in self.data:
-            if exercise["id"] == exercise_id and exercise["error_tally"] == 0:
-                error_count = 0
-            if exercise["id"] == exercise_id and exercise["error_tally"] not in [
-                0,
-                "n/a",
-            ]:
-                error_count = exercise["error_tally"]
-        return error_count
+        return self.summary.get(exercise_id, {}).get("latest_errors", 0)
 
     # @cached_property # this being a cached property caused the function call to fail
     def get_local_pass_date(self):
@@ -1078,11 +1128,72 @@ class PerformanceData(models.Model):
 @receiver(post_save, sender=PerformanceData)
 def truncate_timestamps(sender, instance, *args, **kwargs):
     """Remove microseconds from 'created' and 'updated' fields"""
-    with connections["default"].cursor() as cursor:
-        cursor.execute(
-            "UPDATE {} "
-            "SET created = DATE_TRUNC('second', created), updated = DATE_TRUNC('second', updated) "
-            "WHERE {} = {}".format(
-                instance._meta.db_table, instance._meta.pk.name, instance.pk
+    with stage("truncate_timestamps", sender._meta.model_name):
+        with connections["default"].cursor() as cursor:
+            cursor.execute(
+                "UPDATE {} "
+                "SET created = DATE_TRUNC('second', created), updated = DATE_TRUNC('second', updated) "
+                "WHERE {} = {}".format(
+                    instance._meta.db_table, instance._meta.pk.name, instance.pk
+                )
             )
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_instance_generation(sender, instance, *args, **kwargs):
+    bump_generation(sender, instance.pk)
+
+
+@receiver(post_save, sender=Playlist)
+@receiver(post_delete, sender=Playlist)
+def bump_playlist_generation(sender, instance, *args, **kwargs):
+    bump_generation(Playlist, instance.pk)
+    # courses list their playlists by id and name
+    bump_generations(
+        Course,
+        PlaylistCourseOrdered.objects.filter(playlist_id=instance.pk).values_list(
+            "course_id", flat=True
+        ),
+    )
+
+
+@receiver(post_save, sender=ExercisePlaylistOrdered)
+@receiver(post_delete, sender=ExercisePlaylistOrdered)
+def bump_epo_generation(sender, instance, *args, **kwargs):
+    bump_generation(Playlist, instance.playlist_id)
+
+
+@receiver(post_save, sender=PlaylistCourseOrdered)
+@receiver(post_delete, sender=PlaylistCourseOrdered)
+def bump_pco_generation(sender, instance, *args, **kwargs):
+    bump_generation(Course, instance.course_id)
+
+
+@receiver(post_save, sender=PerformanceData)
+def bump_performer_generation(sender, instance, *args, **kwargs):
+    bump_generation(User, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Playlist.exercises.through)
+@receiver(m2m_changed, sender=Course.playlists.through)
+@receiver(m2m_changed, sender=Course.visible_to.through)
+@receiver(m2m_changed, sender=Group.members.through)
+def bump_m2m_generations(sender, instance, action, model, pk_set, *args, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    bump_generation(type(instance), instance.pk)
+    if pk_set:
+        bump_generations(model, pk_set)
+    # a change of group membership changes the course activity of the group's manager
+    if isinstance(instance, Group):
+        bump_generation(User, instance.manager_id)
+    elif model is Group and pk_set:
+        bump_generations(
+            User,
+            Group.objects.filter(pk__in=pk_set).values_list("manager_id", flat=True),
         )
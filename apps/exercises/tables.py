@@ -1,6 +1,34 @@
 import django_tables2 as tables
 
 
+def exercise_result(exercise):
+    """e.g. "Pass 60*** " or "Error(s) " for one exercise attempt."""
+    has_errors = isinstance(exercise["error_tally"], int) and exercise["error_tally"] > 0
+    return (
+        f'{"Error(s) " if has_errors else "Pass "}'
+        f'{"" if (has_errors or not exercise["tempo_mean_semibreves_per_min"]) else round(exercise["tempo_mean_semibreves_per_min"])}'
+        f'{"" if has_errors else "*" * round(exercise["tempo_rating"])} '
+    )
+
+
+def exercise_results(data):
+    """Result of the latest attempt at each exercise of a performance's data."""
+    return {exercise["id"]: exercise_result(exercise) for exercise in data}
+
+
+class ExerciseResultColumn(tables.Column):
+    def __init__(self, exercise_id, **kwargs):
+        self.exercise_id = exercise_id
+        kwargs.setdefault("verbose_name", exercise_id)
+        super().__init__(empty_values=(), orderable=False, **kwargs)
+
+    def render(self, record):
+        # parsed once per row, when its first exercise cell is rendered
+        if not hasattr(record, "exercise_results"):
+            record.exercise_results = exercise_results(record.data)
+        return record.exercise_results.get(self.exercise_id) or self.default
+
+
 class PlaylistActivityTable(tables.Table):
     performer = tables.Column()
     exercise_count = tables.Column()
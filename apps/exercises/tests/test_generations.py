@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.test import TransactionTestCase
+
+from apps.accounts.models import User
+from apps.exercises.utils import generations
+from harmony.cache import TieredCache
+
+THREADS = 4
+BUMPS = 10
+
+
+def process_cache():
+    """A default cache with a local tier of its own, as in another process."""
+    cache = TieredCache("shared", settings.CACHES["default"])
+    cache._local = OrderedDict()
+    cache._namespace_versions = {}
+    cache._lock = threading.RLock()
+    return cache
+
+
+class GenerationTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User(pk=1)
+
+    def tearDown(self):
+        caches["shared"].clear()
+
+    def test_bump_seen_by_other_processes(self):
+        reader, writer = process_cache(), process_cache()
+        with mock.patch.object(generations, "cache", reader):
+            before = generations.get_generation(self.user)
+        with mock.patch.object(generations, "cache", writer):
+            bumped = generations.bump_generation(User, self.user.pk)
+        self.assertEqual(bumped, before + 1)
+        with mock.patch.object(generations, "cache", reader):
+            self.assertEqual(generations.get_generation(self.user), bumped)
+            self.assertNotEqual(
+                generations.generation_cache_key("course_activity", self.user),
+                "course_activity:accounts.user.1.{}:".format(before),
+            )
+
+    def test_concurrent_bumps(self):
+        start = generations.get_generation(self.user)
+        bumped = []
+
+        def bump():
+            try:
+                for _ in range(BUMPS):
+                    bumped.append(generations.bump_generation(User, self.user.pk))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=bump) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            sorted(bumped), list(range(start + 1, start + 1 + THREADS * BUMPS))
+        )
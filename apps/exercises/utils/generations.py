@@ -0,0 +1,111 @@
+"""
+Generation counters for cache invalidation.
+
+Every Exercise, Playlist, Course and User has a counter in the default cache
+that only ever increases. Signal receivers in apps.exercises.models bump it
+whenever the entity (or one of its ordered through-tables or group
+memberships) changes, so anything cached under a key built from the current
+generations becomes unreachable, rather than stale, as soon as its inputs change.
+
+The counters skip the per-process tier of the default cache (the "generation"
+namespace is in its SHARED_ONLY_NAMESPACES), so that a bump is seen by every
+worker at once, and are bumped with the atomic incr() of the shared tier, so
+that concurrent bumps never yield the same generation.
+
+Note that QuerySet.update() and bulk_create() send no signals; callers using
+them must bump the affected generations themselves.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+
+GENERATION_NAMESPACE = "generation"
+
+
+def _label(model_or_instance):
+    return model_or_instance._meta.label_lower
+
+
+def _generation_key(label, pk):
+    return f"{GENERATION_NAMESPACE}:{label}:{pk}"
+
+
+def _seed():
+    # Seeding from the clock keeps counters monotonic even if the cache loses
+    # one: a recreated counter starts above every value it could have reached.
+    return time.time_ns() // 1000
+
+
+def get_generations(instances):
+    """The generations of the instances, in order, read in one cache lookup."""
+    keys = [_generation_key(_label(instance), instance.pk) for instance in instances]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _seed(), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def get_generation(instance):
+    return get_generations([instance])[0]
+
+
+def bump_generation(model, pk):
+    key = _generation_key(_label(model), pk)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        generation = _seed()
+        cache.set(key, generation, timeout=None)
+        return generation
+
+
+def bump_generations(model, pks):
+    for pk in set(pks):
+        bump_generation(model, pk)
+
+
+def generation_cache_key(prefix, *instances, extra=""):
+    """
+    Build a cache key from the current generations of the given instances,
+    e.g. "course_activity:exercises.course.12.1700000000000001:accounts.user.3.1700000000000007:<extra hash>".
+    """
+    instances = [instance for instance in instances if instance is not None]
+    stamps = [
+        f"{_label(instance)}.{instance.pk}.{generation}"
+        for instance, generation in zip(instances, get_generations(instances))
+    ]
+    digest = hashlib.md5(str(extra).encode()).hexdigest() if extra else ""
+    return ":".join([prefix, *stamps, digest])
+
+
+def cache_page_by_generations(prefix, get_instances, timeout=60 * 60 * 24):
+    """
+    Cache successful responses of a view under the generations of the instances
+    returned by get_instances(request, *args, **kwargs) and the full request path.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def _wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+            instances = get_instances(request, *args, **kwargs)
+            if instances is None:
+                return view(request, *args, **kwargs)
+            key = generation_cache_key(
+                prefix, *instances, extra=request.get_full_path()
+            )
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, response, timeout)
+            return response
+
+        return _wrapper
+
+    return decorator
@@ -0,0 +1,148 @@
+"""
+Process-local pub/sub relayed between processes through Postgres LISTEN/NOTIFY.
+
+Each process runs at most one listener thread, on its own database connection,
+per channel it has subscribers for; every notification is fanned out to the
+in-process subscriptions of its topic. Watchers therefore cost a queue each,
+not a database connection or a polling loop.
+
+    publish("course_activity", "CA00AB", {...})      # e.g. after a commit
+    with subscribe("course_activity", "CA00AB") as subscription:
+        message = subscription.get(timeout=15)       # None on timeout
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+# Postgres drops NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7999
+SUBSCRIPTION_MAX_MESSAGES = 1000
+
+
+def _uses_postgres(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == "postgresql"
+
+
+def publish(channel, topic, message, using=DEFAULT_DB_ALIAS):
+    payload = json.dumps({"topic": topic, "message": message}, separators=(",", ":"))
+    if not _uses_postgres(using):
+        _dispatch(channel, payload)
+        return
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        logger.warning("Dropping %s message for %s: payload too large", channel, topic)
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [channel, payload])
+
+
+class Subscription:
+    def __init__(self, channel, topic):
+        self.channel = channel
+        self.topic = topic
+        # bounded so that a stalled watcher cannot grow without limit
+        self._queue = queue.Queue(maxsize=SUBSCRIPTION_MAX_MESSAGES)
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            logger.warning("Dropping %s message for a stalled subscriber", self.channel)
+
+    def get(self, timeout=None):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        _unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_lock = threading.Lock()
+_subscriptions = defaultdict(set)  # (channel, topic) -> {Subscription}
+_listeners = {}  # channel -> Thread
+
+
+def subscribe(channel, topic, using=DEFAULT_DB_ALIAS):
+    subscription = Subscription(channel, topic)
+    with _lock:
+        _subscriptions[(channel, topic)].add(subscription)
+        if _uses_postgres(using) and channel not in _listeners:
+            listener = threading.Thread(
+                target=_listen,
+                args=(channel, using),
+                name=f"pubsub-{channel}",
+                daemon=True,
+            )
+            _listeners[channel] = listener
+            listener.start()
+    return subscription
+
+
+def _unsubscribe(subscription):
+    with _lock:
+        subscribers = _subscriptions.get((subscription.channel, subscription.topic))
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del _subscriptions[(subscription.channel, subscription.topic)]
+
+
+def subscriber_count(channel=None):
+    with _lock:
+        return sum(
+            len(subscribers)
+            for (subscription_channel, _), subscribers in _subscriptions.items()
+            if channel is None or subscription_channel == channel
+        )
+
+
+def _dispatch(channel, payload):
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        logger.warning("Ignoring malformed %s notification", channel)
+        return
+    with _lock:
+        subscribers = list(_subscriptions.get((channel, data.get("topic")), ()))
+    for subscription in subscribers:
+        subscription.put(data.get("message"))
+
+
+def _listen(channel, using):
+    import psycopg2
+
+    params = connections[using].get_connection_params()
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**params)
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{channel}"')
+            while True:
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _dispatch(channel, conn.notifies.pop(0).payload)
+        except Exception:
+            logger.exception("%s listener lost its connection; reconnecting", channel)
+            time.sleep(1)
+        finally:
+            if conn is not None:
+                conn.close()
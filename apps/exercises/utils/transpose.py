@@ -25,6 +25,16 @@ from copy import deepcopy
 from apps.exercises.constants import sig_to_pc, pseudo_key_to_sig, all_sigs, all_keys
 
 
+def midi_range(exercise_data):
+    """The lowest and highest MIDI note of an exercise, or None if it has none."""
+    midi_all_ex = []
+    for chord in exercise_data.get("chord", []):
+        midi_all_ex.extend(chord["visible"] + chord["hidden"])
+    if not midi_all_ex:
+        return None
+    return min(midi_all_ex), max(midi_all_ex)
+
+
 def transpose(exercise, staff_sig_request):
     exercise = deepcopy(exercise)
     sig_orig = exercise.data.get("keySignature")
@@ -52,12 +62,7 @@ def transpose(exercise, staff_sig_request):
     # 12 + not necessary here but keep it in case this function copied to Javascript
     pc_vector = (12 + pc_ref_target - pc_ref_orig) % 12
 
-    midi_all_ex = []
-    for chord in exercise.data["chord"]:
-        midi_all_ex.extend(chord["visible"] + chord["hidden"])
-
-    midi_max_ex = max(midi_all_ex)
-    midi_min_ex = min(midi_all_ex)
+    midi_min_ex, midi_max_ex = midi_range(exercise.data)
     midi_mean_floor_ex = (midi_max_ex + midi_min_ex) // 2
     midi_range_ex = midi_max_ex + 1 - midi_min_ex
 
@@ -1,76 +1,100 @@
+import csv
 import json
 
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.db.models import CharField, F, Func, IntegerField, Value
+from django.db.models.functions import Concat, NullIf, Upper
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django_tables2 import Column
-
-from apps.exercises.models import Course, Playlist, PerformanceData, User as Performers
-from apps.exercises.tables import PlaylistActivityTable
+from django_tables2 import RequestConfig
+
+from apps.exercises.constants import SUBMISSION_PIPELINE
+from apps.exercises.models import Course, Playlist, PerformanceData
+from apps.exercises.tables import (
+    ExerciseResultColumn,
+    PlaylistActivityTable,
+    exercise_results,
+)
+from apps.exercises.utils.csv_stream import Echo
+from harmony.metrics import stage
+from harmony.query_profile import query_budget
 
 User = get_user_model()
 
 
-# @staff_member_required
+def playlist_performances(playlist_id):
+    """
+    One performance per performer of the playlist (their earliest), annotated
+    with the performer's label and exercise count, ordered by performer.
+    """
+    first_performances = (
+        PerformanceData.objects.filter(playlist__id=playlist_id)
+        .order_by("user_id", "id")
+        .distinct("user_id")
+        .values("id")
+    )
+    return (
+        PerformanceData.objects.filter(id__in=first_performances)
+        .annotate(
+            # e.g. "Joe STUDENT <student@college.edu>", omitting empty names
+            performer=Func(
+                Value(" "),
+                NullIf(F("user__first_name"), Value("")),
+                NullIf(Upper("user__last_name"), Value("")),
+                Concat(Value("<"), F("user__email"), Value(">")),
+                function="CONCAT_WS",
+                output_field=CharField(),
+            ),
+            exercise_count=Func(
+                F("data"), function="jsonb_array_length", output_field=IntegerField()
+            ),
+        )
+        .only("id", "data")
+        .order_by("performer")
+    )
+
+
+def playlist_performance_csv_rows(performances, exercises):
+    yield ["performer", "exercise_count", *exercises]
+    for performance in performances.iterator():
+        results = exercise_results(performance.data)
+        yield [
+            performance.performer,
+            performance.exercise_count,
+            *[results.get(exercise, "") for exercise in exercises],
+        ]
+
+
+@staff_member_required
+@query_budget(10)
 def playlist_performance_view(request, playlist_id):
-    data = []
-    performances = PerformanceData.objects.filter(
-        playlist__id=playlist_id
-    ).select_related("user", "playlist")
+    performances = playlist_performances(playlist_id)
     playlist = Playlist.objects.get(id=playlist_id)
     exercises = [exercise for exercise in playlist.exercise_list]
-    users = list(set(list(performances.values_list("user__email", flat=True))))
-
-    for user in users:
-        name = [
-            n
-            for n in list(
-                Performers.objects.filter(email=user).values_list(
-                    "first_name", "last_name"
-                )
-            )[0]
-        ]
-        user_data = {
-            "email": user,
-            "performer": " ".join(
-                [
-                    n
-                    for n in [
-                        name[0],
-                        name[1].upper(),
-                        "<" + user + ">",
-                    ]
-                    if n != ""
-                ]
+
+    if request.GET.get("format") == "csv":
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse(
+            (
+                writer.writerow(row)
+                for row in playlist_performance_csv_rows(performances, exercises)
             ),
-            "performance_data": performances.filter(user__email=user).first().data,
-        }
-        user_data.update({"exercise_count": len(user_data["performance_data"])})
-        data.append(user_data)
-
-    for d in data:
-        exercises_data = d["performance_data"]
-
-        [
-            d.update(
-                **{
-                    exercise[
-                        "id"
-                    ]: f'{"Error(s) " if (isinstance(exercise["error_tally"], int) and exercise["error_tally"] > 0) else "Pass "}'
-                    f'{"" if ((isinstance(exercise["error_tally"], int) and exercise["error_tally"] > 0) or not exercise["tempo_mean_semibreves_per_min"]) else round(exercise["tempo_mean_semibreves_per_min"])}'
-                    f'{"" if (isinstance(exercise["error_tally"], int) and exercise["error_tally"] > 0) else "*" * round(exercise["tempo_rating"])} '
-                }
-            )
-            for exercise in exercises_data
-        ]
+            content_type="text/csv",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="analytic_piano_data_{playlist_id}.csv"'
+        )
+        return response
 
     table = PlaylistActivityTable(
-        data=data, extra_columns=[(exercise, Column()) for exercise in exercises]
+        data=performances,
+        extra_columns=[(exercise, ExerciseResultColumn(exercise)) for exercise in exercises],
     )
+    RequestConfig(request, paginate={"per_page": 100}).configure(table)
 
     return render(
         request, "admin/performances.html", {"table": table, "playlist_id": playlist_id}
@@ -80,36 +104,37 @@ def playlist_performance_view(request, playlist_id):
 @login_required
 @method_decorator(csrf_exempt)
 def submit_exercise_performance(request):
-    user_id = request.user.id if request.user.is_authenticated else None
-    performance_data = json.loads(request.POST.get("data"))
-
-    data_course_id = performance_data["course_ID"]
-    data_playlist_id = performance_data["playlist_ID"]
-    data_exercise_num = performance_data["exercise_num"]
-
-    # This shouldn't require a lookup but only a format conversion
-    # between integers (0 thru 1,757,599) and strings (A00AA thru Z99ZZ)
-    course_id = Course.objects.get(id=data_course_id)._id
-    playlist_id = Playlist.objects.get(id=data_playlist_id)._id
-
-    # Convoluted procedure because the Playlist object is not imported to exercise_context.js
-    # so the accuracy of this database write depends on the playlist not having changed since
-    # the call of compileExerciseReport
-    exercise_id = (
-        Playlist.objects.filter(id=data_playlist_id)
-        .first()
-        .get_exercise_obj_by_num(int(data_exercise_num))
-        .id
-    )
+    with stage(SUBMISSION_PIPELINE, "total"):
+        with stage(SUBMISSION_PIPELINE, "lookup"):
+            user_id = request.user.id if request.user.is_authenticated else None
+            performance_data = json.loads(request.POST.get("data"))
+
+            data_course_id = performance_data["course_ID"]
+            data_playlist_id = performance_data["playlist_ID"]
+            data_exercise_num = performance_data["exercise_num"]
+
+            # This shouldn't require a lookup but only a format conversion
+            # between integers (0 thru 1,757,599) and strings (A00AA thru Z99ZZ)
+            course_id = Course.objects.get(id=data_course_id)._id
+            playlist_id = Playlist.objects.get(id=data_playlist_id)._id
+
+            # Convoluted procedure because the Playlist object is not imported to exercise_context.js
+            # so the accuracy of this database write depends on the playlist not having changed since
+            # the call of compileExerciseReport
+            exercise_id = (
+                Playlist.objects.filter(id=data_playlist_id)
+                .first()
+                .get_exercise_id_by_num(int(data_exercise_num))
+            )
 
-    # Intercept this meaningless prop from being written to the database
-    performance_data.pop("exercise_num")
+            # Intercept this meaningless prop from being written to the database
+            performance_data.pop("exercise_num")
 
-    PerformanceData.submit(
-        user_id=user_id,  # integer
-        course_id=course_id,  # integer
-        playlist_id=playlist_id,  # integer
-        exercise_id=exercise_id,  # string
-        data=performance_data,
-    )
+        PerformanceData.submit(
+            user_id=user_id,  # integer
+            course_id=course_id,  # integer
+            playlist_id=playlist_id,  # integer
+            exercise_id=exercise_id,  # string
+            data=performance_data,
+        )
     return HttpResponse(status=201)
@@ -0,0 +1,313 @@
+"""
+Two-tier cache backend.
+
+A bounded, per-process LRU (with its own short TTL) sits in front of a shared
+backend configured as another entry of settings.CACHES, which all processes and
+dynos must share. Keys are grouped into namespaces by the text before their
+first colon ("course_activity:C123" belongs to "course_activity"). Every
+namespace carries a version stamp stored in the shared backend; bumping it with
+invalidate_namespace() makes all workers miss on their old entries.
+
+Namespaces listed in the SHARED_ONLY_NAMESPACES option skip the local tier, for
+values every worker must see as soon as they change, like the generation
+counters of apps.exercises.utils.generations.
+
+Namespace versions and incr() rely on the shared backend incrementing
+atomically. Memcached does; Django's DatabaseCache (and FileBasedCache) read
+and write the value in separate steps, so concurrent increments can collapse
+into one. LockingDatabaseCache is the database cache with an atomic incr(),
+and the plain ones are refused as the shared tier.
+
+Django makes a cache instance per thread; like LocMemCache, the instances of a
+process share the local tier (and its stats), keyed by the shared alias.
+"""
+import base64
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+DEFAULT_NAMESPACE = "default"
+NAMESPACE_VERSION_PREFIX = "__ns_version__"
+
+# Global in-memory store of the local tiers, by shared alias
+_local_caches = {}
+_namespace_versions = {}
+_stats = {}
+_locks = {}
+
+
+def _new_stats():
+    return defaultdict(
+        lambda: {"local_hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0}
+    )
+
+
+def get_namespace(key):
+    namespace, sep, _ = str(key).partition(":")
+    return namespace if sep else DEFAULT_NAMESPACE
+
+
+class LockingDatabaseCache(DatabaseCache):
+    """The database cache, whose incr() locks the row of the key."""
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        for_update = ""
+        if connection.features.has_select_for_update:
+            for_update = connection.ops.for_update_sql()
+        now = timezone.now().replace(microsecond=0)
+        now = connection.ops.adapt_datetimefield_value(now)
+
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT %s FROM %s WHERE %s = %%s AND %s > %%s %s"
+                % (
+                    quote_name("value"),
+                    quote_name(self._table),
+                    quote_name("cache_key"),
+                    quote_name("expires"),
+                    for_update,
+                ),
+                [key, now],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = connection.ops.process_clob(row[0])
+            new_value = pickle.loads(base64.b64decode(value.encode())) + delta
+            pickled = pickle.dumps(new_value, self.pickle_protocol)
+            # unlike set(), keeps the expiry of the key
+            cursor.execute(
+                "UPDATE %s SET %s = %%s WHERE %s = %%s"
+                % (
+                    quote_name(self._table),
+                    quote_name("value"),
+                    quote_name("cache_key"),
+                ),
+                [base64.b64encode(pickled).decode("latin1"), key],
+            )
+        return new_value
+
+
+class TieredCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        # LOCATION names the CACHES alias of the shared tier
+        self._shared_alias = location or "shared"
+        self._local_max_entries = int(options.get("LOCAL_MAX_ENTRIES", 1000))
+        self._local_timeout = float(options.get("LOCAL_TIMEOUT", 30))
+        self._shared_only = frozenset(options.get("SHARED_ONLY_NAMESPACES", ()))
+        # how long a worker trusts its copy of a namespace version
+        self._namespace_version_timeout = float(
+            options.get("NAMESPACE_VERSION_TIMEOUT", 5)
+        )
+
+        name = self._shared_alias
+        # key -> (expires_at, pickled value)
+        self._local = _local_caches.setdefault(name, OrderedDict())
+        # namespace -> (checked_at, version)
+        self._namespace_versions = _namespace_versions.setdefault(name, {})
+        self._stats = _stats.setdefault(name, _new_stats())
+        self._lock = _locks.setdefault(name, threading.RLock())
+
+    @property
+    def shared(self):
+        shared = caches[self._shared_alias]
+        if isinstance(shared, (DatabaseCache, FileBasedCache)) and not isinstance(
+            shared, LockingDatabaseCache
+        ):
+            raise ImproperlyConfigured(
+                f"The {self._shared_alias!r} cache has no atomic incr(), use "
+                "harmony.cache.LockingDatabaseCache or memcached"
+            )
+        return shared
+
+    # Namespace versions
+
+    def _namespace_version_key(self, namespace):
+        return f"{NAMESPACE_VERSION_PREFIX}:{namespace}"
+
+    def get_namespace_version(self, namespace):
+        now = time.time()
+        with self._lock:
+            checked = self._namespace_versions.get(namespace)
+        if checked and now - checked[0] < self._namespace_version_timeout:
+            return checked[1]
+        version_key = self._namespace_version_key(namespace)
+        version = self.shared.get(version_key)
+        if version is None:
+            self.shared.add(version_key, 1, timeout=None)
+            version = self.shared.get(version_key, 1)
+        with self._lock:
+            self._namespace_versions[namespace] = (now, version)
+        return version
+
+    def invalidate_namespace(self, namespace):
+        version_key = self._namespace_version_key(namespace)
+        try:
+            version = self.shared.incr(version_key)
+        except ValueError:
+            # the version was never stamped (or was culled); restart above 1
+            version = 2
+            self.shared.set(version_key, version, timeout=None)
+        with self._lock:
+            self._namespace_versions[namespace] = (time.time(), version)
+            # entries of the old version can no longer be reached, drop them now
+            stale_prefix = f"{namespace}:"
+            for key in [k for k in self._local if k.startswith(stale_prefix)]:
+                del self._local[key]
+        return version
+
+    def _stamped_key(self, key, version=None):
+        namespace = get_namespace(key)
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return (
+            namespace,
+            f"{namespace}:{self.get_namespace_version(namespace)}:{key}",
+        )
+
+    # Local tier
+
+    def _is_shared_only(self, key):
+        return key.partition(":")[0] in self._shared_only
+
+    def _local_get(self, key):
+        if self._is_shared_only(key):
+            return None
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry[1]
+
+    def _local_set(self, key, pickled, timeout):
+        if self._is_shared_only(key):
+            return
+        expires_at = time.time() + self._local_timeout
+        backend_expiry = self.get_backend_timeout(timeout)
+        if backend_expiry is not None:
+            expires_at = min(expires_at, backend_expiry)
+        with self._lock:
+            self._local[key] = (expires_at, pickled)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                evicted_key, _ = self._local.popitem(last=False)
+                self._stats[evicted_key.partition(":")[0]]["evictions"] += 1
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        namespace, key = self._stamped_key(key, version)
+        pickled = self._local_get(key)
+        if pickled is not None:
+            self._count(namespace, "local_hits")
+            return pickle.loads(pickled)
+        sentinel = object()
+        value = self.shared.get(key, sentinel)
+        if value is sentinel:
+            self._count(namespace, "misses")
+            return default
+        self._count(namespace, "shared_hits")
+        self._local_set(key, pickle.dumps(value, self.pickle_protocol), DEFAULT_TIMEOUT)
+        return value
+
+    def get_many(self, keys, version=None):
+        """Values of the keys found, with one shared lookup for local misses."""
+        found, missing = {}, {}
+        for key in keys:
+            namespace, stamped_key = self._stamped_key(key, version)
+            pickled = self._local_get(stamped_key)
+            if pickled is not None:
+                self._count(namespace, "local_hits")
+                found[key] = pickle.loads(pickled)
+            else:
+                missing[stamped_key] = (key, namespace)
+        values = self.shared.get_many(list(missing)) if missing else {}
+        for stamped_key, (key, namespace) in missing.items():
+            if stamped_key not in values:
+                self._count(namespace, "misses")
+                continue
+            self._count(namespace, "shared_hits")
+            found[key] = values[stamped_key]
+            self._local_set(
+                stamped_key,
+                pickle.dumps(found[key], self.pickle_protocol),
+                DEFAULT_TIMEOUT,
+            )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        namespace, key = self._stamped_key(key, version)
+        timeout = self.default_timeout if timeout == DEFAULT_TIMEOUT else timeout
+        self.shared.set(key, value, timeout=timeout)
+        self._local_set(key, pickle.dumps(value, self.pickle_protocol), timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        namespace, key = self._stamped_key(key, version)
+        timeout = self.default_timeout if timeout == DEFAULT_TIMEOUT else timeout
+        added = self.shared.add(key, value, timeout=timeout)
+        if added:
+            self._local_set(key, pickle.dumps(value, self.pickle_protocol), timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        namespace, key = self._stamped_key(key, version)
+        timeout = self.default_timeout if timeout == DEFAULT_TIMEOUT else timeout
+        self._local_delete(key)
+        return self.shared.touch(key, timeout=timeout)
+
+    def delete(self, key, version=None):
+        namespace, key = self._stamped_key(key, version)
+        self._local_delete(key)
+        self.shared.delete(key)
+
+    def incr(self, key, delta=1, version=None):
+        namespace, key = self._stamped_key(key, version)
+        self._local_delete(key)
+        return self.shared.incr(key, delta)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+            self._namespace_versions.clear()
+        self.shared.clear()
+
+    # Instrumentation
+
+    def _count(self, namespace, counter):
+        with self._lock:
+            self._stats[namespace][counter] += 1
+
+    def stats(self):
+        """Hit/miss/eviction counters of this process, per key namespace."""
+        with self._lock:
+            return {namespace: dict(counts) for namespace, counts in self._stats.items()}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
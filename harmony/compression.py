@@ -0,0 +1,55 @@
+"""
+Compression of the HTML and JSON responses.
+
+CompressionMiddleware compresses HTML and JSON responses with brotli when the
+client accepts it and the brotli package is installed, and with gzip
+otherwise. Streaming responses are passed through untouched: the CSV exports
+and event streams must reach the client as they are produced, and the static
+files WhiteNoise serves are precompressed by buildrequirejs. So are all other
+content types, most of which are compressed already (images, audio).
+
+It must come first in MIDDLEWARE, so that it compresses the response last.
+"""
+import re
+
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_CONTENT_TYPES = ("text/html", "application/json")
+# fast enough to compress on every request, unlike the default of 11
+BROTLI_QUALITY = 5
+MIN_LENGTH = 200  # not worth compressing below
+
+re_accepts_brotli = re.compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if response.streaming:
+            return response
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if content_type not in COMPRESSIBLE_CONTENT_TYPES:
+            return response
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if brotli is None or not re_accepts_brotli.search(accept_encoding):
+            return super().process_response(request, response)
+
+        if len(response.content) < MIN_LENGTH or response.has_header("Content-Encoding"):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressed_content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response["Content-Length"] = str(len(response.content))
+        # as in GZipMiddleware, a strong ETag no longer matches the content
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = "br"
+        return response
@@ -0,0 +1,129 @@
+"""
+Per-process stage timers and query counters.
+
+Wrapping a phase of a hot path in stage() records its wall time and the number
+of database queries it ran into histograms labelled by pipeline and stage:
+
+    with stage("submit", "full_clean"):
+        pd.full_clean()
+
+Recording costs two perf_counter calls, a query counting wrapper on the
+connection and a few bucket increments under a lock, so stages can stay on in
+production. Histograms live in the memory of each worker process and are
+rendered in the Prometheus text exposition format by render_prometheus(); a
+scrape therefore sees the worker that served it, identified by the pid label.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            yield bound, total
+
+
+_lock = threading.Lock()
+_metrics = {
+    # name -> (help, buckets, {labels: Histogram})
+    "harmony_stage_seconds": (
+        "Wall time spent in a stage of an instrumented pipeline.",
+        SECONDS_BUCKETS,
+        {},
+    ),
+    "harmony_stage_queries": (
+        "Database queries run in a stage of an instrumented pipeline.",
+        QUERIES_BUCKETS,
+        {},
+    ),
+}
+
+
+def observe(name, labels, value):
+    _, buckets, histograms = _metrics[name]
+    labels = tuple(sorted(labels.items()))
+    with _lock:
+        histogram = histograms.get(labels)
+        if histogram is None:
+            histogram = histograms[labels] = Histogram(buckets)
+        histogram.observe(value)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def stage(pipeline, name, using=DEFAULT_DB_ALIAS):
+    """Times the enclosed block and counts its queries as a stage of a pipeline."""
+    counter = _QueryCounter()
+    start = time.perf_counter()
+    try:
+        with connections[using].execute_wrapper(counter):
+            yield
+    finally:
+        labels = {"pipeline": pipeline, "stage": name}
+        observe("harmony_stage_seconds", labels, time.perf_counter() - start)
+        observe("harmony_stage_queries", labels, counter.count)
+
+
+def _format_labels(labels):
+    return ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    pid = ("pid", os.getpid())
+    lines = []
+    with _lock:
+        for name, (help_text, _, histograms) in sorted(_metrics.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(histograms.items()):
+                labels = labels + (pid,)
+                for bound, total in histogram.cumulative_counts():
+                    bucket_labels = _format_labels(labels + (("le", bound),))
+                    lines.append(f"{name}_bucket{{{bucket_labels}}} {total}")
+                lines.append(
+                    f"{name}_sum{{{_format_labels(labels)}}} {_format_value(histogram.sum)}"
+                )
+                lines.append(f"{name}_count{{{_format_labels(labels)}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        for _, _, histograms in _metrics.values():
+            histograms.clear()
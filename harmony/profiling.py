@@ -0,0 +1,162 @@
+"""
+On-demand profiling of staff requests.
+
+A staff request is profiled when it carries the X-Profile header or the
+?profile query flag, or when it is drawn at settings.PROFILE_SAMPLE_RATE. The
+flag's value picks the profiler:
+
+    ?profile=1 or ?profile=cprofile   deterministic cProfile, saved as .prof
+    ?profile=sample                   statistical stack sampler, saved as
+                                      collapsed stacks (.collapsed) for
+                                      flame graph tools
+
+Only the view is profiled: ProfilingMiddleware must come last in MIDDLEWARE so
+that every other middleware has run its process_view first. Captures are
+written to settings.PROFILE_DIR, which keeps the newest PROFILE_MAX_FILES
+files, and are listed for download on a staff page. Requests that are not
+profiled cost a header and a query string lookup (plus a random draw when
+sampling is enabled).
+"""
+import cProfile
+import logging
+import os
+import random
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_PARAM = "profile"
+PROFILE_FILE_EXTENSIONS = (".prof", ".collapsed")
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+
+_UNSAFE_CHARACTERS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def profile_dir():
+    return getattr(settings, "PROFILE_DIR", os.path.join(settings.ROOT_DIR, "profiles"))
+
+
+def list_profiles():
+    """Captures in the ring buffer, newest first."""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(PROFILE_FILE_EXTENSIONS):
+            stat = entry.stat()
+            profiles.append(
+                {
+                    "name": entry.name,
+                    "size": stat.st_size,
+                    "modified": datetime.fromtimestamp(stat.st_mtime),
+                }
+            )
+    return sorted(profiles, key=lambda profile: profile["modified"], reverse=True)
+
+
+def profile_path(name):
+    """Path of a capture in the ring buffer, or None for any other name."""
+    if name != os.path.basename(name) or not name.endswith(PROFILE_FILE_EXTENSIONS):
+        return None
+    path = os.path.join(profile_dir(), name)
+    return path if os.path.isfile(path) else None
+
+
+def _save(label, extension, write):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    name = "{}-{}-{}{}".format(
+        datetime.now().strftime("%Y%m%d-%H%M%S-%f"),
+        _UNSAFE_CHARACTERS.sub("_", label)[:80],
+        os.getpid(),
+        extension,
+    )
+    write(os.path.join(directory, name))
+    # the ring buffer keeps only the newest captures
+    for stale in list_profiles()[getattr(settings, "PROFILE_MAX_FILES", 50) :]:
+        try:
+            os.remove(os.path.join(directory, stale["name"]))
+        except OSError:
+            pass
+    return name
+
+
+class StackSampler:
+    """Samples the stack of one thread from a background thread."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def requested_profiler(self, request):
+        flag = request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+        if flag in (None, "", "0"):
+            rate = getattr(settings, "PROFILE_SAMPLE_RATE", 0)
+            if not rate or random.random() >= rate:
+                return None
+            flag = "cprofile"
+        if not request.user.is_staff:
+            return None
+        return "sample" if flag == "sample" else "cprofile"
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profiler = self.requested_profiler(request)
+        if profiler is None:
+            return None
+
+        match = request.resolver_match
+        label = match.view_name or match._func_path
+        if profiler == "sample":
+            with StackSampler(threading.get_ident()) as sampler:
+                response = view_func(request, *view_args, **view_kwargs)
+            name = _save(label, ".collapsed", sampler.write)
+        else:
+            profile = cProfile.Profile()
+            response = profile.runcall(view_func, request, *view_args, **view_kwargs)
+            name = _save(label, ".prof", profile.dump_stats)
+        logger.info("Saved profile %s of %s", name, request.get_full_path())
+        response["X-Profile"] = name
+        return response
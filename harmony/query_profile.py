@@ -0,0 +1,205 @@
+"""
+Per-request query profiling.
+
+QueryProfileMiddleware records, for every request, the number of queries, the
+time spent in the database, repeated query fingerprints and where in our code
+they were issued. A fingerprint repeated at least N_PLUS_ONE_THRESHOLD times
+from the same call site is reported as an N+1 pattern. Summaries are kept per
+view in a rolling, per-process store (the last ROLLING_WINDOW requests) and
+listed on a staff page.
+
+Views may declare a query budget:
+
+    @query_budget(12)
+    def course_activity_view(request, course_id):
+        ...
+
+Exceeding it logs a warning, or raises QueryBudgetExceeded when
+settings.QUERY_BUDGET_STRICT is set, as it should be in tests.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+ROLLING_WINDOW = 100
+N_PLUS_ONE_THRESHOLD = 5
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Declares the most queries a view is expected to run per request."""
+
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+
+    return decorator
+
+
+def fingerprint(sql):
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def call_site():
+    """The innermost frame of project code (not a dependency) on the stack."""
+    root = settings.ROOT_DIR
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(root)
+            and "site-packages" not in filename
+            and filename != __file__
+        ):
+            return f"{os.path.relpath(filename, root)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "?"
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0
+        self.fingerprints = Counter()  # (fingerprint, call site) -> count
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[(fingerprint(sql), call_site())] += 1
+
+    def duplicates(self):
+        counts = Counter()
+        for (sql, _), count in self.fingerprints.items():
+            counts[sql] += count
+        return sum(count - 1 for count in counts.values() if count > 1)
+
+    def n_plus_one(self):
+        return [
+            (site, sql, count)
+            for (sql, site), count in self.fingerprints.items()
+            if count >= N_PLUS_ONE_THRESHOLD
+        ]
+
+
+_lock = threading.Lock()
+_requests = defaultdict(lambda: deque(maxlen=ROLLING_WINDOW))  # view name -> deque
+
+
+def record(view_name, seconds, profile):
+    entry = {
+        "seconds": seconds,
+        "queries": profile.queries,
+        "db_seconds": profile.db_seconds,
+        "duplicates": profile.duplicates(),
+        "n_plus_one": profile.n_plus_one(),
+    }
+    with _lock:
+        _requests[view_name].append(entry)
+
+
+def summary():
+    """Per-view aggregates over the rolling window, slowest views first."""
+    with _lock:
+        snapshot = {name: list(entries) for name, entries in _requests.items()}
+    views = []
+    for name, entries in snapshot.items():
+        n_plus_one = Counter()
+        examples = {}
+        for entry in entries:
+            for site, sql, count in entry["n_plus_one"]:
+                n_plus_one[site] += 1
+                examples[site] = (sql, max(count, examples.get(site, ("", 0))[1]))
+        seconds = sorted(entry["seconds"] for entry in entries)
+        views.append(
+            {
+                "view": name,
+                "requests": len(entries),
+                "mean_ms": sum(seconds) / len(entries) * 1000,
+                "p95_ms": seconds[int(0.95 * (len(seconds) - 1))] * 1000,
+                "mean_queries": sum(e["queries"] for e in entries) / len(entries),
+                "max_queries": max(e["queries"] for e in entries),
+                "mean_db_ms": sum(e["db_seconds"] for e in entries) / len(entries) * 1000,
+                "mean_duplicates": sum(e["duplicates"] for e in entries) / len(entries),
+                "n_plus_one": [
+                    {
+                        "site": site,
+                        "requests": requests,
+                        "sql": examples[site][0],
+                        "max_repeats": examples[site][1],
+                    }
+                    for site, requests in n_plus_one.most_common()
+                ],
+            }
+        )
+    return sorted(views, key=lambda view: view["mean_ms"], reverse=True)
+
+
+def reset():
+    with _lock:
+        _requests.clear()
+
+
+class QueryProfileMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "QUERY_PROFILING", True):
+            return self.get_response(request)
+        profile = RequestProfile()
+        start = time.perf_counter()
+        with connection.execute_wrapper(profile):
+            response = self.get_response(request)
+        seconds = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            record(match.view_name or match._func_path, seconds, profile)
+            self.check_budget(request, match, profile)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(
+            view_func, "query_budget", getattr(settings, "QUERY_BUDGET_DEFAULT", None)
+        )
+
+    def check_budget(self, request, match, profile):
+        budget = getattr(request, "query_budget", None)
+        if budget is None or profile.queries <= budget:
+            return
+        message = "{} ran {} queries, over its budget of {}{}".format(
+            match.view_name or match._func_path,
+            profile.queries,
+            budget,
+            "".join(
+                f"\n  N+1 at {site}: {count}x {sql[:200]}"
+                for site, sql, count in profile.n_plus_one()
+            ),
+        )
+        if getattr(settings, "QUERY_BUDGET_STRICT", False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -2,6 +2,7 @@
 import os
 from os import path
 from glob import glob
+import re
 import time
 
 import dj_database_url
@@ -65,6 +66,12 @@ STATICFILES_FINDERS = (
     "django.contrib.staticfiles.finders.AppDirectoriesFinder",
     #    'django.contrib.staticfiles.finders.DefaultStorageFinder',
 )
+# {% static %} points to the content-hashed copies made by buildrequirejs,
+# which WhiteNoise serves with far-future, immutable caching headers
+STATICFILES_STORAGE = "lab.assets.HashedAssetsStorage"
+WHITENOISE_IMMUTABLE_FILE_TEST = r"^{0}(build/|js/build/main-[0-9a-f]{{32}}\.js)".format(
+    re.escape(STATIC_URL)
+)
 
 # Load templates from django app directories
 TEMPLATES = [
@@ -88,6 +95,9 @@ TEMPLATES = [
 ]
 
 MIDDLEWARE = (
+    # must stay first, it compresses the response last
+    "harmony.compression.CompressionMiddleware",
+    "harmony.query_profile.QueryProfileMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -98,8 +108,27 @@ MIDDLEWARE = (
     # Uncomment the next line for simple clickjacking protection:
     # 'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # must stay last, it profiles only the view
+    "harmony.profiling.ProfilingMiddleware",
 )
 
+# Per-request query profiling, see harmony.query_profile; off unless enabled
+# (the dev and local settings do), strict mode raises when a view runs more
+# queries than its declared budget (on when the tests run)
+QUERY_PROFILING = os.environ.get("QUERY_PROFILING", "0") == "1"
+QUERY_BUDGET_STRICT = os.environ.get("QUERY_BUDGET_STRICT", "0") == "1"
+QUERY_BUDGET_DEFAULT = None
+
+# Live course activity streams a process serves at once, each holding one of
+# its threads (gunicorn --threads in the Procfile); more are refused with 503
+# and the page polls instead, see apps.dashboard.course_activity
+COURSE_ACTIVITY_MAX_STREAMS = int(os.environ.get("COURSE_ACTIVITY_MAX_STREAMS", "8"))
+
+# On-demand profiling of staff requests, see harmony.profiling
+PROFILE_DIR = os.environ.get("PROFILE_DIR", path.join(ROOT_DIR, "profiles"))
+PROFILE_MAX_FILES = 50
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+
 AUTHENTICATION_BACKENDS = (
     "django.contrib.auth.backends.ModelBackend",
     "apps.accounts.backend.EmailAuthenticationBackend",
@@ -368,9 +397,28 @@ ENVIRONMENT_PROD = "prod"
 
 SENTRY_DSN = os.environ.get("SENTRY_DSN")
 
+# The default cache is two-tiered: a bounded in-process LRU in front of the
+# "shared" cache, which any backend reachable by all workers can replace.
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
-        "LOCATION": "django_viewcache",
-    }
+        "BACKEND": "harmony.cache.TieredCache",
+        "LOCATION": "shared",
+        "OPTIONS": {
+            "LOCAL_MAX_ENTRIES": 1000,
+            "LOCAL_TIMEOUT": 30,  # seconds
+            "NAMESPACE_VERSION_TIMEOUT": 5,  # seconds
+            # generation counters must be current in every worker
+            "SHARED_ONLY_NAMESPACES": ["generation"],
+        },
+    },
+    # shared by all processes and dynos, with an atomic incr(): the database
+    # cache table made by createcachetable in the release phase, or e.g.
+    # memcached through SHARED_CACHE_BACKEND and SHARED_CACHE_LOCATION
+    "shared": {
+        "BACKEND": os.environ.get(
+            "SHARED_CACHE_BACKEND", "harmony.cache.LockingDatabaseCache"
+        ),
+        "LOCATION": os.environ.get("SHARED_CACHE_LOCATION", "django_viewcache"),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
 }
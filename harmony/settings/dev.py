@@ -1,4 +1,6 @@
 # Local development settings
+import sys
+
 from harmony.settings.common import *
 
 INSTALLED_APPS += (
@@ -10,6 +12,10 @@ MIDDLEWARE += (
     #    'debug_toolbar.middleware.DebugToolbarMiddleware',
 )
 
+# Query profiling is on in development, and budgets are enforced in the tests
+QUERY_PROFILING = True
+QUERY_BUDGET_STRICT = QUERY_BUDGET_STRICT or sys.argv[1:2] == ["test"]
+
 if SENTRY_DSN:
     sentry_sdk.init(
         dsn=SENTRY_DSN,
@@ -1,3 +1,5 @@
+import sys
+
 from harmony.settings.common import *  # NOQA
 
 DEBUG = True
@@ -8,6 +10,10 @@ SECRET_KEY = os.environ.get("SECRET_KEY", "DEFAULT_SECRET_KEY")
 
 ALLOWED_HOSTS = ["0.0.0.0", "localhost", "127.0.0.1"]
 
+# Query profiling is on in development, and budgets are enforced in the tests
+QUERY_PROFILING = True
+QUERY_BUDGET_STRICT = QUERY_BUDGET_STRICT or sys.argv[1:2] == ["test"]
+
 if SENTRY_DSN:
     sentry_sdk.init(
         dsn=SENTRY_DSN,
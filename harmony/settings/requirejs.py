@@ -12,14 +12,18 @@ log = logging.getLogger(__name__)
 #
 # The contents should be JSON like this:
 #
-#   {"main": "main-a1e2d2b970b1b0ced1d9b4e96442ef1f"}
+#   {"main": "main-a1e2d2b970b1b0ced1d9b4e96442ef1f", "assets": {...}}
 #
-# If a main.js build can't be found, the default require.js config will be used,
-# which will result in each module file being loaded separately.
+# The vendor libs are then loaded from their content-hashed copies in
+# "assets", see lab/assets.py.
+#
+# The build is local and is not in git. If a main.js build can't be found, the
+# default require.js config will be used, which will result in each module file
+# being loaded separately; libs whose copy is missing are loaded as they are.
 #
 # To build, execute this python script:
 #
-#   ./build-requirejs.py
+#   ./manage.py buildrequirejs
 #
 def configure(ROOT_DIR, STATIC_URL):
     try:
@@ -47,11 +51,26 @@ def configure(ROOT_DIR, STATIC_URL):
                 "requirejs build file not found: {0}".format(REQUIREJS_BUILD_FILE)
             )
 
+        STATIC_DIR = os.path.join(ROOT_DIR, "lab", "static")
         if REQUIREJS_BUILD is not None:
-            REQUIREJS_DEBUG = False
-            REQUIREJS_CONFIG["paths"]["app/main"] = os.path.join(
-                STATIC_URL, "js", "build", REQUIREJS_BUILD["main"]
-            )
+            main = os.path.join("js", "build", REQUIREJS_BUILD["main"])
+            if os.path.isfile(os.path.join(STATIC_DIR, main + ".js")):
+                REQUIREJS_DEBUG = False
+                REQUIREJS_CONFIG["paths"]["app/main"] = os.path.join(STATIC_URL, main)
+            else:
+                log.warning("requirejs build not found: {0}.js".format(main))
+            for name, hashed in REQUIREJS_BUILD.get("assets", {}).items():
+                lib, module = os.path.split(os.path.splitext(name)[0])
+                # require.js itself is loaded by a script tag
+                if (
+                    lib == "js/lib"
+                    and name.endswith(".js")
+                    and module != "require"
+                    and os.path.isfile(os.path.join(STATIC_DIR, hashed))
+                ):
+                    REQUIREJS_CONFIG["paths"][module] = os.path.join(
+                        STATIC_URL, os.path.splitext(hashed)[0]
+                    )
     except IOError as e:
         log.error(
             "error reading requirejs build file: ({0}) {1}".format(e.errno, e.strerror)
@@ -0,0 +1,72 @@
+import threading
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+
+from harmony.cache import TieredCache
+
+THREADS = 8
+INCREMENTS = 25
+
+
+class LockingDatabaseCacheTest(TransactionTestCase):
+    def setUp(self):
+        self.shared = caches["shared"]
+        self.shared.set("counter", 0, timeout=None)
+
+    def tearDown(self):
+        self.shared.clear()
+
+    def test_concurrent_incr(self):
+        def increment():
+            try:
+                for _ in range(INCREMENTS):
+                    caches["shared"].incr("counter")
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=increment) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.shared.get("counter"), THREADS * INCREMENTS)
+
+    def expiry_year(self, key):
+        with connections["default"].cursor() as cursor:
+            cursor.execute(
+                "SELECT expires FROM django_viewcache WHERE cache_key = %s",
+                [self.shared.make_key(key)],
+            )
+            return cursor.fetchone()[0].year
+
+    def test_incr_keeps_expiry(self):
+        # set() without a timeout would give the default of 5 minutes
+        self.assertEqual(self.shared.incr("counter", 2), 2)
+        self.assertEqual(self.shared.get("counter"), 2)
+        self.assertEqual(self.expiry_year("counter"), 9999)
+
+    def test_incr_missing(self):
+        with self.assertRaises(ValueError):
+            self.shared.incr("missing")
+        self.shared.set("expired", 1, timeout=-1)
+        with self.assertRaises(ValueError):
+            self.shared.incr("expired")
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "harmony.cache.TieredCache", "LOCATION": "plain"},
+        "plain": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "django_viewcache",
+        },
+    }
+)
+class TieredCacheSharedTest(TransactionTestCase):
+    def test_refuses_non_atomic_incr(self):
+        tiered = TieredCache("plain", {})
+        with self.assertRaises(ImproperlyConfigured):
+            tiered.get("course_activity:C1")
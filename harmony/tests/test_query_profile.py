@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path
+
+from harmony.query_profile import QueryBudgetExceeded, query_budget
+
+User = get_user_model()
+
+
+@query_budget(1)
+def one_query_view(request):
+    return HttpResponse(str(User.objects.count()))
+
+
+@query_budget(1)
+def two_queries_view(request):
+    return HttpResponse(str(User.objects.count() + User.objects.count()))
+
+
+urlpatterns = [
+    path("one/", one_query_view),
+    path("two/", two_queries_view),
+]
+
+
+@override_settings(
+    ROOT_URLCONF=__name__, QUERY_PROFILING=True, QUERY_BUDGET_STRICT=True
+)
+class QueryBudgetTest(TestCase):
+    def test_within_budget(self):
+        response = self.client.get("/one/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_over_budget_raises(self):
+        with self.assertRaisesRegex(QueryBudgetExceeded, "ran 2 queries"):
+            self.client.get("/two/")
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_over_budget_logs(self):
+        with self.assertLogs("harmony.query_profile", "WARNING"):
+            response = self.client.get("/two/")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_PROFILING=False)
+    def test_profiling_off(self):
+        response = self.client.get("/two/")
+        self.assertEqual(response.status_code, 200)
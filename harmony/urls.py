@@ -5,6 +5,12 @@ from django.contrib import admin # enable admin
 admin.autodiscover()
 
 import lab.urls
+from harmony.views import (
+    metrics_view,
+    profile_download_view,
+    profiles_view,
+    query_profile_view,
+)
 
 admin.site.site_header = "Analytic Piano • Admin Main Menu"
 admin.site.site_title = "Analytic Piano"
@@ -17,6 +23,10 @@ urlpatterns = [
     path("ckeditor/", include("ckeditor_uploader.urls")),
     # url(r'^admin/doc/', include('django.contrib.admindocs.urls')),# enable admin documentation
     path("analytic-piano-app-admin/", admin.site.urls, name="admin"),# enable admin
+    path("metrics/", metrics_view, name="metrics"),
+    path("metrics/queries/", query_profile_view, name="query-profile"),
+    path("metrics/profiles/", profiles_view, name="profiles"),
+    path("metrics/profiles/<str:name>", profile_download_view, name="profile-download"),
 ]
 
 handler404 = "harmony.views.error_404"
@@ -1,5 +1,12 @@
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
 
+from harmony import metrics, profiling, query_profile
+
 
 def error_404(request, exception):
     data = {}
@@ -14,3 +21,43 @@ def error_404(request, exception):
         pass
 
     return render(request, "404.html", data)
+
+
+@staff_member_required
+def metrics_view(request):
+    """Stage histograms of this worker process, in the Prometheus text format."""
+    return HttpResponse(
+        metrics.render_prometheus(), content_type="text/plain; version=0.0.4"
+    )
+
+
+@staff_member_required
+def query_profile_view(request):
+    return render(
+        request,
+        "metrics/query-profile.html",
+        {
+            "views": query_profile.summary(),
+            "enabled": getattr(settings, "QUERY_PROFILING", True),
+            "window": query_profile.ROLLING_WINDOW,
+            "threshold": query_profile.N_PLUS_ONE_THRESHOLD,
+            "pid": os.getpid(),
+        },
+    )
+
+
+@staff_member_required
+def profiles_view(request):
+    return render(
+        request,
+        "metrics/profiles.html",
+        {"profiles": profiling.list_profiles(), "pid": os.getpid()},
+    )
+
+
+@staff_member_required
+def profile_download_view(request, name):
+    path = profiling.profile_path(name)
+    if path is None:
+        raise Http404("No such profile.")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
@@ -0,0 +1,67 @@
+"""
+Content-hashed copies of the static assets in lab/static.
+
+The buildrequirejs command copies every asset to lab/static/build with a hash
+of its content in the file name, next to gzip and brotli variants, and maps
+the names to the copies in data/requirejs/build.json:
+
+    {
+        "main": "main-a1e2d2b970b1b0ced1d9b4e96442ef1f",
+        "assets": {"css/harmony.css": "build/css/harmony.3f2a9c1d7e4b.css", ...}
+    }
+
+Since a hashed copy never changes, WhiteNoise serves it with far-future,
+immutable caching headers (see WHITENOISE_IMMUTABLE_FILE_TEST). Templates get
+the copies through {% static %}, and the sampler through sample_manifest().
+
+The build is local: build.json and the copies are not in git. Without a build,
+and for every copy missing from lab/static (e.g. a build.json from another
+checkout), names map to themselves.
+"""
+import json
+import logging
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import StaticFilesStorage
+
+log = logging.getLogger(__name__)
+
+BUILD_DATA_FILE = os.path.join(settings.ROOT_DIR, "data", "requirejs", "build.json")
+STATIC_DIR = os.path.join(settings.ROOT_DIR, "lab", "static")
+
+
+@lru_cache(maxsize=None)
+def hashed_assets():
+    try:
+        with open(BUILD_DATA_FILE) as f:
+            assets = json.load(f).get("assets", {})
+    except FileNotFoundError:
+        return {}
+    except (IOError, ValueError) as e:
+        log.error("error reading requirejs build file: {0}".format(e))
+        return {}
+    missing = [
+        name
+        for name, hashed in assets.items()
+        if not os.path.isfile(os.path.join(STATIC_DIR, hashed))
+    ]
+    if missing:
+        log.warning(
+            "{0} hashed copies of the build are missing, serving the originals".format(
+                len(missing)
+            )
+        )
+    return {name: hashed for name, hashed in assets.items() if name not in missing}
+
+
+def hashed_name(name):
+    return hashed_assets().get(name, name)
+
+
+class HashedAssetsStorage(StaticFilesStorage):
+    """Static files storage whose URLs point to the hashed copies."""
+
+    def url(self, name):
+        return super().url(hashed_name(name))
@@ -0,0 +1,170 @@
+"""
+Compact encoding of exercise data, for the lab pages and the exercise
+definition endpoint.
+
+Exercise data stores every chord as an object and the analysis and highlight
+modes as maps of booleans:
+
+    {
+        "chord": [{"visible": [46, 65, 70], "hidden": [62], "rhythmValue": "w"}, ...],
+        "analysis": {"enabled": true, "mode": {"note_names": true, "roman_numerals": false}},
+        ...
+    }
+
+Format 1 packs every chord into one array of notes, the hidden ones as their
+bitwise complement (~62 == -63), the rhythm values into one string with a
+character per chord ("." for none), and the modes into bitflags of the mode
+names in ANALYSIS_MODES and HIGHLIGHT_MODES: [enabled, present, on], where
+present has the bits of the modes in the map and on those that are true:
+
+    {
+        "format": 1,
+        "chords": [[46, 65, 70, -63], ...],
+        "rhythm": "w...",
+        "analysis": [1, 1026, 2],
+        ...
+    }
+
+Data that does not fit the format, e.g. a mode without a bit, is passed
+through unchanged. The client decodes it in app/models/exercise_format.js, so
+the lists of modes there must stay the same (lab/tests checks this), and
+decode_exercise_data() here decodes it the same way. Modes may only be
+appended.
+"""
+FORMAT_VERSION = 1
+
+ANALYSIS_MODES = [
+    "abbreviate_thoroughbass",
+    "note_names",
+    "fixed_do",
+    "scientific_pitch",
+    "pitch_class",
+    "spacing",
+    "scale_degrees",
+    "solfege",
+    "do_based_solfege",
+    "thoroughbass",
+    "roman_numerals",
+    "chord_labels",
+    "intervals",
+    "intervals_wrap_after_octave",
+    "intervals_wrap_after_octave_plus_ditone",
+    "generic_intervals",
+    "generic_intervals_wrap_after_octave",
+    "generic_intervals_wrap_after_octave_plus_ditone",
+    "pci",
+    "set_class_set",
+    "set_class_normal",
+    "set_class_prime",
+    "set_class_forte",
+]
+
+HIGHLIGHT_MODES = [
+    "roothighlight",
+    "tritonehighlight",
+    "doublinghighlight",
+    "modalmixturehighlight",
+    "loweredhighlight",
+    "solobass",
+    "octaveshighlight",
+]
+
+NO_RHYTHM = "."
+ENCODED_KEYS = ("format", "chords", "rhythm")
+
+
+def _is_note(note):
+    return isinstance(note, int) and not isinstance(note, bool)
+
+
+def encode_chords(chords):
+    """(packed chords, rhythm string), or None if a chord does not fit."""
+    packed, rhythm = [], []
+    for chord in chords:
+        if not isinstance(chord, dict) or set(chord) - {"rhythmValue"} != {
+            "visible",
+            "hidden",
+        }:
+            return None
+        visible, hidden = chord["visible"], chord["hidden"]
+        if not isinstance(visible, list) or not isinstance(hidden, list):
+            return None
+        if not all(_is_note(note) and note >= 0 for note in visible + hidden):
+            return None
+        rhythm_value = chord.get("rhythmValue", NO_RHYTHM)
+        if not isinstance(rhythm_value, str) or len(rhythm_value) != 1:
+            return None
+        if "rhythmValue" in chord and rhythm_value == NO_RHYTHM:
+            return None
+        packed.append(visible + [~note for note in hidden])
+        rhythm.append(rhythm_value)
+    return packed, "".join(rhythm)
+
+
+def encode_modes(settings, modes):
+    """[enabled, present, on] of analysis or highlight settings, or None."""
+    if not isinstance(settings, dict) or set(settings) != {"enabled", "mode"}:
+        return None
+    if not isinstance(settings["mode"], dict) or not isinstance(settings["enabled"], bool):
+        return None
+    present = on = 0
+    for mode, value in settings["mode"].items():
+        if mode not in modes or not isinstance(value, bool):
+            return None
+        bit = 1 << modes.index(mode)
+        present |= bit
+        if value:
+            on |= bit
+    return [int(settings["enabled"]), present, on]
+
+
+def decode_modes(flags, modes):
+    enabled, present, on = flags
+    mode = {}
+    for index, name in enumerate(modes):
+        bit = 1 << index
+        if present & bit:
+            mode[name] = bool(on & bit)
+    return {"enabled": enabled == 1, "mode": mode}
+
+
+def encode_exercise_data(data):
+    if any(key in data for key in ENCODED_KEYS):
+        # would be taken for encoded data
+        return dict(data)
+    encoded = dict(data, format=FORMAT_VERSION)
+    chords = encode_chords(data["chord"]) if isinstance(data.get("chord"), list) else None
+    if chords is not None:
+        del encoded["chord"]
+        encoded["chords"], rhythm = chords
+        if rhythm.strip(NO_RHYTHM):
+            encoded["rhythm"] = rhythm
+    for field, modes in (("analysis", ANALYSIS_MODES), ("highlight", HIGHLIGHT_MODES)):
+        if field in data:
+            flags = encode_modes(data[field], modes)
+            if flags is not None:
+                encoded[field] = flags
+    return encoded
+
+
+def decode_exercise_data(encoded):
+    """The data encoded by encode_exercise_data, as the client decodes it."""
+    if encoded.get("format") != FORMAT_VERSION:
+        return encoded
+    data = dict(encoded)
+    del data["format"]
+    if isinstance(data.get("chords"), list):
+        rhythm = data.pop("rhythm", "")
+        data["chord"] = []
+        for index, notes in enumerate(data.pop("chords")):
+            chord = {
+                "visible": [note for note in notes if note >= 0],
+                "hidden": [~note for note in notes if note < 0],
+            }
+            if index < len(rhythm) and rhythm[index] != NO_RHYTHM:
+                chord["rhythmValue"] = rhythm[index]
+            data["chord"].append(chord)
+    for field, modes in (("analysis", ANALYSIS_MODES), ("highlight", HIGHLIGHT_MODES)):
+        if isinstance(data.get(field), list):
+            data[field] = decode_modes(data[field], modes)
+    return data
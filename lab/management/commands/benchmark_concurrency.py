@@ -0,0 +1,157 @@
+# DESCRIPTION
+#
+# Measures how many concurrent requests to the lightweight AJAX endpoints a
+# running server sustains: the user preferences, the volume setting and the
+# exercise performance history. Logged in clients, one per thread, fire
+# requests back to back at each concurrency level, and the throughput and
+# latency percentiles of every level are reported.
+#
+# Run it against the deployment of the Procfile and against alternatives to
+# compare them, e.g. sync workers against threaded ones:
+#
+#   gunicorn harmony.wsgi:application --workers 4
+#   gunicorn harmony.wsgi:application --workers 4 --worker-class gthread --threads 32
+#
+# The clients are synthetic students, see generate_synthetic_data.
+#
+# USAGE:
+#
+#   ./manage.py benchmark_concurrency --concurrency 1 8 32 64 --requests 1000
+#   ./manage.py benchmark_concurrency --url http://127.0.0.1:8000 --output sync.json
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.models import VOLUME_CHOICES
+from apps.exercises.management.commands.generate_synthetic_data import synthetic_users
+from apps.exercises.models import PerformanceData
+from lab.management.commands.loadtest import Recorder, login, percentile
+
+VOLUMES = [volume for volume, _ in VOLUME_CHOICES]
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent requests to the lightweight AJAX endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--prefix", default="synth", help="Prefix of synthetic users")
+        parser.add_argument(
+            "--concurrency", type=int, nargs="+", default=[1, 8, 32, 64]
+        )
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Requests per concurrency level"
+        )
+        parser.add_argument("--output", help="File to write the JSON results to")
+
+    def handle(self, *args, **options):
+        self.base_url = options["url"].rstrip("/")
+        performances = list(
+            PerformanceData.objects.filter(user__in=synthetic_users(options["prefix"]))
+            .select_related("user", "playlist")
+            .order_by("user_id", "id")
+            .distinct("user_id")[: max(options["concurrency"])]
+        )
+        if not performances:
+            raise CommandError(
+                f"No synthetic students with prefix {options['prefix']!r}; "
+                "run generate_synthetic_data first"
+            )
+
+        # clients log in once, outside of the measurements
+        recorder = Recorder()
+        clients = []
+        for performance in performances:
+            session = login(recorder, self.base_url, performance.user.email)
+            if session is None:
+                raise CommandError(f"{performance.user.email} could not log in")
+            clients.append((session, performance.playlist.id))
+
+        self.stdout.write(
+            "{:>11} {:>9} {:>7} {:>9} {:>9} {:>9}".format(
+                "concurrency", "req/s", "errors", "p50 ms", "p95 ms", "p99 ms"
+            )
+        )
+        levels = {}
+        for concurrency in options["concurrency"]:
+            levels[concurrency] = self.run_level(
+                [clients[i % len(clients)] for i in range(concurrency)],
+                options["requests"],
+            )
+            level = levels[concurrency]
+            self.stdout.write(
+                "{:>11} {:>9.1f} {:>6.1%} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                    concurrency,
+                    level["throughput"],
+                    level["error_rate"],
+                    level["p50_ms"],
+                    level["p95_ms"],
+                    level["p99_ms"],
+                )
+            )
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump({"url": self.base_url, "levels": levels}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def run_level(self, clients, total):
+        recorder = Recorder()
+        per_client = max(1, total // len(clients))
+        threads = [
+            threading.Thread(
+                target=self.client, args=(recorder, session, playlist_id, per_client)
+            )
+            for session, playlist_id in clients
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        seconds = sorted(s for values in recorder.seconds.values() for s in values)
+        errors = sum(recorder.errors.values())
+        return {
+            "requests": len(seconds),
+            "errors": errors,
+            "error_rate": errors / len(seconds),
+            "throughput": len(seconds) / elapsed,
+            "p50_ms": percentile(seconds, 0.50) * 1000,
+            "p95_ms": percentile(seconds, 0.95) * 1000,
+            "p99_ms": percentile(seconds, 0.99) * 1000,
+            "endpoints": recorder.report(elapsed),
+        }
+
+    def client(self, recorder, session, playlist_id, count):
+        # the mix of a student working through a playlist: preferences and
+        # history with every exercise, a volume change now and then
+        for num in range(count):
+            if num % 3 == 0:
+                recorder.request(
+                    "preferences",
+                    session,
+                    "GET",
+                    f"{self.base_url}/ajax/preferences/",
+                    200,
+                    headers={"X-Requested-With": "XMLHttpRequest"},
+                )
+            elif num % 9 == 1:
+                recorder.request(
+                    "volume",
+                    session,
+                    "PATCH",
+                    f"{self.base_url}/ajax/preferences/",
+                    200,
+                    json={"volume": VOLUMES[num % len(VOLUMES)]},
+                )
+            else:
+                recorder.request(
+                    "history",
+                    session,
+                    "GET",
+                    f"{self.base_url}/ajax/playlists/{playlist_id}/{num % 4 + 1}/history/",
+                    200,
+                )
@@ -0,0 +1,108 @@
+# DESCRIPTION
+#
+# Reports the size of the exercise data the lab sends to the client, in the
+# verbose form it is stored in and in the compact format of
+# lab/exercise_format.py, each as is and compressed with gzip and brotli as
+# CompressionMiddleware does.
+#
+# The largest exercises in the database are measured, and exercises of the
+# given numbers of chords made by repeating the chords of the largest one, as
+# stored exercises are short. The repetition flatters their compressed sizes.
+#
+# Brotli sizes need the brotli package.
+#
+# USAGE:
+#
+#   ./manage.py benchmark_payloads
+#   ./manage.py benchmark_payloads --top 10 --chords 64 256 1024 --output payloads.json
+import json
+
+from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.fields.jsonb import KeyTransform
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import CharField, Func, IntegerField
+from django.db.models.functions import Cast
+from django.utils.text import compress_string
+
+from apps.exercises.models import Exercise
+from harmony.compression import BROTLI_QUALITY, brotli
+from lab.exercise_format import encode_exercise_data
+
+
+def payload_sizes(data):
+    verbose = json.dumps(data).encode()
+    compact = json.dumps(encode_exercise_data(data), separators=(",", ":")).encode()
+    sizes = {}
+    for name, content in (("verbose", verbose), ("compact", compact)):
+        sizes[name] = len(content)
+        sizes[f"{name}_gzip"] = len(compress_string(content))
+        sizes[f"{name}_brotli"] = (
+            len(brotli.compress(content, quality=BROTLI_QUALITY)) if brotli else None
+        )
+    return sizes
+
+
+class Command(BaseCommand):
+    help = "Report the payload sizes of exercise data, verbose and compact."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top", type=int, default=5, help="Number of largest exercises to measure"
+        )
+        parser.add_argument(
+            "--chords",
+            type=int,
+            nargs="*",
+            default=[64, 256, 1024],
+            help="Numbers of chords of the repeated exercises",
+        )
+        parser.add_argument("--output", help="File to write the JSON results to")
+
+    def handle(self, *args, **options):
+        # Exercise.data is a json column (RawJSONField), cast for the jsonb functions
+        chord = Cast(KeyTransform("chord", "data"), JSONField())
+        exercises = list(
+            Exercise.objects.annotate(
+                chord_type=Func(chord, function="jsonb_typeof", output_field=CharField())
+            )
+            .filter(chord_type="array")
+            .annotate(
+                chord_count=Func(
+                    chord, function="jsonb_array_length", output_field=IntegerField()
+                )
+            )
+            .filter(chord_count__gt=0)
+            .order_by("-chord_count", "id")[: options["top"]]
+        )
+        if not exercises:
+            raise CommandError("No exercises with chords to measure")
+
+        rows = {}
+        for exercise in exercises:
+            rows[exercise.id] = {
+                "chords": exercise.chord_count,
+                **payload_sizes(exercise.data),
+            }
+        largest = exercises[0]
+        for count in options["chords"]:
+            chords = largest.data["chord"]
+            data = dict(
+                largest.data, chord=[chords[i % len(chords)] for i in range(count)]
+            )
+            rows[f"{largest.id}x{count}"] = {"chords": count, **payload_sizes(data)}
+
+        columns = ["verbose", "compact", "verbose_gzip", "compact_gzip"]
+        columns += ["verbose_brotli", "compact_brotli"] if brotli else []
+        self.stdout.write(
+            "{:<14} {:>6} ".format("exercise", "chords")
+            + " ".join("{:>14}".format(column) for column in columns)
+        )
+        for name, row in rows.items():
+            self.stdout.write(
+                "{:<14} {:>6} ".format(name, row["chords"])
+                + " ".join("{:>14}".format(row[column]) for column in columns)
+            )
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(rows, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
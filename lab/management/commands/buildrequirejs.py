@@ -1,12 +1,30 @@
 # DESCRIPTION
 #
 # This script builds and minifies the require.js modules into a single
-# file for production usage.
+# file for production usage, and makes content-hashed, precompressed copies
+# of all other static assets.
 #
 # Running this script results in a minified JS file and a JSON file that
 # tells the app how to configure requrejs so that it uses the minified
 # file instead of loading each module separately.
 #
+# Every asset in lab/static (vendor libs, CSS, fonts, images, audio) is then
+# copied to lab/static/build with a hash of its content in its name, and the
+# JSON file maps the names to the copies (see lab/assets.py). References to
+# other assets in the CSS are rewritten to the copies. Gzip and brotli
+# variants are written next to the main file and the copies, except for
+# formats that are compressed already. WhiteNoise serves all of them with
+# immutable caching headers.
+#
+# Rebuilds are incremental: the optimizer only runs if a module changed, and
+# only assets that changed since the previous build are hashed and compressed
+# again. Copies in neither this build nor the previous one are removed, so
+# that pages served by the previous release keep working while it rolls over.
+#
+# Run collectstatic afterwards, so that the copies are deployed. The build is
+# local: build.json, the main file and the copies are ignored by git, and a
+# deploy without them serves the original files (see lab/assets.py).
+#
 # DEPENDENCIES:
 #
 # Node.js must be installed along with the require.js optimizer:
@@ -19,34 +37,108 @@
 #
 # Note: "optimize=none" flag disables minification.
 #
+# The brotli variants need the brotli package (in the Pipfile); without it,
+# only gzip variants are written.
+#
 # USAGE:
 #
 #   ./manage.py buildrequirejs
+#   ./manage.py buildrequirejs --force
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+from whitenoise.compress import Compressor
 
 import subprocess
 import os
+import posixpath
+import re
 import shutil
 import hashlib
 import json
 
 ROOT_DIR = settings.ROOT_DIR
-BUILD_CONFIG = os.path.join(ROOT_DIR, "lab", "static", "js", "conf", "requirejs.json")
-BUILD_OUTPUT_DIR = os.path.join(ROOT_DIR, "lab", "static", "js", "build")
+STATIC_DIR = os.path.join(ROOT_DIR, "lab", "static")
+BUILD_CONFIG = os.path.join(STATIC_DIR, "js", "conf", "requirejs.json")
+BUILD_OUTPUT_DIR = os.path.join(STATIC_DIR, "js", "build")
 BUILD_OUTPUT_FILE = os.path.join(BUILD_OUTPUT_DIR, "main-built.js")
 BUILD_DATA_DIR = os.path.join(ROOT_DIR, "data", "requirejs")
 BUILD_DATA_FILE = os.path.join(BUILD_DATA_DIR, "build.json")
+ASSETS_OUTPUT_DIR = os.path.join(STATIC_DIR, "build")
+
+# inputs of the optimizer
+MODULE_DIRS = ["js/conf", "js/lib", "js/src"]
+# not assets: the modules in the main file, builds, and design sources
+SKIP_ASSET_DIRS = ("build/", "js/build/", "js/conf/", "js/src/")
+SKIP_ASSET_EXTENSIONS = (".psd", ".sfd")
+# compressed already, in addition to the images, fonts and archives
+SKIP_COMPRESS_EXTENSIONS = Compressor.SKIP_COMPRESS_EXTENSIONS + ("ogg", "mp3")
+
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def file_hash(path):
+    m = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            m.update(chunk)
+    return m.hexdigest()
+
+
+def static_files(top=""):
+    """Names of the files in lab/static, below top, in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(os.path.join(STATIC_DIR, top)):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            yield os.path.relpath(path, STATIC_DIR).replace(os.sep, "/")
 
 
 class Command(BaseCommand):
-    help = "Builds and combines the RequireJS modules."
+    help = "Builds and combines the RequireJS modules and hashes the static assets."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild everything, even if nothing changed",
+        )
 
     def handle(self, *args, **options):
         self._check_build_paths()
-        self._run_optimizer()
-        version = self._get_build_version()
-        self._install_build(version)
+        build_data = self._read_build_data()
+        previous = {} if options["force"] else build_data
+        self.compressor = Compressor(extensions=SKIP_COMPRESS_EXTENSIONS, quiet=True)
+
+        modules = self._get_modules_version()
+        main = previous.get("main")
+        if (
+            main is None
+            or previous.get("modules") != modules
+            or not os.path.exists(os.path.join(BUILD_OUTPUT_DIR, main + ".js"))
+        ):
+            self._run_optimizer()
+            version = self._get_build_version()
+            main = self._install_build(version)
+        else:
+            self.stdout.write("Skipping optimizer, no module changed since {0}".format(main))
+
+        sources, assets = self._hash_assets(previous.get("sources", {}))
+        self._remove_stale_copies(assets, build_data.get("assets", {}))
+        self._write_build_data(
+            {"main": main, "modules": modules, "assets": assets, "sources": sources}
+        )
+
+    def _read_build_data(self):
+        try:
+            with open(BUILD_DATA_FILE) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _write_build_data(self, data):
+        with open(BUILD_DATA_FILE, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        self.stdout.write("Updated build data in {0}".format(BUILD_DATA_FILE))
 
     def _install_build(self, version):
         build_file_name = "main-{0}".format(version)
@@ -58,35 +150,112 @@ class Command(BaseCommand):
             )
         else:
             shutil.copy(BUILD_OUTPUT_FILE, build_path)
+            self._compress(build_path)
             self.stdout.write("Created new version {0}".format(build_path))
-
-            f = open(BUILD_DATA_FILE, "w+")
-            f.write(json.dumps({"main": build_file_name}))
-            f.close()
-            self.stdout.write("Updated build data in {0}".format(BUILD_DATA_FILE))
+        return build_file_name
 
     def _get_build_version(self):
-        version = "VERSION"
-        with open(BUILD_OUTPUT_FILE) as f:
-            m = hashlib.md5()
-            while True:
-                chunk = f.read(128)  # 128 bytes for md5 block size
-                if not chunk:
-                    break
-                m.update(chunk)
-            version = m.hexdigest()
+        version = file_hash(BUILD_OUTPUT_FILE)
         self.stdout.write("Got version {0}".format(version))
         return version
 
+    def _get_modules_version(self):
+        m = hashlib.md5()
+        for top in MODULE_DIRS:
+            for name in static_files(top):
+                m.update(name.encode())
+                m.update(file_hash(os.path.join(STATIC_DIR, name)).encode())
+        return m.hexdigest()
+
+    def _hash_assets(self, previous_sources):
+        """Copies the changed assets, and returns the state of the sources
+        and the names of all copies."""
+        sources, assets = {}, {}
+        stylesheets = []
+        for name in static_files():
+            if name.startswith(SKIP_ASSET_DIRS) or name.endswith(SKIP_ASSET_EXTENSIONS):
+                continue
+            if name.endswith(".css"):
+                # after the assets they refer to, whose names they need
+                stylesheets.append(name)
+                continue
+            path = os.path.join(STATIC_DIR, name)
+            stat = os.stat(path)
+            source = previous_sources.get(name)
+            if (
+                source is None
+                or source["mtime"] != stat.st_mtime_ns
+                or source["size"] != stat.st_size
+                or not os.path.exists(os.path.join(STATIC_DIR, source["hashed"]))
+            ):
+                with open(path, "rb") as f:
+                    hashed = self._install_asset(name, f.read())
+                source = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "hashed": hashed}
+            sources[name] = source
+            assets[name] = source["hashed"]
+
+        for name in stylesheets:
+            # cheap, and depends on the copies of the assets it refers to
+            with open(os.path.join(STATIC_DIR, name), encoding="utf-8") as f:
+                css = self._rewrite_css_urls(name, f.read(), assets)
+            assets[name] = self._install_asset(name, css.encode("utf-8"))
+        self.stdout.write("Hashed {0} assets".format(len(assets)))
+        return sources, assets
+
+    def _install_asset(self, name, content):
+        root, ext = posixpath.splitext(name)
+        version = hashlib.md5(content).hexdigest()[:12]
+        hashed = "build/{0}.{1}{2}".format(root, version, ext)
+        path = os.path.join(STATIC_DIR, hashed)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(content)
+            self._compress(path)
+            self.stdout.write("Created {0}".format(hashed))
+        return hashed
+
+    def _rewrite_css_urls(self, name, css, assets):
+        directory = posixpath.dirname(name)
+
+        def rewrite(match):
+            quote, url = match.groups()
+            if url.startswith(("data:", "/", "#")) or "://" in url:
+                return match.group(0)
+            path, suffix = re.match(r"([^?#]*)(.*)", url).groups()
+            target = assets.get(posixpath.normpath(posixpath.join(directory, path)))
+            if target is None:
+                return match.group(0)
+            relative = posixpath.relpath(target, posixpath.join("build", directory))
+            return "url({0}{1}{2}{0})".format(quote, relative, suffix)
+
+        return CSS_URL_RE.sub(rewrite, css)
+
+    def _compress(self, path):
+        if self.compressor.should_compress(path):
+            list(self.compressor.compress(path))
+
+    def _remove_stale_copies(self, assets, previous_assets):
+        # the previous build's copies are kept for one more generation
+        keep = set(assets.values()) | set(previous_assets.values())
+        for name in static_files("build"):
+            copy = re.sub(r"\.(gz|br)$", "", name)
+            if copy not in keep:
+                os.remove(os.path.join(STATIC_DIR, name))
+                self.stdout.write("Removed {0}".format(name))
+
     def _run_optimizer(self):
         requirejs_optimizer = "r.js -o {0}".format(BUILD_CONFIG)
         self.stdout.write(
             "Running require.js optimizer: {0}".format(requirejs_optimizer)
         )
-        subprocess.check_call(requirejs_optimizer, shell=True)
+        try:
+            subprocess.check_call(requirejs_optimizer, shell=True)
+        except subprocess.CalledProcessError as e:
+            raise CommandError("The require.js optimizer failed: {0}".format(e))
 
     def _check_build_paths(self):
-        for d in [BUILD_DATA_DIR, BUILD_OUTPUT_DIR]:
+        for d in [BUILD_DATA_DIR, BUILD_OUTPUT_DIR, ASSETS_OUTPUT_DIR]:
             if os.path.exists(d):
                 self.stdout.write("Build dir already exists: {0}\n".format(d))
             else:
@@ -0,0 +1,291 @@
+# DESCRIPTION
+#
+# Drives a running server (e.g. gunicorn on a local Postgres) with simulated
+# students and instructors, over HTTP, and reports throughput, latency
+# percentiles and error rates per endpoint.
+#
+# Each student logs in and works through the published playlists of their
+# course: for every exercise it opens the playlist page, fetches the exercise
+# definition, "plays" for a think time, submits a performance and advances to
+# the next exercise, and to the next playlist at the end of one. Instructors
+# poll the course activity table of their course.
+#
+# The students, instructors and courses are read from the database, which
+# must be the one the server uses; create them with generate_synthetic_data.
+# Submitted performances are saved like any other, so regenerate the data
+# for comparable runs.
+#
+# DEPENDENCIES:
+#
+# The server has to be started separately, with the worker setup to size:
+#
+#   gunicorn harmony.wsgi:application --worker-class gthread --threads 32
+#
+# USAGE:
+#
+#   ./manage.py loadtest --students 100 --instructors 2 --duration 60
+#   ./manage.py loadtest --url http://127.0.0.1:8000 --think 0 --output load.json
+import json
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from apps.exercises.management.commands.generate_synthetic_data import (
+    SYNTHETIC_PASSWORD,
+    synthetic_users,
+)
+from apps.exercises.models import Course, PlaylistCourseOrdered
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Recorder:
+    """Collects the outcome of every request, from all simulated users."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seconds = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, endpoint, session, method, url, expected, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, allow_redirects=False, **kwargs)
+            ok = response.status_code == expected
+        except requests.RequestException:
+            response, ok = None, False
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.seconds[endpoint].append(elapsed)
+            if not ok:
+                self.errors[endpoint] += 1
+        return response if ok else None
+
+    def report(self, elapsed):
+        rows = {}
+        for endpoint, seconds in self.seconds.items():
+            seconds = sorted(seconds)
+            rows[endpoint] = {
+                "requests": len(seconds),
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / len(seconds),
+                "throughput": len(seconds) / elapsed,
+                "mean_ms": statistics.mean(seconds) * 1000,
+                "p50_ms": percentile(seconds, 0.50) * 1000,
+                "p95_ms": percentile(seconds, 0.95) * 1000,
+                "p99_ms": percentile(seconds, 0.99) * 1000,
+            }
+        return rows
+
+
+def login(recorder, base_url, email):
+    """A session of a synthetic user, or None if logging in failed."""
+    session = requests.Session()
+    url = base_url + "/accounts/login/"
+    recorder.request("login", session, "GET", url, 200)
+    response = recorder.request(
+        "login",
+        session,
+        "POST",
+        url,
+        302,
+        data={
+            "email": email,
+            "password": SYNTHETIC_PASSWORD,
+            "csrfmiddlewaretoken": session.cookies.get("csrftoken", ""),
+        },
+        headers={"Referer": url},
+    )
+    return session if response is not None else None
+
+
+class Command(BaseCommand):
+    help = "Load test a running server with simulated students and instructors."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--prefix", default="synth", help="Prefix of synthetic users")
+        parser.add_argument("--students", type=int, default=20)
+        parser.add_argument("--instructors", type=int, default=1)
+        parser.add_argument("--duration", type=float, default=60, help="Seconds")
+        parser.add_argument(
+            "--think",
+            type=float,
+            default=2,
+            help="Mean seconds a student spends on an exercise before submitting",
+        )
+        parser.add_argument(
+            "--poll", type=float, default=10, help="Seconds between instructor polls"
+        )
+        parser.add_argument("--output", help="File to write the JSON results to")
+
+    def handle(self, *args, **options):
+        self.base_url = options["url"].rstrip("/")
+        self.options = options
+        students, instructors = self.roster(options["prefix"])
+        if not students:
+            raise CommandError(
+                f"No enrolled synthetic students with prefix {options['prefix']!r}; "
+                "run generate_synthetic_data first"
+            )
+        students = students[: options["students"]]
+        instructors = instructors[: options["instructors"]]
+
+        self.recorder = Recorder()
+        self.deadline = time.monotonic() + options["duration"]
+        threads = [
+            threading.Thread(target=self.student, args=student, daemon=True)
+            for student in students
+        ] + [
+            threading.Thread(target=self.instructor, args=instructor, daemon=True)
+            for instructor in instructors
+        ]
+        self.stdout.write(
+            f"{len(students)} students and {len(instructors)} instructors "
+            f"for {options['duration']:g} s against {self.base_url}"
+        )
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rows = self.recorder.report(time.monotonic() - start)
+
+        self.stdout.write(
+            "{:<16} {:>8} {:>7} {:>8} {:>9} {:>9} {:>9}".format(
+                "endpoint", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"
+            )
+        )
+        for endpoint, row in rows.items():
+            self.stdout.write(
+                "{:<16} {:>8} {:>6.1%} {:>8.1f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                    endpoint,
+                    row["requests"],
+                    row["error_rate"],
+                    row["throughput"],
+                    row["p50_ms"],
+                    row["p95_ms"],
+                    row["p99_ms"],
+                )
+            )
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(
+                    {
+                        "url": self.base_url,
+                        "students": len(students),
+                        "instructors": len(instructors),
+                        "duration": options["duration"],
+                        "think": options["think"],
+                        "endpoints": rows,
+                    },
+                    f,
+                    indent=2,
+                )
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def roster(self, prefix):
+        """(email, course id, [(playlist id, exercise count)]) of students, and
+        (email, course id) of instructors, all by course."""
+        students, instructors = [], []
+        courses = Course.objects.filter(
+            authored_by__in=synthetic_users(prefix)
+        ).select_related("authored_by")
+        for course in courses:
+            playlists = [
+                (pco.playlist.id, len(pco.playlist.exercise_list))
+                for pco in PlaylistCourseOrdered.objects.filter(
+                    course=course, publish_date__lte=now()
+                )
+                .select_related("playlist")
+                .order_by("order")
+            ]
+            if not playlists:
+                continue
+            instructors.append((course.authored_by.email, course.id))
+            for email in (
+                synthetic_users(prefix)
+                .filter(participant_groups__visible_courses=course)
+                .order_by("id")
+                .values_list("email", flat=True)
+            ):
+                students.append((email, course.id, playlists))
+        # interleave courses so that any number of students spreads over them
+        random.Random(0).shuffle(students)
+        return students, instructors
+
+    def pause(self, seconds):
+        time.sleep(max(0, min(seconds, self.deadline - time.monotonic())))
+        return time.monotonic() < self.deadline
+
+    def student(self, email, course_id, playlists):
+        session = login(self.recorder, self.base_url, email)
+        if session is None:
+            return
+        request = self.recorder.request
+        # students start at different units, as in a real class
+        position = random.randrange(len(playlists))
+        while time.monotonic() < self.deadline:
+            playlist_id, exercise_count = playlists[position % len(playlists)]
+            for num in range(1, exercise_count + 1):
+                page = f"{self.base_url}/playlists/{course_id}/{playlist_id}/{num}/"
+                request("playlist", session, "GET", page, 200)
+                request(
+                    "definition",
+                    session,
+                    "GET",
+                    f"{page}definition/",
+                    200,
+                    params={"exercise_num": num},
+                )
+                if not self.pause(self.think_time()):
+                    return
+                request(
+                    "submit",
+                    session,
+                    "POST",
+                    f"{self.base_url}/ajax/exercise-performance/",
+                    201,
+                    data={"data": json.dumps(self.performance(course_id, playlist_id, num))},
+                    headers={"X-CSRFToken": session.cookies.get("csrftoken", "")},
+                )
+            # auto-advance to the next unit
+            position += 1
+
+    def think_time(self):
+        think = self.options["think"]
+        return random.expovariate(1 / think) if think else 0
+
+    def instructor(self, email, course_id):
+        session = login(self.recorder, self.base_url, email)
+        if session is None:
+            return
+        url = f"{self.base_url}/dashboard/courses/{course_id}/activity/"
+        while True:
+            self.recorder.request("course_activity", session, "GET", url, 200)
+            if not self.pause(self.options["poll"]):
+                return
+
+    def performance(self, course_id, playlist_id, exercise_num):
+        return {
+            "course_ID": course_id,
+            "playlist_ID": playlist_id,
+            "exercise_num": exercise_num,
+            "client_completion_date": now().isoformat(),
+            "error_tally": random.choice([0, 0, 1, 2]),
+            "performance_duration_in_seconds": round(random.uniform(8, 90), 3),
+            "time_intervals_in_milliseconds": [random.randint(400, 2400) for _ in range(8)],
+            "tempo_mean_semibreves_per_min": round(random.uniform(10, 40), 2),
+            "tempo_SD_semibreves_per_min": round(random.uniform(0, 6), 2),
+            "tempo_rating": random.randint(1, 5),
+        }
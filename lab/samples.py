@@ -0,0 +1,64 @@
+"""
+Manifests of the piano samples in lab/static/audio.
+
+There is a sample every three semitones from A0 to C8, and the sampler
+pitch-shifts the nearest loaded sample for the notes in between. A manifest
+splits the samples into those a page needs before it can sound, which cover
+the user's keyboard and the notes of the current exercise, and the rest,
+which the client loads lazily afterwards:
+
+    {
+        "baseUrl": "/static/",
+        "initial": {"C2": "audio/C2.ogg", "D#2": "audio/Ds2.ogg", ...},
+        "deferred": {"A0": "audio/A0.ogg", ...}
+    }
+
+After buildrequirejs, the files are the content-hashed copies of the samples,
+e.g. "build/audio/C2.0d1f2e3a4b5c.ogg".
+"""
+from django.conf import settings
+
+from apps.accounts.models import DEFAULT_KEYBOARD_SIZE
+from apps.exercises.utils.transpose import midi_range
+from lab.assets import hashed_name
+
+SAMPLE_NOTES = range(21, 109, 3)  # A0, C1, D#1, F#1, A1, ..., C8
+SAMPLE_SPACING = 3
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+# per KeyboardGenerator.startingNoteForSize in keyboard_generator.js
+STARTING_NOTE_FOR_SIZE = {25: 48, 32: 53, 37: 48, 49: 36, 61: 36, 88: 21}
+
+
+def sample_name(midi):
+    name = NOTE_NAMES[midi % 12] + str(midi // 12 - 1)
+    return name, name.replace("#", "s") + ".ogg"
+
+
+def keyboard_range(keyboard_size, octaves_offset=0):
+    try:
+        keyboard_size = int(keyboard_size)
+        start = STARTING_NOTE_FOR_SIZE[keyboard_size] + 12 * int(octaves_offset)
+    except (KeyError, TypeError, ValueError):
+        keyboard_size = DEFAULT_KEYBOARD_SIZE
+        start = STARTING_NOTE_FOR_SIZE[keyboard_size]
+    return start, start + keyboard_size - 1
+
+
+def sample_manifest(preferences, exercise_data=None):
+    low, high = keyboard_range(
+        preferences.get("keyboard_size"), preferences.get("keyboard_octaves_offset", 0)
+    )
+    exercise_range = midi_range(exercise_data) if exercise_data else None
+    if exercise_range:
+        low, high = min(low, exercise_range[0]), max(high, exercise_range[1])
+
+    manifest = {"baseUrl": settings.STATIC_URL, "initial": {}, "deferred": {}}
+    for midi in SAMPLE_NOTES:
+        # a sample is needed if it is the nearest to any note in the range
+        needed = low - SAMPLE_SPACING < midi < high + SAMPLE_SPACING
+        name, filename = sample_name(midi)
+        manifest["initial" if needed else "deferred"][name] = hashed_name(
+            "audio/" + filename
+        )
+    return manifest
@@ -19,6 +19,7 @@ define([
   "app/models/exercise_definition",
   "app/models/exercise_grader",
   "app/models/exercise_context",
+  "app/models/exercise_format",
 ], function (
   module,
   _,
@@ -39,7 +40,8 @@ define([
   ExerciseChordBank,
   ExerciseDefinition,
   ExerciseGrader,
-  ExerciseContext
+  ExerciseContext,
+  ExerciseFormat
 ) {
   /**
    * AppExerciseComponent class.
@@ -102,7 +104,7 @@ define([
         "getExerciseDefinition(): missing exercise configuration data"
       );
     }
-    return exercise_config; //$.extend(true, {}, exercise_config); // Return deep copy of the config
+    return ExerciseFormat.decode(exercise_config); //$.extend(true, {}, exercise_config); // Return deep copy of the config
   };
 
   /**
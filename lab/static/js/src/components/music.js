@@ -5,7 +5,8 @@ define([
   "app/components/events",
   "app/components/component",
   "app/models/key_signature",
-], function ($, _, Config, EVENTS, Component, KeySignature) {
+  "app/models/exercise_format",
+], function ($, _, Config, EVENTS, Component, KeySignature, ExerciseFormat) {
   /**
    * This is a map of analysis modes to booleans indicating whether the mode
    * is enabled or disabled by default.
@@ -200,7 +201,7 @@ define([
             },
             dataType: "json",
             success: function (data) {
-              newData = data;
+              newData = ExerciseFormat.decode(data);
             },
           });
 
@@ -227,7 +228,7 @@ define([
               dataType: "json",
               success: function (data) {
                 if (setdef.settings.definition.nextExerciseId) {
-                  newData = data;
+                  newData = ExerciseFormat.decode(data);
                 }
               },
             });
@@ -255,7 +256,7 @@ define([
               dataType: "json",
               success: function (data) {
                 if (setdef.settings.definition.previousExerciseId) {
-                  newData = data;
+                  newData = ExerciseFormat.decode(data);
                 }
               },
             });
@@ -276,7 +277,7 @@ define([
             },
             dataType: "json",
             success: function (data) {
-              newData = data;
+              newData = ExerciseFormat.decode(data);
             },
           });
 
@@ -1,9 +1,10 @@
 define([
   "jquery",
   "lodash",
+  "app/preferences",
   "app/components/events",
   "app/components/component",
-], function ($, _, EVENTS, Component) {
+], function ($, _, Preferences, EVENTS, Component) {
   /**
    * The PedalsComponent renders pedals for the on-screen piano.
    */
@@ -87,25 +88,8 @@ define([
     }
   };
 
-  /**
-   * ajax call to GET the user preferences
-   */
-
-  $.ajax({
-    type: "GET",
-    url: this.location.origin + "/ajax/preferences/",
-    async: false,
-    success: function (response) {
-      if (!response["valid"]) {
-        /** if the call is successful response.instance will hold the json sent by the server
-         * use the following two lines to log the response to the console
-         * console.log(response);
-         * console.log(JSON.parse(response.instance)); */
-        var sticky_settings = JSON.parse(response.instance);
-        AUTO_SUSTAIN_DURATION = sticky_settings.auto_sustain_duration;
-      }
-    },
-  });
+  /* in tenths of a second, the default per apps.accounts.models */
+  var AUTO_SUSTAIN_DURATION = Preferences.get("auto_sustain_duration", 20);
 
   // Toggles off the pedal designated by pedalName, then toggles it back on
   // Currently just used to maintain sustain after completing a chord
@@ -2,6 +2,7 @@ define([
   "jquery",
   "lodash",
   "app/config",
+  "app/preferences",
   "app/components/events",
   "app/components/component",
   "app/components/ui/modal",
@@ -14,6 +15,7 @@ define([
   $,
   _,
   Config,
+  Preferences,
   EVENTS,
   Component,
   ModalComponent,
@@ -35,28 +37,15 @@ define([
   var DESIRED_KEYBOARD_OCTAVES_OFFSET = 0;
 
   /**
-   * ajax call to GET the keyboard size
+   * the keyboard size of the user's preference
    * this will set the keyboard size in the controls on the right (not the actual keyboard)
    * if no one is logged in the size is 49 per apps.accounts.models
    */
-
-  $.ajax({
-    type: "GET",
-    url: this.location.origin + "/ajax/preferences/",
-    async: false,
-    success: function (response) {
-      if (!response["valid"]) {
-        /** if the call is successful response.instance will hold the json sent by the server
-         * use the following two lines to log the response to the console
-         * console.log(response);
-         * console.log(JSON.parse(response.instance)); */
-        var sticky_settings = JSON.parse(response.instance);
-        DESIRED_KEYBOARD_SIZE = sticky_settings.keyboard_size;
-        DESIRED_KEYBOARD_OCTAVES_OFFSET =
-          sticky_settings.keyboard_octaves_offset;
-      }
-    },
-  });
+  DESIRED_KEYBOARD_SIZE = Preferences.get("keyboard_size", DESIRED_KEYBOARD_SIZE);
+  DESIRED_KEYBOARD_OCTAVES_OFFSET = Preferences.get(
+    "keyboard_octaves_offset",
+    DESIRED_KEYBOARD_OCTAVES_OFFSET
+  );
 
   /**
    * Defines a namespace for settings.
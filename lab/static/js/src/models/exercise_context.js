@@ -5,6 +5,7 @@ define([
   "./exercise_chord",
   "./exercise_chord_bank",
   "app/config",
+  "app/preferences",
   "app/components/events",
   "simple-statistics.min",
 ], function (
@@ -14,6 +15,7 @@ define([
   ExerciseChord,
   ExerciseChordBank,
   Config,
+  Preferences,
   EVENTS,
   SimpleStatistics
 ) {
@@ -24,28 +26,12 @@ define([
   var AUTO_REPEAT_DELAY = Config.get("general.autoRepeatDelay");
 
   /**
-   * ajax call to GET the user preferences
+   * the user preferences
    */
-
-  $.ajax({
-    type: "GET",
-    url: this.location.origin + "/ajax/preferences/",
-    async: false,
-    success: function (response) {
-      if (!response["valid"]) {
-        /** if the call is successful response.instance will hold the json sent by the server
-         * use the following two lines to log the response to the console
-         * console.log(response);
-         * console.log(JSON.parse(response.instance)); */
-        var sticky_settings = JSON.parse(response.instance);
-        AUTO_ADVANCE = sticky_settings.auto_advance;
-        AUTO_ADVANCE_DELAY = sticky_settings.auto_advance_delay;
-        AUTO_REPEAT = sticky_settings.auto_repeat;
-        AUTO_REPEAT_DELAY = sticky_settings.auto_repeat_delay;
-        // AUTO_SUSTAIN_DURATION = sticky_settings.auto_sustain_duration;
-      }
-    },
-  });
+  AUTO_ADVANCE = Preferences.get("auto_advance", AUTO_ADVANCE);
+  AUTO_ADVANCE_DELAY = Preferences.get("auto_advance_delay", AUTO_ADVANCE_DELAY);
+  AUTO_REPEAT = Preferences.get("auto_repeat", AUTO_REPEAT);
+  AUTO_REPEAT_DELAY = Preferences.get("auto_repeat_delay", AUTO_REPEAT_DELAY);
 
   var DEFAULT_RHYTHM_VALUE = Config.get("general.defaultRhythmValue");
   var IGNORE_MISTAKES_ON_AUTO_ADVANCE = Config.get(
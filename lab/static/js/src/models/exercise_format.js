@@ -0,0 +1,127 @@
+/**
+ * @fileoverview Decodes the compact format of exercise definitions.
+ *
+ * The server packs the chords and the analysis and highlight modes of an
+ * exercise definition (see lab/exercise_format.py):
+ *
+ *		{
+ *			format: 1,
+ *			chords: [[46, 65, 70, -63], ...],
+ *			rhythm: "w...",
+ *			analysis: [1, 1026, 2],
+ *			...
+ *		}
+ *
+ * Hidden notes are the bitwise complement of the note, the rhythm has a
+ * character per chord ("." for none), and the modes are bitflags of the mode
+ * names below: [enabled, present, on].
+ */
+define([], function () {
+  "use strict";
+
+  var FORMAT_VERSION = 1;
+  var NO_RHYTHM = ".";
+
+  // must match ANALYSIS_MODES and HIGHLIGHT_MODES in lab/exercise_format.py
+  var ANALYSIS_MODES = [
+    "abbreviate_thoroughbass",
+    "note_names",
+    "fixed_do",
+    "scientific_pitch",
+    "pitch_class",
+    "spacing",
+    "scale_degrees",
+    "solfege",
+    "do_based_solfege",
+    "thoroughbass",
+    "roman_numerals",
+    "chord_labels",
+    "intervals",
+    "intervals_wrap_after_octave",
+    "intervals_wrap_after_octave_plus_ditone",
+    "generic_intervals",
+    "generic_intervals_wrap_after_octave",
+    "generic_intervals_wrap_after_octave_plus_ditone",
+    "pci",
+    "set_class_set",
+    "set_class_normal",
+    "set_class_prime",
+    "set_class_forte",
+  ];
+  var HIGHLIGHT_MODES = [
+    "roothighlight",
+    "tritonehighlight",
+    "doublinghighlight",
+    "modalmixturehighlight",
+    "loweredhighlight",
+    "solobass",
+    "octaveshighlight",
+  ];
+
+  var decodeChords = function (chords, rhythm) {
+    return chords.map(function (notes, index) {
+      var chord = {
+        visible: notes.filter(function (note) {
+          return note >= 0;
+        }),
+        hidden: notes
+          .filter(function (note) {
+            return note < 0;
+          })
+          .map(function (note) {
+            return ~note;
+          }),
+      };
+      var rhythmValue = rhythm ? rhythm.charAt(index) : "";
+      if (rhythmValue && rhythmValue !== NO_RHYTHM) {
+        chord.rhythmValue = rhythmValue;
+      }
+      return chord;
+    });
+  };
+
+  var decodeModes = function (flags, modes) {
+    var mode = {};
+    modes.forEach(function (name, index) {
+      var bit = 1 << index;
+      if (flags[1] & bit) {
+        mode[name] = (flags[2] & bit) !== 0;
+      }
+    });
+    return { enabled: flags[0] === 1, mode: mode };
+  };
+
+  /**
+   * @namespace ExerciseFormat
+   */
+  var ExerciseFormat = {
+    /**
+     * Returns the definition with its chords and modes unpacked, as stored
+     * in the exercise. Definitions that are not compact are returned as is.
+     *
+     * @param {object} definition
+     * @return {object}
+     */
+    decode: function (definition) {
+      if (!definition || definition.format !== FORMAT_VERSION) {
+        return definition;
+      }
+      var decoded = Object.assign({}, definition);
+      delete decoded.format;
+      if (Array.isArray(decoded.chords)) {
+        decoded.chord = decodeChords(decoded.chords, decoded.rhythm);
+        delete decoded.chords;
+        delete decoded.rhythm;
+      }
+      if (Array.isArray(decoded.analysis)) {
+        decoded.analysis = decodeModes(decoded.analysis, ANALYSIS_MODES);
+      }
+      if (Array.isArray(decoded.highlight)) {
+        decoded.highlight = decodeModes(decoded.highlight, HIGHLIGHT_MODES);
+      }
+      return decoded;
+    },
+  };
+
+  return ExerciseFormat;
+});
@@ -1,8 +1,10 @@
-define(["lodash", "microevent", "Tone" /* Tone.js 14.8.3 */], function (
-  _,
-  MicroEvent,
-  Tone
-) {
+define([
+  "module",
+  "lodash",
+  "microevent",
+  "app/preferences",
+  "Tone" /* Tone.js 14.8.3 */,
+], function (module, _, MicroEvent, Preferences, Tone) {
   /**
    * MidiDevice object is responsible for knowing the MIDI input/output
    * devices that are available for sending/receiving messages.
@@ -29,8 +31,10 @@ define(["lodash", "microevent", "Tone" /* Tone.js 14.8.3 */], function (
 
   /* Create Sampler */
   var vol = new Tone.Volume(-6).toDestination();
-  const sampler = new Tone.Sampler({
-    urls: {
+  /* every sample, for pages that do not provide a manifest */
+  var ALL_SAMPLES = {
+    baseUrl: "/static/audio/",
+    initial: {
       A0: "A0.ogg",
       C1: "C1.ogg",
       "D#1": "Ds1.ogg",
@@ -62,26 +66,33 @@ define(["lodash", "microevent", "Tone" /* Tone.js 14.8.3 */], function (
       A7: "A7.ogg",
       C8: "C8.ogg",
     },
+    deferred: {},
+  };
+  /*
+   * the manifest of lab.samples: samples for the user's keyboard and the
+   * current exercise are loaded first, the others once those are in
+   */
+  var SAMPLES = module.config().samples || ALL_SAMPLES;
+  var loadDeferredSamples = function () {
+    var notes = _.keys(SAMPLES.deferred);
+    var loadNext = function () {
+      var note = notes.shift();
+      if (note !== undefined) {
+        sampler.add(note, SAMPLES.deferred[note], loadNext);
+      }
+    };
+    loadNext();
+  };
+  const sampler = new Tone.Sampler({
+    urls: SAMPLES.initial,
     release: 1,
-    baseUrl: "/static/audio/",
+    baseUrl: SAMPLES.baseUrl,
+    onload: loadDeferredSamples,
   }).connect(vol);
 
   /* load sticky settings */
-  var STICKY_VOLUME = null;
-  var STICKY_MUTE = null;
-  $.ajax({
-    type: "GET",
-    url: this.location.origin + "/ajax/preferences/",
-    async: false,
-    success: function (response) {
-      if (!response["valid"]) {
-        var sticky_settings = JSON.parse(response.instance);
-        STICKY_VOLUME = sticky_settings.volume;
-        STICKY_MUTE = sticky_settings.mute;
-        console.log("volume:", STICKY_VOLUME, "/ muted:", STICKY_MUTE);
-      }
-    },
-  });
+  var STICKY_VOLUME = Preferences.get("volume", null);
+  var STICKY_MUTE = Preferences.get("mute", null);
 
   const volumeOpts = {
     ff: 0,
@@ -143,6 +154,42 @@ define(["lodash", "microevent", "Tone" /* Tone.js 14.8.3 */], function (
     }
   });
 
+  /* saves changed preferences; rapid changes (e.g. clicking through volume
+     levels) are coalesced into one request, sent at the latest when the page
+     is hidden. keepalive lets the request outlive the page. */
+  const PREFERENCES_SAVE_DELAY = 1000;
+  var pendingPreferences = null;
+  var savePreferencesTimer = null;
+
+  function flushPreferences() {
+    clearTimeout(savePreferencesTimer);
+    if (!pendingPreferences) {
+      return;
+    }
+    const changes = pendingPreferences;
+    pendingPreferences = null;
+    fetch("/ajax/preferences/", {
+      method: "PATCH",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(changes),
+      credentials: "same-origin",
+      keepalive: true,
+    }).catch(function (error) {});
+  }
+
+  function savePreferences(changes) {
+    pendingPreferences = Object.assign(pendingPreferences || {}, changes);
+    clearTimeout(savePreferencesTimer);
+    savePreferencesTimer = setTimeout(flushPreferences, PREFERENCES_SAVE_DELAY);
+  }
+
+  window.addEventListener("pagehide", flushPreferences);
+  document.addEventListener("visibilitychange", function () {
+    if (document.visibilityState === "hidden") {
+      flushPreferences();
+    }
+  });
+
   /* Mute button */
   if ($("#mute-toggle").length > 0) {
     $("#mute-toggle").click(function () {
@@ -150,25 +197,11 @@ define(["lodash", "microevent", "Tone" /* Tone.js 14.8.3 */], function (
       if (mute.innerHTML == muteToggleText[0]) {
         /* all notes off */
         sampler.releaseAll();
-        $.ajax({
-          type: "POST",
-          url: "/ajax/set-mute/",
-          dataType: "json",
-          data: { mute: true },
-          success: function (data) {},
-          error: function (error) {},
-        });
+        savePreferences({ mute: true });
         vol.mute = true;
         mute.innerHTML = muteToggleText[1];
       } else if (mute.innerHTML == muteToggleText[1]) {
-        $.ajax({
-          type: "POST",
-          url: "/ajax/set-mute/",
-          dataType: "json",
-          data: { mute: false },
-          success: function (data) {},
-          error: function (error) {},
-        });
+        savePreferences({ mute: false });
         vol.mute = false;
         mute.innerHTML = muteToggleText[0];
       }
@@ -185,14 +218,7 @@ define(["lodash", "microevent", "Tone" /* Tone.js 14.8.3 */], function (
             volumeOptsKeys.length
         ];
 
-      $.ajax({
-        type: "POST",
-        url: "/ajax/set-volume/",
-        dataType: "json",
-        data: { volume: volumeDiv.innerHTML },
-        success: function (data) {},
-        error: function (error) {},
-      });
+      savePreferences({ volume: volumeDiv.innerHTML });
 
       sampler.volume.value = volumeOpts[volumeDiv.innerHTML];
     });
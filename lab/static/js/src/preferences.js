@@ -0,0 +1,83 @@
+/**
+ * @fileoverview Provides the preferences of the current user.
+ *
+ * The lab pages inline the resolved preferences into the requirejs config of
+ * this module:
+ *
+ *		requirejs.config({
+ *			config: {
+ *				'app/preferences': {
+ *					'preferences': {keyboard_size: 49, volume: "mf", ...}
+ *				}
+ *			}
+ *		});
+ *
+ * Pages that do not are served by one synchronous request to
+ * /ajax/preferences/, made the first time this module is loaded.
+ */
+define(["module", "jquery", "lodash"], function (module, $, _) {
+  "use strict";
+
+  var URL = "/ajax/preferences/";
+
+  var fetch = function (async, callback) {
+    $.ajax({
+      type: "GET",
+      url: URL,
+      async: async,
+      success: function (response) {
+        if (!response["valid"]) {
+          callback(JSON.parse(response.instance));
+        }
+      },
+    });
+  };
+
+  var inlined = module.config().preferences;
+  var preferences = inlined || {};
+  if (!inlined) {
+    fetch(false, function (fetched) {
+      preferences = fetched;
+    });
+  }
+
+  /**
+   * @namespace Preferences
+   */
+  var Preferences = {
+    /**
+     * Returns all preferences.
+     *
+     * @return {object}
+     */
+    all: function () {
+      return preferences;
+    },
+    /**
+     * Returns a preference.
+     *
+     * @param {string} key
+     * @param {*} defaultValue returned if the preference is not known
+     * @return {*}
+     */
+    get: function (key, defaultValue) {
+      return _.has(preferences, key) ? preferences[key] : defaultValue;
+    },
+    /**
+     * Fetches the preferences again, e.g. after they were changed elsewhere.
+     *
+     * @param {function} callback called with the preferences
+     * @return undefined
+     */
+    refresh: function (callback) {
+      fetch(true, function (fetched) {
+        preferences = fetched;
+        if (callback) {
+          callback(preferences);
+        }
+      });
+    },
+  };
+
+  return Preferences;
+});
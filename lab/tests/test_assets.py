@@ -0,0 +1,79 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from harmony.settings import requirejs
+from lab import assets
+
+
+class HashedAssetsTest(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.static_dir = os.path.join(self.root, "lab", "static")
+        self.build_file = os.path.join(self.root, "data", "requirejs", "build.json")
+        os.makedirs(os.path.dirname(self.build_file))
+        self.write("build/css/harmony.3f2a9c1d7e4b.css")
+        self.write("build/js/lib/jquery.a1b2c3d4e5f6.js")
+        self.write("js/build/main-a1e2d2b970b1b0ced1d9b4e96442ef1f.js")
+        self.build = {
+            "main": "main-a1e2d2b970b1b0ced1d9b4e96442ef1f",
+            "assets": {
+                "css/harmony.css": "build/css/harmony.3f2a9c1d7e4b.css",
+                "css/missing.css": "build/css/missing.0123456789ab.css",
+                "js/lib/jquery.js": "build/js/lib/jquery.a1b2c3d4e5f6.js",
+                "js/lib/lodash.js": "build/js/lib/lodash.0123456789ab.js",
+            },
+        }
+        with open(self.build_file, "w") as f:
+            json.dump(self.build, f)
+
+        patcher = mock.patch.multiple(
+            assets, BUILD_DATA_FILE=self.build_file, STATIC_DIR=self.static_dir
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        assets.hashed_assets.cache_clear()
+        self.addCleanup(assets.hashed_assets.cache_clear)
+
+    def write(self, name):
+        path = os.path.join(self.static_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(name)
+
+    def test_hashed_name(self):
+        with self.assertLogs("lab.assets", "WARNING"):
+            self.assertEqual(
+                assets.hashed_name("css/harmony.css"),
+                "build/css/harmony.3f2a9c1d7e4b.css",
+            )
+        self.assertEqual(assets.hashed_name("css/missing.css"), "css/missing.css")
+        self.assertEqual(assets.hashed_name("img/logo.png"), "img/logo.png")
+
+    def test_no_build(self):
+        os.remove(self.build_file)
+        self.assertEqual(assets.hashed_name("css/harmony.css"), "css/harmony.css")
+
+    def test_requirejs_paths(self):
+        debug, config = requirejs.configure(self.root, "/static/")
+        self.assertFalse(debug)
+        self.assertEqual(
+            config["paths"]["app/main"],
+            "/static/js/build/main-a1e2d2b970b1b0ced1d9b4e96442ef1f",
+        )
+        self.assertEqual(
+            config["paths"]["jquery"], "/static/build/js/lib/jquery.a1b2c3d4e5f6"
+        )
+        self.assertNotIn("lodash", config["paths"])
+
+    def test_requirejs_main_missing(self):
+        main = "js/build/{0}.js".format(self.build["main"])
+        os.remove(os.path.join(self.static_dir, main))
+        debug, config = requirejs.configure(self.root, "/static/")
+        self.assertTrue(debug)
+        self.assertNotIn("app/main", config["paths"])
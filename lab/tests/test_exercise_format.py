@@ -0,0 +1,174 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import unittest
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from lab.exercise_format import (
+    ANALYSIS_MODES,
+    FORMAT_VERSION,
+    HIGHLIGHT_MODES,
+    decode_exercise_data,
+    encode_exercise_data,
+)
+
+JS_DECODER = os.path.join(
+    settings.ROOT_DIR, "lab", "static", "js", "src", "models", "exercise_format.js"
+)
+
+
+def exercise_data(**changes):
+    data = {
+        "type": "matching",
+        "key": "jC_",
+        "analysis": {
+            "enabled": True,
+            "mode": {"note_names": True, "roman_numerals": False},
+        },
+        "highlight": {"enabled": False, "mode": {"roothighlight": True}},
+        "chord": [
+            {"visible": [48, 64], "hidden": [67], "rhythmValue": "w"},
+            {"visible": [43, 62, 67], "hidden": [], "rhythmValue": "h"},
+        ],
+    }
+    data.update(changes)
+    return data
+
+
+# the data that matters, with the expected encoded chords or None if the
+# data is passed through as is
+CASES = {
+    "chords": (exercise_data(), [[48, 64, -68], [43, 62, 67]]),
+    "hidden note 0": (
+        exercise_data(chord=[{"visible": [60], "hidden": [0], "rhythmValue": "q"}]),
+        [[60, -1]],
+    ),
+    "missing rhythm": (
+        exercise_data(
+            chord=[{"visible": [60], "hidden": []}, {"visible": [62], "hidden": []}]
+        ),
+        [[60], [62]],
+    ),
+    "partly missing rhythm": (
+        exercise_data(
+            chord=[
+                {"visible": [60], "hidden": [], "rhythmValue": "w"},
+                {"visible": [62], "hidden": []},
+            ]
+        ),
+        [[60], [62]],
+    ),
+    "no chords": (exercise_data(chord=[]), []),
+    "modes missing from the map": (
+        exercise_data(
+            analysis={"enabled": False, "mode": {}},
+            highlight={"enabled": True, "mode": {"octaveshighlight": False}},
+        ),
+        [[48, 64, -68], [43, 62, 67]],
+    ),
+    '"." rhythm': (
+        exercise_data(chord=[{"visible": [60], "hidden": [], "rhythmValue": "."}]),
+        None,
+    ),
+    "long rhythm": (
+        exercise_data(chord=[{"visible": [60], "hidden": [], "rhythmValue": "www"}]),
+        None,
+    ),
+    "unknown chord key": (
+        exercise_data(chord=[{"visible": [60], "hidden": [], "unison_idx": 1}]),
+        None,
+    ),
+    "notes as strings": (
+        exercise_data(chord=[{"visible": ["60"], "hidden": []}]),
+        None,
+    ),
+    "chord as array": (exercise_data(chord=[60, 64, 67]), None),
+}
+
+
+class ExerciseFormatTest(SimpleTestCase):
+    def test_round_trip(self):
+        for name, (data, chords) in CASES.items():
+            with self.subTest(name):
+                encoded = encode_exercise_data(data)
+                self.assertEqual(encoded["format"], FORMAT_VERSION)
+                if chords is None:
+                    self.assertEqual(encoded["chord"], data["chord"])
+                    self.assertNotIn("chords", encoded)
+                else:
+                    self.assertEqual(encoded["chords"], chords)
+                    self.assertNotIn("chord", encoded)
+                self.assertEqual(decode_exercise_data(encoded), data)
+
+    def test_rhythm(self):
+        self.assertEqual(encode_exercise_data(exercise_data())["rhythm"], "wh")
+        self.assertNotIn("rhythm", encode_exercise_data(CASES["missing rhythm"][0]))
+        self.assertEqual(
+            encode_exercise_data(CASES["partly missing rhythm"][0])["rhythm"], "w."
+        )
+
+    def test_mode_flags(self):
+        encoded = encode_exercise_data(exercise_data())
+        note_names = 1 << ANALYSIS_MODES.index("note_names")
+        roman_numerals = 1 << ANALYSIS_MODES.index("roman_numerals")
+        self.assertEqual(encoded["analysis"], [1, note_names | roman_numerals, note_names])
+        self.assertEqual(encoded["highlight"], [0, 1, 1])
+
+    def test_passed_through(self):
+        for field, settings in (
+            ("analysis", {"enabled": True, "mode": {"unknown_mode": True}}),
+            ("analysis", {"enabled": "yes", "mode": {}}),
+            ("highlight", {"enabled": True}),
+        ):
+            with self.subTest(settings):
+                data = exercise_data(**{field: settings})
+                encoded = encode_exercise_data(data)
+                self.assertEqual(encoded[field], settings)
+                self.assertEqual(decode_exercise_data(encoded), data)
+
+        # keys of the format are not taken for encoded data
+        data = exercise_data(rhythm="w w")
+        self.assertEqual(encode_exercise_data(data), data)
+        self.assertEqual(decode_exercise_data(encode_exercise_data(data)), data)
+
+    def test_js_mode_lists(self):
+        with open(JS_DECODER) as f:
+            source = f.read()
+        for name, modes in (
+            ("ANALYSIS_MODES", ANALYSIS_MODES),
+            ("HIGHLIGHT_MODES", HIGHLIGHT_MODES),
+        ):
+            with self.subTest(name):
+                match = re.search(r"var %s = \[(.*?)\];" % name, source, re.S)
+                self.assertIsNotNone(match)
+                self.assertEqual(re.findall(r'"(\w+)"', match.group(1)), modes)
+
+    @unittest.skipUnless(shutil.which("node"), "needs node")
+    def test_js_round_trip(self):
+        encoded = {name: encode_exercise_data(data) for name, (data, _) in CASES.items()}
+        script = (
+            "var decoder; global.define = function (deps, f) { decoder = f(); };"
+            "require(%s);"
+            "var encoded = JSON.parse(require('fs').readFileSync(0, 'utf8'));"
+            "var decoded = {};"
+            "Object.keys(encoded).forEach(function (name) {"
+            "  decoded[name] = decoder.decode(encoded[name]);"
+            "});"
+            "process.stdout.write(JSON.stringify(decoded));" % json.dumps(JS_DECODER)
+        )
+        decoded = json.loads(
+            subprocess.run(
+                ["node", "-e", script],
+                input=json.dumps(encoded),
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+        )
+        for name, (data, _) in CASES.items():
+            with self.subTest(name):
+                self.assertEqual(decoded[name], data)
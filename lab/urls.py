@@ -1,11 +1,7 @@
 from django.urls import re_path, path
 from django.views.generic import RedirectView
 
-from apps.accounts.views import (
-    preferences_view,
-    set_preferred_mute_value,
-    set_preferred_volume,
-)
+from apps.accounts.views import preferences_view
 from apps.exercises.views import (
     playlist_performance_view,
     submit_exercise_performance,
@@ -28,8 +24,6 @@ urlpatterns = [
     path("play/", PlayView.as_view(), name="index"),
     # User Preferences
     path("ajax/preferences/", preferences_view, name="user-preferences"),
-    path("ajax/set-mute/", set_preferred_mute_value, name="user-preferred-mute"),
-    path("ajax/set-volume/", set_preferred_volume, name="user-preferred-volume"),
     # Exercise Performance History
     path(
         "ajax/playlists/<str:playlist_id>/<int:exercise_num>/history/",
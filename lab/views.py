@@ -18,9 +18,13 @@ from django_tables2 import RequestConfig
 
 # from .objects import ExerciseRepository
 from .decorators import role_required, course_authorization_required
+from .exercise_format import encode_exercise_data
+from .samples import sample_manifest
 from .tables import CoursePageTable
 from .verification import has_instructor_role, has_course_authorization
 
+from apps.accounts.permissions import get_permit_resolver
+from apps.accounts.preferences import resolved_preferences
 from apps.exercises.models import (
     Exercise,
     Playlist,
@@ -31,11 +35,14 @@ from apps.exercises.models import (
 
 import json
 import copy
+import logging
 
 # from django.core.mail import send_mail
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
 class RequirejsContext(object):
     def __init__(self, config, debug=True):
@@ -56,6 +63,16 @@ class RequirejsContext(object):
         self.set_module_params("app/main", {"app_module": app_module_id})
         return self
 
+    def set_preferences(self, user, exercise=None):
+        # spares the page a request to ajax/preferences/ before it can start
+        preferences = resolved_preferences(user)
+        self.set_module_params("app/preferences", {"preferences": preferences})
+        self.set_module_params(
+            "app/models/midi_device",
+            {"samples": sample_manifest(preferences, exercise and exercise.data)},
+        )
+        return self
+
     def add_to_view(self, view_context):
         view_context["requirejs"] = self
         return self
@@ -66,7 +83,7 @@ class RequirejsContext(object):
         return False
 
     def config_json(self):
-        return json.dumps(self._config)
+        return json.dumps(self._config, separators=(",", ":"))
 
 
 class RequirejsTemplateView(TemplateView):
@@ -97,6 +114,10 @@ class PlayView(RequirejsTemplateView):
     template_name = "play.html"
     requirejs_app = "app/components/app/play"
 
+    def get_context_data(self, **kwargs):
+        self.requirejs_context.set_preferences(self.request.user)
+        return super(PlayView, self).get_context_data(**kwargs)
+
     # def get_context_data(self, course_id=None, **kwargs):
     #     context = super(PlayView, self).get_context_data(**kwargs)
     #     er = ExerciseRepository.create(course_id=course_id)
@@ -204,13 +225,15 @@ def generate_exercise_context(
     # TODO: what is the current functionality of this?
     exercise_is_performed = False
     exercise_error_count = 0
-    playlist_performance = PerformanceData.objects.filter(
-        playlist=playlist, user=user, course=course
-    ).last()
+    playlist_performance = (
+        PerformanceData.objects.filter(playlist=playlist, user=user, course=course)
+        .only("id", "summary")
+        .last()
+    )
     if playlist_performance:
         exercise_is_performed = playlist_performance.exercise_is_performed(exercise.id)
         exercise_error_count = playlist_performance.exercise_error_count(exercise.id)
-    exercise_context.update(exercise.data)
+    exercise_context.update(encode_exercise_data(exercise.data))
     exercise_context.update(
         {
             "nextExercise": next_exercise_url,
@@ -246,11 +269,7 @@ class PlaylistView(RequirejsView):
         if playlist is None:
             raise Http404("Playlist with this name or ID does not exist.")
 
-        if (
-            not playlist.is_public
-            and not playlist.authored_by == request.user
-            and not request.user.pk in playlist.authored_by.content_permits
-        ):
+        if not get_permit_resolver(request).can_access_content(playlist):
             raise PermissionDenied
 
         # Prevents "None" in URL by redirecting to view without course_id in URL
@@ -333,6 +352,7 @@ class PlaylistView(RequirejsView):
         self.requirejs_context.set_module_params(
             "app/components/app/exercise", exercise_context
         )
+        self.requirejs_context.set_preferences(request.user, exercise)
         self.requirejs_context.add_to_view(context)
         return render(request, "exercise.html", context)
 
@@ -350,7 +370,7 @@ class RefreshExerciseDefinition(RequirejsView):
         # If playlist_id is None, we are navigating between users' created exercises in Preview mode
         playlist = get_object_or_404(Playlist, id=playlist_id) if playlist_id else None
         if not playlist_id:
-            print("Preview")
+            logger.debug("Preview")
         exercise_num = request.GET.get("exercise_num")
         exercise_num = int(exercise_num) if exercise_num != "" else None
 
@@ -380,7 +400,9 @@ class RefreshExerciseDefinition(RequirejsView):
             "app/components/app/exercise", exercise_context
         )
         # self.requirejs_context.add_to_view(context)
-        return JsonResponse(data=exercise_context)
+        return JsonResponse(
+            data=exercise_context, json_dumps_params={"separators": (",", ":")}
+        )
 
 
 class ExerciseView(RequirejsView):
@@ -391,11 +413,7 @@ class ExerciseView(RequirejsView):
     def get(self, request, exercise_id, *args, **kwargs):
         exercise = get_object_or_404(Exercise, id=exercise_id)
 
-        if (
-            not exercise.is_public
-            and not exercise.authored_by == request.user
-            and not request.user.pk in exercise.authored_by.content_permits
-        ):
+        if not get_permit_resolver(request).can_access_content(exercise):
             raise PermissionDenied
 
         context = {"group_list": []}
@@ -411,6 +429,7 @@ class ExerciseView(RequirejsView):
         self.requirejs_context.set_module_params(
             "app/components/app/exercise", exercise_context
         )
+        self.requirejs_context.set_preferences(request.user, exercise)
         self.requirejs_context.add_to_view(context)
         return render(request, "exercise.html", context)
 
@@ -423,11 +442,7 @@ class CourseView(RequirejsView):
     def get(self, request, course_id, *args, **kwargs):
         course = get_object_or_404(Course, id=course_id)
 
-        if (
-            not course.is_public
-            and not course.authored_by == request.user
-            and not request.user.pk in course.authored_by.content_permits
-        ):
+        if not get_permit_resolver(request).can_access_content(course):
             raise PermissionDenied
 
         whens = []
@@ -530,39 +545,35 @@ class AddExerciseView(View):
 @login_required()
 @method_decorator(csrf_exempt)
 def exercise_performance_history(
-    request, playlist_name, exercise_num=1, *args, **kwargs
+    request, playlist_id, exercise_num=1, *args, **kwargs
 ):
     # TODO: change this
     # yes, why is course id not also passed to this function?
-    playlist = Playlist.objects.filter(
-        Q(name=playlist_name) | Q(id=playlist_name)
-    ).first()
+    playlist = Playlist.objects.filter(Q(name=playlist_id) | Q(id=playlist_id)).first()
     if playlist is None:
         raise Http404("Playlist with this name or ID does not exist.")
 
-    if (
-        not playlist.is_public
-        and not playlist.authored_by == request.user
-        and not request.user.pk in playlist.authored_by.content_permits
-    ):
+    if not get_permit_resolver(request).can_access_content(playlist):
         raise PermissionDenied
 
-    exercise = playlist.get_exercise_obj_by_num(exercise_num)
-    if exercise is None:
+    exercise_id = playlist.get_exercise_id_by_num(exercise_num)
+    if exercise_id is None:
         raise Http404("This playlist has no exercises.")
 
-    playlist_performance = PerformanceData.objects.filter(
-        playlist=playlist, user=request.user
-    ).last()
+    playlist_performance = (
+        PerformanceData.objects.filter(playlist=playlist, user=request.user)
+        .only("id", "summary")
+        .last()
+    )
 
     exercise_data = json.dumps(
         {
             "exerciseIsPerformed": playlist_performance.exercise_is_performed(
-                exercise.id
+                exercise_id
             )
             if playlist_performance
             else False,
-            "exerciseErrorCount": playlist_performance.exercise_error_count(exercise.id)
+            "exerciseErrorCount": playlist_performance.exercise_error_count(exercise_id)
             if playlist_performance
             else 0,
         }